@@ -0,0 +1,111 @@
+"""
+Load test of the operation endpoint against a local stub SOAP
+server whose responses take ``--delay`` seconds. Compares a
+fixed number of synchronous workers with a single event loop
+serving the asynchronous endpoint.
+
+    $ python benchmarks/async_load.py [--requests 500] [--workers 8] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    SECRET_KEY='benchmark',
+    ROOT_URLCONF=__name__,
+    ALLOWED_HOSTS=['testserver'],
+    INSTALLED_APPS=(
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'rest_framework',
+        'soap_connector'
+    ),
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    SOAP_CONNECTOR_COALESCE=False,
+)
+django.setup()
+
+from django.test import AsyncClient, Client  # noqa: E402
+from django.urls import include, path, reverse  # noqa: E402
+
+from soap_connector.tests.stub import StubServer  # noqa: E402
+
+urlpatterns = [
+    path('api/', include(('soap_connector.urls', 'soap_connector'), namespace='soap_connector')),
+]
+
+
+def url(name, client_pk):
+    return reverse(f'soap_connector:{name}', kwargs={
+        'client_pk': client_pk,
+        'service_pk': 'calculatorservice',
+        'port_pk': 'calculatorport',
+        'operation_pk': 'echo'
+    })
+
+
+def run_sync(client_pk, requests, workers, delay):
+    def call(i):
+        response = Client().post(
+            url('client_operation_detail', client_pk),
+            {'text': str(i), 'delay': delay}, content_type='application/json'
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(call, range(requests)))
+
+
+async def run_async(client_pk, requests, delay):
+    client = AsyncClient()
+    responses = await asyncio.gather(*[
+        client.post(
+            url('client_operation_async', client_pk),
+            {'text': str(i), 'delay': delay}, content_type='application/json'
+        )
+        for i in range(requests)
+    ])
+    return [response.status_code for response in responses]
+
+
+def report(name, start, codes):
+    elapsed = time.monotonic() - start
+    errors = sum(code != 200 for code in codes)
+    print(f'{name:<24} {elapsed:7.2f} s  {len(codes) / elapsed:8.1f} req/s  errors: {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = StubServer().start()
+    try:
+        response = Client().post(
+            reverse('soap_connector:client_list'), {'wsdl': server.wsdl_url},
+            content_type='application/json'
+        )
+        client_pk = response.json()['pk']
+        delay = str(args.delay)
+
+        start = time.monotonic()
+        report(f'sync ({args.workers} workers)', start, run_sync(client_pk, args.requests, args.workers, delay))
+
+        start = time.monotonic()
+        report('async (1 event loop)', start, asyncio.run(run_async(client_pk, args.requests, delay)))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares the time to convert large array responses to JSON-native
+structures with the precompiled converters against zeep's
+``serialize_object``.
+
+    $ python benchmarks/convert.py [--items 10000] [--number 20]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zeep.client import Client  # noqa: E402
+from zeep.helpers import serialize_object  # noqa: E402
+
+from soap_connector.converter import ConverterCache  # noqa: E402
+from soap_connector.tests.stub import StubServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    server = StubServer().start()
+    try:
+        client = Client(server.wsdl_url)
+        converters = ConverterCache()
+
+        for count in [10, 1000, args.items]:
+            result = client.service.ListItems(count=count)
+            converters.convert(result)
+
+            zeep_time = timeit.timeit(lambda: serialize_object(result, dict), number=args.number)
+            converter_time = timeit.timeit(lambda: converters.convert(result), number=args.number)
+
+            print(
+                f'{count:>6} items  serialize_object: {zeep_time / args.number * 1e3:8.2f} ms'
+                f'  converter: {converter_time / args.number * 1e3:8.2f} ms'
+                f'  speedup: {zeep_time / converter_time:5.1f}x'
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Compares the time to build a request envelope from a precompiled
+template against zeep's ``Client.create_message``.
+
+    $ python benchmarks/envelope.py [--number 10000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zeep.client import Client  # noqa: E402
+
+from soap_connector.envelope import EnvelopeTemplate  # noqa: E402
+from soap_connector.tests.stub import StubServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=10000)
+    args = parser.parse_args()
+
+    server = StubServer().start()
+    try:
+        client = Client(server.wsdl_url)
+        binding = client.wsdl.services['CalculatorService'].ports['CalculatorPort'].binding
+
+        for name, values in [('Add', {'a': 1, 'b': 2}), ('Echo', {'text': 'hello', 'delay': 0})]:
+            template = EnvelopeTemplate.compile(client, binding, binding._operations[name])
+
+            zeep_time = timeit.timeit(
+                lambda: client.create_message(client.service, name, **values), number=args.number
+            )
+            template_time = timeit.timeit(lambda: template.render(values), number=args.number)
+
+            print(
+                f'{name:<6} create_message: {zeep_time / args.number * 1e6:8.1f} us'
+                f'  template: {template_time / args.number * 1e6:8.1f} us'
+                f'  speedup: {zeep_time / template_time:5.1f}x'
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
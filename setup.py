@@ -15,6 +15,7 @@ setup(
     install_requires=['django', 'djangorestframework', 'zeep'],
     # $ pip install -e .[dev,test]
     extras_require={
+        'async': ['httpx<0.28'],
         'dev': [],
         'test': [],
     },
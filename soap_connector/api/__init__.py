@@ -1,13 +1,17 @@
-from .base import root, registry
+from .base import root, registry, metrics, backend, slow_call
 from .settings import settings
+from .transport import transport
 from .client import client, global_type, global_element, prefix, binding
 from .service import service
 from .port import port
-from .operation import operation
+from .operation import operation, async_operation
+from .batch import batch
+from .job import job
 from .wsse import signature, username_token
 
 
 __all__ = [
-    'root', 'registry', 'settings', 'client', 'global_type', 'global_element', 'prefix',
-    'binding', 'signature', 'username_token', 'service', 'port', 'operation'
+    'root', 'registry', 'metrics', 'backend', 'settings', 'transport', 'client', 'global_type',
+    'global_element', 'prefix', 'binding', 'signature', 'username_token', 'service', 'port', 'operation',
+    'async_operation', 'batch', 'job', 'slow_call'
 ]
@@ -1,6 +1,8 @@
 from typing import Type, List, ClassVar, Optional
 from contextlib import contextmanager
 
+from django.http import HttpResponse
+
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
@@ -11,16 +13,20 @@ from rest_framework.serializers import Serializer
 
 from zeep.client import Client
 
-from soap_connector.cache import Cache, Context
+from soap_connector import timing, tracing
+from soap_connector.cache import Cache, Context, make_key
 from soap_connector.cache import Registry
-from soap_connector.connector import Connector
-from soap_connector.cache import CacheIterator
+from soap_connector.connector import Connector, Snapshot
 from soap_connector.exceptions import ConnectorError, CacheError
-from soap_connector.api.mixins import SerializerMixin
+from soap_connector.metrics import CONTENT_TYPE, registry as metric_registry
+from soap_connector.resilience import backends
+from soap_connector.slowlog import slow_calls
+from soap_connector.api.mixins import SerializerMixin, CursorPaginationMixin
 
 DEFAULT_DEPTH = 2
 URL_NAMES = [
-    'settings_list', 'client_list', 'signature_list', 'username_token_list', 'registry_list'
+    'settings_list', 'transport_list', 'client_list', 'signature_list', 'username_token_list', 'registry_list',
+    'metrics_list', 'backend_list', 'job_list', 'slow_call_list'
 ]
 
 
@@ -53,6 +59,44 @@ def registry(request):
     return Response(Registry.dump(depth=depth))
 
 
+@api_view()
+def metrics(request):
+    """
+    Returns the counters and latency histograms of the process
+    in the Prometheus text format.
+
+    :param request:
+    :return:
+    """
+    return HttpResponse(metric_registry.render(), content_type=CONTENT_TYPE)
+
+
+@api_view()
+def backend(request):
+    """
+    Returns the state of the circuit breaker and of the
+    bulkhead of every backend called by the user in this
+    process.
+
+    :param request:
+    :return:
+    """
+    return Response(backends.state(make_key({'request': request})))
+
+
+@api_view()
+def slow_call(request):
+    """
+    Returns the last operation calls and WSDL loads of the user
+    slower than the threshold, the most recent first, optionally
+    filtered by their `kind`.
+
+    :param request:
+    :return:
+    """
+    return Response(slow_calls.list(request.query_params.get('kind'), make_key({'request': request})))
+
+
 class BaseAPIView(SerializerMixin, APIView):
     """
     This class extends REST framework's APIView class, adding
@@ -64,6 +108,45 @@ class BaseAPIView(SerializerMixin, APIView):
 
     get_context = SerializerMixin.get_serializer_context
 
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Runs the request in a span continuing the trace of the
+        caller, if any.
+
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        with tracing.span(
+                'http.request', traceparent=request.headers.get(tracing.TRACEPARENT_HEADER),
+                method=request.method, path=request.path, view=type(self).__name__
+        ) as span:
+            response = self.dispatch_timed(request, *args, **kwargs)
+            span.set_attribute('status', response.status_code)
+        return response
+
+    def dispatch_timed(self, request, *args, **kwargs):
+        """
+        Times the phases of the request when enabled, and adds
+        their durations to the response in the Server-Timing
+        header.
+
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        if not timing.enabled():
+            return super().dispatch(request, *args, **kwargs)
+
+        with timing.collect() as timings:
+            response = super().dispatch(request, *args, **kwargs)
+            timing.render(response)
+
+        response[timing.HEADER] = timings.header()
+        return response
+
     def set_context(
             self,
             object_class: type,
@@ -178,18 +261,30 @@ class BaseAPIView(SerializerMixin, APIView):
         pk: int = kwargs.get(self.object_pk_name, None)
 
         if pk in self.cache:
-            del self.cache[pk]
+            self.perform_destroy(pk)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_404_NOT_FOUND)
 
+    def perform_destroy(self, pk: int) -> None:
+        """
+        Deletes an object.
 
-class ConnectorView(BaseAPIView):
+        :param pk:
+        :return:
+        """
+        del self.cache[pk]
+
+
+class ConnectorView(CursorPaginationMixin, BaseAPIView):
     """
     Class to provide read-only methods to interact with a SOAP
     server through connector.
     """
     source_name: ClassVar[str] = ''
+    paginated: ClassVar[bool] = False
+    connector: Optional[Connector] = None
+    snapshot: Optional[Snapshot] = None
 
     @property
     def allowed_methods(self):
@@ -204,50 +299,71 @@ class ConnectorView(BaseAPIView):
     def list(self, request: Request, **kwargs) -> Response:
         """
         Concrete view for listing a collection of objects
-        from connector.
+        from the client snapshot.
 
         :param request:
         :param kwargs:
         :return:
         """
         try:
-            with self.with_context(Client):
-                connector = Connector.from_view(self)
+            snapshot = self.get_snapshot()
         except (CacheError, ConnectorError):
             return Response(status=status.HTTP_409_CONFLICT)
         else:
-            data = getattr(connector, self.source_name, None)
+            if snapshot and self.paginated and self.is_paginated():
+                return self.paginate(snapshot, self.source_name)
+
+            data = snapshot.render(self.source_name) if snapshot else None
             if data:
-                self.perform_create(data)
                 return Response(data, status=status.HTTP_200_OK)
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    def save(self, object_list, cls, lookup=None):
+    def get(self, request: Request, *args, **kwargs) -> Response:
         """
-        Iterates on object_list and its recursively nested lists.
+        Concrete view for retrieve an object from the client
+        snapshot.
 
-        :param object_list: Current object list
-        :param cls: Class to which the context belongs
-        :param lookup: Indicates the sublists on which to nest
+        :param request:
         :return:
         """
-        iterator = CacheIterator(object_list, cls, self)
+        if kwargs.get(self.object_pk_name, None) is None:
+            return self.list(request)
+
+        try:
+            snapshot = self.get_snapshot()
+        except (CacheError, ConnectorError):
+            return Response(status=status.HTTP_409_CONFLICT)
+
+        data = snapshot.get(self.source_name, kwargs) if snapshot else None
+        code: int = status.HTTP_200_OK if data else status.HTTP_404_NOT_FOUND
+
+        return Response(data, status=code)
+
+    def get_connector(self) -> Optional[Connector]:
+        """
+        Provides the connector of the current request. It's
+        resolved once and reused for the rest of the request's
+        life.
 
-        while True:
-            try:
-                item = next(iterator)
-                if lookup:
-                    key, cls = lookup.pop(0)
-                    self.save(item[key], cls, lookup)
+        :return:
+        """
+        if self.connector is None:
+            with self.with_context(Client):
+                self.connector = Connector.from_view(self)
 
-            except StopIteration:
-                break
+        return self.connector
 
-    def perform_create(self, object_list):
+    def get_snapshot(self) -> Optional[Snapshot]:
         """
-        Saves an object list.
+        Provides the introspection snapshot of the client of
+        the current request.
 
-        :param object_list:
         :return:
         """
-        self.save(object_list, self.object_class)
+        if self.snapshot is None:
+            with self.with_context(Client):
+                client = self.get_object()
+            if client:
+                self.snapshot = Snapshot.from_view(self, client)
+
+        return self.snapshot
@@ -0,0 +1,48 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.request import Request
+
+from zeep.wsdl.definitions import Operation
+
+from soap_connector.api.client import ConnectorView
+from soap_connector.exceptions import CacheError, ConnectorError
+from soap_connector.serializers import BatchSerializer
+
+
+class BatchView(ConnectorView):
+    """
+    Calls many operations of a client in a single request.
+    """
+    object_class = Operation
+    serializer_class = BatchSerializer
+    http_method_names = ['post', 'options']
+
+    @property
+    def allowed_methods(self):
+        """
+
+        :return:
+        """
+        return ['POST']
+
+    def post(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Resolves the client once before its calls are run
+        concurrently.
+
+        :param request:
+        :return:
+        """
+        try:
+            self.get_connector()
+            snapshot = self.get_snapshot()
+        except (CacheError, ConnectorError):
+            return Response(status=status.HTTP_409_CONFLICT)
+
+        if snapshot is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        return super().post(request, *args, **kwargs)
+
+
+batch = BatchView.as_view()
@@ -6,6 +6,7 @@ from zeep.wsdl.definitions import Binding
 from zeep.xsd.types import Type
 from zeep.xsd.elements import Element
 
+from soap_connector.connector import Connector, Snapshot
 from soap_connector.serializers import ClientSerializer
 from soap_connector.api.base import BaseAPIView, ConnectorView
 
@@ -21,6 +22,20 @@ class ClientView(BaseAPIView):
     object_class = Client
     object_pk_name: ClassVar[str] = 'client_pk'
 
+    def perform_destroy(self, pk: int) -> None:
+        """
+        Deletes the client and discards its pooled connection
+        and snapshot.
+
+        :param pk:
+        :return:
+        """
+        super().perform_destroy(pk)
+        Connector.invalidate(self.get_context(), pk)
+
+        with self.with_context(Snapshot):
+            del self.cache[pk]
+
 
 class GlobalTypeView(ConnectorView):
     """
@@ -28,6 +43,7 @@ class GlobalTypeView(ConnectorView):
     """
     object_class = Type
     source_name: ClassVar[str] = 'global_types'
+    paginated: ClassVar[bool] = True
     object_pk_name: ClassVar[str] = 'type_pk'
 
 
@@ -37,6 +53,7 @@ class GlobalElementView(ConnectorView):
     """
     object_class = Element
     source_name: ClassVar[str] = 'global_elements'
+    paginated: ClassVar[bool] = True
     object_pk_name: ClassVar[str] = 'element_pk'
 
 
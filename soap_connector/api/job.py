@@ -0,0 +1,52 @@
+import logging
+from typing import ClassVar
+
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from soap_connector.api.base import BaseAPIView
+from soap_connector.cache import Cache
+from soap_connector.jobs import Job, queue
+from soap_connector.serializers import JobSerializer
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH_HEADER = 'X-Queue-Depth'
+
+
+class JobView(BaseAPIView):
+    """
+    Read-only interface to poll the operation calls run in the
+    background.
+    """
+    serializer_class = JobSerializer
+    object_class = Job
+    object_pk_name: ClassVar[str] = 'job_pk'
+    http_method_names = ['get', 'options']
+
+    @classmethod
+    def store(cls, request: Request) -> Cache:
+        """
+        Returns the cache of the jobs of the requesting user.
+
+        :param request:
+        :return:
+        """
+        return cls(request=request, args=(), kwargs={}).cache
+
+    def finalize_response(self, request: Request, response: Response, *args, **kwargs) -> Response:
+        """
+        Adds the number of queued jobs of the process to the
+        response.
+
+        :param request:
+        :param response:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        response[QUEUE_DEPTH_HEADER] = queue.queued
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+job = JobView.as_view()
@@ -1,10 +1,22 @@
-from typing import Type, ClassVar
+import base64
+import binascii
+import json
+from typing import Type, ClassVar, Iterator, Optional
 
+from django.http import StreamingHttpResponse
+
+from rest_framework import status
 from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.serializers import Serializer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param, remove_query_param
 
 from soap_connector.cache import Cache, Context
 
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
 
 class SerializerMixin(object):
     """
@@ -49,3 +61,121 @@ class SerializerMixin(object):
             'request': self.request,
             'view': self
         }
+
+
+class CursorPaginationMixin(object):
+    """
+    Mixin that paginates the items of a snapshot source using
+    an opaque cursor, and optionally streams them as they are
+    rendered.
+    """
+    request: Request = None
+    cursor_query_param: ClassVar[str] = 'cursor'
+    limit_query_param: ClassVar[str] = 'limit'
+    stream_query_param: ClassVar[str] = 'stream'
+
+    @staticmethod
+    def encode_cursor(offset: int) -> str:
+        """
+        Returns the opaque cursor of a position.
+
+        :param offset:
+        :return:
+        """
+        return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> int:
+        """
+        Returns the position pointed by an opaque cursor.
+
+        :param cursor:
+        :return:
+        """
+        offset = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if offset < 0:
+            raise ValueError(cursor)
+        return offset
+
+    def is_paginated(self) -> bool:
+        """
+        Returns true if the request asks for a page or a
+        stream of items.
+
+        :return:
+        """
+        params = self.request.query_params
+
+        return any(
+            name in params for name in
+            [self.cursor_query_param, self.limit_query_param, self.stream_query_param]
+        )
+
+    def get_page_url(self, offset: Optional[int]) -> Optional[str]:
+        """
+        Returns the url of the page starting at the given
+        position.
+
+        :param offset:
+        :return:
+        """
+        if offset is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        if not offset:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(offset))
+
+    def paginate(self, snapshot: "Snapshot", source_name: str) -> Response:
+        """
+        Returns a page of items starting at the cursor, or
+        streams them when requested.
+
+        :param snapshot:
+        :param source_name:
+        :return:
+        """
+        params = self.request.query_params
+        streamed = params.get(self.stream_query_param, '').lower() in ('1', 'true', 'yes')
+
+        try:
+            cursor = params.get(self.cursor_query_param)
+            offset = self.decode_cursor(cursor) if cursor else 0
+            limit = params.get(self.limit_query_param)
+            limit = int(limit) if limit else None
+            if limit is not None and limit < 1:
+                raise ValueError(limit)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        if streamed:
+            items = snapshot.iterate(source_name, offset, limit)
+            return StreamingHttpResponse(self.stream(items), content_type='application/json')
+
+        limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+        items = snapshot.iterate(source_name, offset, limit)
+
+        count = snapshot.count(source_name)
+        data = {
+            'count': count,
+            'next': self.get_page_url(offset + limit if offset + limit < count else None),
+            'previous': self.get_page_url(max(offset - limit, 0) if offset else None),
+            'results': list(items)
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def stream(items: Iterator[dict]) -> Iterator[str]:
+        """
+        Encodes a JSON array item by item.
+
+        :param items:
+        :return:
+        """
+        separator = '['
+        for item in items:
+            yield separator + json.dumps(item, cls=JSONEncoder)
+            separator = ','
+
+        yield ']' if separator == ',' else '[]'
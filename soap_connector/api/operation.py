@@ -1,15 +1,26 @@
-from typing import ClassVar
+import asyncio
+from typing import ClassVar, Optional, Type
 
-from rest_framework import status
+from asgiref.sync import sync_to_async
+
+from django.http import StreamingHttpResponse
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.request import Request
 from rest_framework.serializers import Serializer
 
 from zeep.wsdl.definitions import Operation
 
+from soap_connector import deadline, jobs, timing, tracing
 from soap_connector.api.client import ConnectorView
-from soap_connector.serializers import OperationSerializer
+from soap_connector.api.job import JobView, QUEUE_DEPTH_HEADER
 from soap_connector.cache import Context
+from soap_connector.deadline import Deadline
+from soap_connector.serializers import JobSerializer, OperationSerializer
+from soap_connector.transport import StreamedResponse
 
 
 class OperationView(ConnectorView):
@@ -17,6 +28,8 @@ class OperationView(ConnectorView):
     serializer_class = OperationSerializer
     source_name: ClassVar[str] = 'operations'
     object_pk_name: ClassVar[str] = 'operation_pk'
+    raw: bool = False
+    background: bool = False
 
     @property
     def allowed_methods(self):
@@ -26,19 +39,255 @@ class OperationView(ConnectorView):
         """
         return ['GET', 'POST']
 
+    def get_serializer_class(self) -> Type[Serializer]:
+        """
+        Provides the serializer class compiled for the requested
+        operation.
+
+        :return:
+        """
+        serializer_class = super().get_serializer_class()
+        return serializer_class.compile(self.get_serializer_context())
+
+    def get_serializer_context(self) -> Context:
+        """
+        Defers the call of the operation to the view when the
+        response is streamed or the call is run in background.
+
+        :return:
+        """
+        context = super().get_serializer_context()
+        if self.raw or self.background:
+            context.update(deferred=True)
+        return context
+
+    def is_background(self) -> bool:
+        """
+        Returns true if the call must be run as a job, as
+        requested by the `async` query parameter.
+
+        :return:
+        """
+        value = self.request.query_params.get('async', '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def is_raw(self) -> bool:
+        """
+        Returns true if the response of the server must be
+        streamed as is, as requested by the `raw` query
+        parameter or else by the settings of the client.
+
+        :return:
+        """
+        raw = self.request.query_params.get('raw')
+        if raw is not None:
+            return raw.lower() in ('1', 'true', 'yes')
+
+        connector = self.get_connector()
+        return bool(connector and connector.client.settings.raw_response)
+
     def post(self, request: Request, **kwargs) -> Response:
         """
+        Calls the operation within the deadline given by the
+        caller, if any, from the loading of the WSDL document to
+        the parsing of the response.
 
         :param request:
         :return:
         """
-        context: Context = self.get_serializer_context()
-        serializer: Serializer = self.serializer_class(
-            data=request.data, context=context
+        call_deadline = Deadline.from_request(request)
+
+        self.background = self.is_background()
+        if self.background:
+            serializer: Serializer = self.get_serializer(data=request.data)
+            if serializer.is_valid():
+                return self.submit(serializer, call_deadline)
+            return Response(serializer.errors, status=status.HTTP_409_CONFLICT)
+
+        with deadline.activate(call_deadline):
+            self.raw = self.is_raw()
+
+            serializer: Serializer = self.get_serializer(data=request.data)
+            if serializer.is_valid() and self.raw:
+                try:
+                    response = serializer.stream(serializer.validated_data)
+                except APIException:
+                    raise
+                except Exception as e:
+                    error = serializers.as_serializer_error(serializers.ValidationError(str(e)))
+                    return Response(error, status=status.HTTP_409_CONFLICT)
+                return self.stream(response)
+
+            if not serializer.errors:
+                headers = {'X-Cache': serializer.cache_status} if serializer.cache_status else None
+                return Response(serializer.data, status=status.HTTP_200_OK, headers=headers)
+            return Response(serializer.errors, status=status.HTTP_409_CONFLICT)
+
+    def submit(self, serializer: OperationSerializer, call_deadline: Optional[Deadline]) -> Response:
+        """
+        Queues the call as a job and returns its location, to be
+        polled until it's finished.
+
+        :param serializer:
+        :param call_deadline:
+        :return:
+        """
+        job = jobs.submit(JobView.store(self.request), serializer, call_deadline)
+        if job is None:
+            return Response(
+                {'detail': "The job queue is full, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        location = reverse('soap_connector:job_detail', kwargs={'job_pk': job['pk']}, request=self.request)
+        return Response(
+            JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+            headers={'Location': location, QUEUE_DEPTH_HEADER: jobs.queue.queued}
+        )
+
+    @staticmethod
+    def stream(body: StreamedResponse) -> StreamingHttpResponse:
+        """
+        Streams the body of the server response to the caller
+        as it's received.
+
+        :param body:
+        :return:
+        """
+        return StreamingHttpResponse(
+            body,
+            status=body.response.status_code,
+            content_type=body.response.headers.get('Content-Type', 'text/xml')
         )
-        if serializer.is_valid():
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_409_CONFLICT)
+
+
+class AsyncOperationView(OperationView):
+    """
+    Asynchronous variant of the operation view to be served
+    under ASGI. The call is made through zeep's AsyncClient, so
+    the worker serves other requests during the round trip.
+    """
+    http_method_names = ['post', 'options']
+
+    @property
+    def allowed_methods(self):
+        """
+
+        :return:
+        """
+        return ['POST']
+
+    def get_serializer_context(self) -> Context:
+        """
+        Defers the call of the operation to the view.
+
+        :return:
+        """
+        context = super().get_serializer_context()
+        context.update(deferred=True)
+        return context
+
+    async def dispatch(self, request, *args, **kwargs):
+        """
+        Runs the request in a span continuing the trace of the
+        caller, if any.
+
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        with tracing.span(
+                'http.request', traceparent=request.headers.get(tracing.TRACEPARENT_HEADER),
+                method=request.method, path=request.path, view=type(self).__name__
+        ) as span:
+            response = await self.dispatch_timed(request, *args, **kwargs)
+            span.set_attribute('status', response.status_code)
+        return response
+
+    async def dispatch_timed(self, request, *args, **kwargs):
+        """
+        Times the phases of the request when enabled.
+
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        if not timing.enabled():
+            return await self.dispatch_async(request, *args, **kwargs)
+
+        with timing.collect() as timings:
+            response = await self.dispatch_async(request, *args, **kwargs)
+            timing.render(response)
+
+        response[timing.HEADER] = timings.header()
+        return response
+
+    async def dispatch_async(self, request, *args, **kwargs):
+        """
+        Runs the synchronous steps of the REST framework's
+        dispatch in a thread, and awaits the handler.
+
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            if request.method.lower() not in self.http_method_names:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def post(self, request: Request, **kwargs) -> Response:
+        """
+
+        :param request:
+        :return:
+        """
+        with deadline.activate(Deadline.from_request(request)):
+            serializer: Serializer = await sync_to_async(self.get_validated_serializer)(request.data)
+            if serializer.errors:
+                return Response(serializer.errors, status=status.HTTP_409_CONFLICT)
+
+            try:
+                await serializer.validate_async(serializer.validated_data)
+            except serializers.ValidationError as e:
+                return Response(serializers.as_serializer_error(e), status=status.HTTP_409_CONFLICT)
+
+        headers = {'X-Cache': serializer.cache_status} if serializer.cache_status else None
+        return Response(serializer.data, status=status.HTTP_200_OK, headers=headers)
+
+    def get_validated_serializer(self, data) -> Serializer:
+        """
+        Returns the serializer of the request once its fields
+        have been validated.
+
+        :param data:
+        :return:
+        """
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid()
+        return serializer
 
 
 operation = OperationView.as_view()
+async_operation = AsyncOperationView.as_view()
@@ -1,6 +1,6 @@
 from typing import ClassVar
 
-from zeep.wsdl.definitions import Service, Port, Operation
+from zeep.wsdl.definitions import Service
 
 from soap_connector.api.client import ConnectorView
 
@@ -13,18 +13,5 @@ class ServiceView(ConnectorView):
     source_name: ClassVar[str] = 'services'
     object_pk_name: ClassVar[str] = 'service_pk'
 
-    def perform_create(self, object_list):
-        """
-        Saves service, ports and operations objects.
-
-        :param object_list:
-        :return:
-        """
-        lookup = [
-            ('ports', Port),
-            ('operations', Operation)
-        ]
-        self.save(object_list, Service, lookup)
-
 
 service = ServiceView.as_view()
@@ -0,0 +1,21 @@
+import logging
+from typing import ClassVar
+
+from zeep.transports import Transport
+
+from soap_connector.serializers import TransportSerializer
+from soap_connector.api.base import BaseAPIView
+
+logger = logging.getLogger(__name__)
+
+
+class TransportView(BaseAPIView):
+    """
+
+    """
+    serializer_class = TransportSerializer
+    object_class = Transport
+    object_pk_name: ClassVar[str] = 'transport_pk'
+
+
+transport = TransportView.as_view()
@@ -1,12 +1,25 @@
+import hashlib
+import json
 import logging
-from typing import Dict, List, Union, Optional
+import random
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Union, Optional
 
+from django.conf import settings
 from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 
-from soap_connector.utils import dump_cache
+from soap_connector import timing, tracing
+from soap_connector.exceptions import CoalescingError, RegistryConflict
+from soap_connector.utils import dump_cache, shareable
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LEASE_TIMEOUT = 5
+DEFAULT_LEASE_WAIT = 10
+MAX_LEASE_ATTEMPTS = 10
+
 ObjectList = List[Optional[dict]]
 Context = Dict[
     str,
@@ -27,58 +40,90 @@ def make_key(context: Context, suffix: Optional[str] = None) -> str:
     return ':'.join([pk, suffix]) if suffix else pk
 
 
-class CacheIterator(object):
+class Lease(object):
     """
-    Caches the elements in iterable object according context
-    provided by view.
+    Exclusive right to update a key across workers, held by
+    adding a companion key to the cache, which is atomic in the
+    cache backends. The lease expires after its timeout in case
+    its holder dies.
     """
-    pk_name = 'pk'
+    def __init__(self, key: str, timeout: Optional[float] = None, wait: Optional[float] = None):
+        """
+        Initialize the lease.
+
+        :param key: Key to update
+        :param timeout: Seconds the lease is held at most
+        :param wait: Seconds to wait for the lease
+        """
+        self.key = f'{key}:lease'
+        self.timeout = timeout or getattr(settings, 'SOAP_CONNECTOR_REGISTRY_LEASE_TIMEOUT', DEFAULT_LEASE_TIMEOUT)
+        self.wait = getattr(settings, 'SOAP_CONNECTOR_REGISTRY_LEASE_WAIT', DEFAULT_LEASE_WAIT) if wait is None else wait
+        self.token = uuid.uuid4().hex
+        self.expires = 0.0
 
-    def __init__(self, object_list: ObjectList, cls: type, view: "BaseAPIView"):
+    def acquire(self) -> bool:
         """
-        Initialize the iterator.
+        Waits for the lease, backing off between attempts.
 
-        :param object_list:
-        :param cls:
-        :param view:
+        :return: False if it couldn't be acquired in time
         """
-        self.index = 0
+        deadline = time.monotonic() + self.wait
+        delay = 0.001
 
-        self.object_list = object_list
-        self.cls = cls
-        self.view = view
+        while True:
+            start = time.monotonic()
+            if cache.add(self.key, self.token, timeout=self.timeout):
+                self.expires = start + self.timeout
+                return True
+            if start >= deadline:
+                return False
+            time.sleep(min(delay * random.uniform(0.5, 1.5), max(0.0, deadline - start)))
+            delay = min(delay * 2, 0.05)
 
-    def __iter__(self) -> "CacheIterator":
+    def valid(self) -> bool:
         """
-        Returns the iterator object.
+        Returns true if the lease hasn't expired yet.
 
         :return:
         """
-        return self
+        return time.monotonic() < self.expires
 
-    def __next__(self) -> dict:
+    def release(self) -> None:
         """
-        Caches and returns the object of the current iteration.
+        Releases the lease, unless it has expired and been
+        acquired by another worker.
 
         :return:
         """
-        try:
-            obj = self.object_list[self.index]
-        except IndexError:
-            raise StopIteration
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
 
-        self.index += 1
+    def __enter__(self) -> "Lease":
+        if not self.acquire():
+            raise RegistryConflict(self.key[:-len(':lease')])
+        return self
 
-        with self.view.with_context(self.cls):
-            self.view.cache[obj[self.pk_name]] = obj
-            return obj
+    def __exit__(self, *exc_info) -> None:
+        self.release()
 
 
 class Registry(object):
     """
     Manages a registry of cache versions for each context.
+
+    The versions of each user and object class are kept under
+    their own key, so that updating them costs a constant number
+    of cache operations. The object classes of each user, and
+    the users, are indexed to dump the registries.
+
+    The versions are updated under a lease, which serializes
+    the updates of the workers: a write only happens if the
+    lease hasn't expired since it was acquired, as another
+    worker may hold it then, and is retried otherwise.
     """
-    sessions = set()
+    namespace = 'Registry'
+    sequence_namespace = 'Sequence'
+    index_key = 'Registry'
 
     def __init__(self, context: Context):
         """
@@ -88,21 +133,44 @@ class Registry(object):
         """
         self.key: str = make_key(context)
         self.cls: type = context['view'].object_class
+        self.versions_key: str = self.make_versions_key(self.key, self.cls.__name__)
+        self.sequence_key: str = ':'.join([self.key, self.sequence_namespace, self.cls.__name__])
+
+    @classmethod
+    def make_versions_key(cls, key: str, name: str) -> str:
+        """
+        Returns the key of the versions of an object class in the
+        registry of the given user key.
 
-        if not self.sessions:
-            cache.set(self.key, {})
+        :param key:
+        :param name:
+        :return:
+        """
+        return ':'.join([key, cls.namespace, name])
 
-    def retrieve(self) -> Union[Dict[str, list], List[int]]:
+    def allocate(self) -> int:
         """
-        Retrieve a list of cache versions.
+        Returns a new version, unique across workers, from the
+        counter of the context. The counter starts after the
+        versions in the registry.
 
         :return:
         """
-        versions: dict = cache.get(self.key)
+        with timing.phase(timing.CACHE):
+            try:
+                return cache.incr(self.sequence_key)
+            except ValueError:
+                cache.add(self.sequence_key, max(self.retrieve(), default=0), timeout=None)
+                return cache.incr(self.sequence_key)
 
-        if versions:
-            return versions.get(self.cls.__name__, [])
-        return []
+    def retrieve(self) -> List[int]:
+        """
+        Retrieve a list of cache versions.
+
+        :return:
+        """
+        with timing.phase(timing.CACHE):
+            return cache.get(self.versions_key) or []
 
     def insert(self, version: int, timeout: float = None) -> None:
         """
@@ -112,11 +180,7 @@ class Registry(object):
         :param timeout:
         :return:
         """
-        versions: List[int] = self.retrieve()
-
-        if version not in versions:
-            versions.append(version)
-            self.update(versions, timeout)
+        self.modify(lambda versions: versions + [version] if version not in versions else None, timeout)
 
     def remove(self, version: int) -> None:
         """
@@ -125,11 +189,7 @@ class Registry(object):
         :param version:
         :return:
         """
-        versions: List[int] = self.retrieve()
-
-        if version in versions:
-            versions.remove(version)
-            self.update(versions)
+        self.modify(lambda versions: [v for v in versions if v != version] if version in versions else None)
 
     def update(self, versions: List[int], timeout: float = None) -> None:
         """
@@ -139,14 +199,57 @@ class Registry(object):
         :param timeout:
         :return:
         """
-        self.sessions.add(self.key)
+        self.modify(lambda _: list(versions), timeout)
 
-        data = {
-            x: y for value in dict(**{k: cache.get(k) for k in self.sessions}).values()
-            for x, y in value.items()
-        }
-        data.update(**{self.cls.__name__: versions})
-        cache.set(self.key, data, timeout=timeout)
+    def modify(self, fn: Callable[[List[int]], Optional[List[int]]], timeout: float = None) -> List[int]:
+        """
+        Applies a change to the list of versions atomically. The
+        lease is only taken if the change would modify the list.
+
+        :param fn: Returns the new list of versions, or None to
+        leave it as it is
+        :param timeout:
+        :return: The list of versions
+        """
+        with tracing.span('registry.update', key=self.key, cls=self.cls.__name__) as span, \
+                timing.phase(timing.CACHE):
+            versions = self.retrieve()
+            if fn(list(versions)) is None:
+                return versions
+
+            for attempt in range(MAX_LEASE_ATTEMPTS):
+                with Lease(self.versions_key) as lease:
+                    versions = self.retrieve()
+                    updated = fn(list(versions))
+                    if updated is None:
+                        return versions
+
+                    if lease.valid():
+                        cache.set(self.versions_key, updated, timeout=timeout)
+                        break
+            else:
+                raise RegistryConflict(self.versions_key)
+
+            span.set_attribute('versions', len(updated))
+            span.set_attribute('attempts', attempt + 1)
+            self.register()
+            return updated
+
+    def register(self) -> None:
+        """
+        Adds the object class to the index of the user, and the
+        user to the index of the users, if they're missing.
+
+        :return:
+        """
+        for key, member in [(self.key, self.cls.__name__), (self.index_key, self.key)]:
+            if member in (cache.get(key) or []):
+                continue
+
+            with Lease(key):
+                members: List[str] = cache.get(key) or []
+                if member not in members:
+                    cache.set(key, members + [member], timeout=None)
 
     def reset(self) -> None:
         """
@@ -154,9 +257,7 @@ class Registry(object):
 
         :return:
         """
-        data = {self.cls.__name__: []}
-        cache.set(self.key, data)
-        self.sessions.add(self.key)
+        self.update([])
 
     @classmethod
     def dump(cls, depth=1) -> dict:
@@ -164,7 +265,13 @@ class Registry(object):
 
         :return:
         """
-        data = {k: cache.get(k) for k in cls.sessions}
+        data = {
+            key: {
+                name: cache.get(cls.make_versions_key(key, name)) or []
+                for name in cache.get(key) or []
+            }
+            for key in cache.get(cls.index_key) or []
+        }
         if depth > 1:
             data = dump_cache(depth, data.items())
         return data
@@ -202,8 +309,9 @@ class Cache(object):
         :param version:
         :return:
         """
-        if version in self:
-            data: dict = cache.get(self.key, version=version)
+        with tracing.span('cache.get', key=self.key, version=version) as span, timing.phase(timing.CACHE):
+            data: Optional[dict] = cache.get(self.key, version=version) if version in self else None
+            span.set_attribute('hit', data is not None)
             return data
 
     def __setitem__(self, version: int, data: dict) -> None:
@@ -214,8 +322,9 @@ class Cache(object):
         :param data:
         :return:
         """
-        cache.set(self.key, data, timeout=self.timeout, version=version)
-        self.registry.insert(version, self.timeout)
+        with tracing.span('cache.set', key=self.key, version=version), timing.phase(timing.CACHE):
+            cache.set(self.key, data, timeout=self.timeout, version=version)
+            self.registry.insert(version, self.timeout)
 
     def __delitem__(self, version) -> None:
         """
@@ -224,9 +333,10 @@ class Cache(object):
         :param version:
         :return:
         """
-        if self[version]:
-            cache.delete(self.key, version=version)
-            self.registry.remove(version)
+        with timing.phase(timing.CACHE):
+            if self[version]:
+                cache.delete(self.key, version=version)
+                self.registry.remove(version)
 
     def __contains__(self, version: int):
         """
@@ -258,10 +368,11 @@ class Cache(object):
 
         :return:
         """
-        return [
-            cache.get(self.key, version=version)
-            for version in self.registry.retrieve()
-        ]
+        with timing.phase(timing.CACHE):
+            return [
+                cache.get(self.key, version=version)
+                for version in self.registry.retrieve()
+            ]
 
     @staticmethod
     def clear() -> None:
@@ -272,3 +383,145 @@ class Cache(object):
         :return:
         """
         cache.clear()
+
+
+class ResponseCache(object):
+    """
+    Caches the responses of operations in a dedicated
+    namespace for each context.
+    """
+    namespace = 'Response'
+
+    def __init__(self, context: Context):
+        """
+        Initialize the response cache.
+
+        :param context:
+        """
+        self.prefix: str = make_key(context, self.namespace)
+
+    @staticmethod
+    def digest(arguments: dict) -> str:
+        """
+        Returns a canonical hash of the operation arguments.
+
+        :param arguments:
+        :return:
+        """
+        data = json.dumps(arguments, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def make_key(self, *parts: Any, arguments: dict) -> str:
+        """
+        Returns the key of a response from the parts that
+        identify the operation and its arguments.
+
+        :param parts:
+        :param arguments:
+        :return:
+        """
+        return ':'.join([self.prefix, *map(str, parts), self.digest(arguments)])
+
+    @staticmethod
+    def get(key: str) -> Any:
+        """
+        Gets a response from cache.
+
+        :param key:
+        :return:
+        """
+        with timing.phase(timing.CACHE):
+            return cache.get(key)
+
+    @staticmethod
+    def set(key: str, response: Any, timeout: float) -> None:
+        """
+        Sets a response to cache.
+
+        :param key:
+        :param response:
+        :param timeout:
+        :return:
+        """
+        with timing.phase(timing.CACHE):
+            cache.set(key, response, timeout=timeout)
+
+
+class SharedFlight(object):
+    """
+    Coalesces identical calls across workers through a lock in
+    the shared cache: the worker that claims the lock executes
+    the call and publishes its result for the others. Errors
+    caused by its own deadline aren't published, so that the
+    others claim the lock again.
+    """
+    def __init__(self, timeout: float = 30, interval: float = 0.05):
+        """
+        Initialize the group of calls.
+
+        :param timeout: Seconds a lock is held before it expires
+        :param interval: Seconds between polls of the followers
+        """
+        self.timeout = timeout
+        self.interval = interval
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executes and returns the results of the given function,
+        or waits for the result of the worker holding the lock
+        of the key.
+
+        :param key:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        lock_key, result_key = f'{key}:lock', f'{key}:result'
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            token = uuid.uuid4().hex
+            if cache.add(lock_key, token, timeout=self.timeout):
+                return self.lead(lock_key, result_key, token, fn, *args, **kwargs)
+
+            leader = cache.get(lock_key)
+            while leader is not None and time.monotonic() < deadline:
+                time.sleep(self.interval)
+                result = cache.get(result_key)
+                if result is not None and result[0] == leader:
+                    _, ok, value = result
+                    if not ok:
+                        raise CoalescingError(value)
+                    return value
+                if cache.get(lock_key) != leader:
+                    break
+
+            if time.monotonic() >= deadline:
+                return fn(*args, **kwargs)
+
+    def lead(self, lock_key: str, result_key: str, token: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executes the function and publishes its result under
+        the token of the lock.
+
+        :param lock_key:
+        :param result_key:
+        :param token:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        try:
+            value = fn(*args, **kwargs)
+        except Exception as e:
+            if shareable(e):
+                cache.set(result_key, (token, False, str(e)), timeout=self.timeout)
+            raise
+        else:
+            cache.set(result_key, (token, True, value), timeout=self.timeout)
+            return value
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
@@ -1,37 +1,343 @@
+import functools
+import hashlib
+import itertools
+import json
 import logging
 import operator
-from typing import List
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Hashable, Callable, Iterator, Tuple, Optional, Type
 
+from django.conf import settings
 from django.template.defaultfilters import slugify
 
 from rest_framework.reverse import reverse
 
-from zeep.client import Client
+from zeep.client import AsyncClient, Client
+from zeep.settings import Settings
+from zeep.transports import Transport
 from zeep.wsdl.definitions import Service, Port
 
+from soap_connector import metrics, slowlog, timing, tracing
+from soap_connector.cache import Context, make_key
+from soap_connector.exceptions import ConnectorError
+from soap_connector.transport import AsyncOperationTransport, CachingTransport, document_cache
+from soap_connector.utils import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_SIZE = 32
+
+Section = Dict[str, dict]
+
+# Attributes set by the constructor of zeep 4.1 clients.
+CLIENT_ATTRIBUTES = (
+    'settings', 'transport', 'wsdl', 'wsse', 'plugins', '_default_service',
+    '_default_service_name', '_default_port_name', '_default_soapheaders'
+)
+
+
+def clone_client(client: Client, client_class: Type[Client], **attributes) -> Client:
+    """
+    Returns a client of the given class sharing the parsed WSDL
+    document of another client, with the given attributes
+    replaced. zeep's clients parse the document they're built
+    with, so the attributes set by their constructor are copied
+    instead, which ties it to the version of zeep.
+
+    :param client:
+    :param client_class:
+    :param attributes:
+    :return:
+    """
+    clone = client_class.__new__(client_class)
+    for name in CLIENT_ATTRIBUTES:
+        setattr(clone, name, attributes[name] if name in attributes else getattr(client, name))
+    return clone
+
+
+class ClientPool(object):
+    """
+    Process-wide pool of parsed zeep clients, shared across
+    requests so that the WSDL document is only loaded once.
+    """
+    def __init__(self, size: Optional[int] = None):
+        """
+        Initialize the pool.
+
+        :param size: Maximum number of clients kept in memory
+        """
+        self.size = size
+        self.clients: "OrderedDict[Hashable, Tuple[str, Client]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+        self.stats = Counter()
+
+    @staticmethod
+    def fingerprint(fields: dict) -> str:
+        """
+        Returns a digest of the fields used to build a client.
+
+        :param fields:
+        :return:
+        """
+        data = json.dumps(fields, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def get(self, key: Hashable, fields: dict, loader: Callable[..., Client] = Client) -> Client:
+        """
+        Returns the pooled client for the given key, loading it
+        if it's missing or it was built from different fields.
+        Concurrent loads of the same client are coalesced.
+
+        :param key:
+        :param fields:
+        :param loader:
+        :return:
+        """
+        self.stats['lookups'] += 1
+
+        fingerprint = self.fingerprint(fields)
+        client = self.lookup(key, fingerprint)
+
+        metrics.cache_requests.inc('client', 'miss' if client is None else 'hit')
+        if client is None:
+            client = self.flight.do(
+                (key, fingerprint), self.load, key, fingerprint, fields, loader
+            )
+        return client
+
+    def lookup(self, key: Hashable, fingerprint: str) -> Optional[Client]:
+        """
+        Returns the pooled client if it matches the fingerprint.
+
+        :param key:
+        :param fingerprint:
+        :return:
+        """
+        with self.lock:
+            entry = self.clients.get(key)
+            if entry and entry[0] == fingerprint:
+                self.clients.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+
+    def load(self, key: Hashable, fingerprint: str, fields: dict, loader: Callable[..., Client]) -> Client:
+        """
+        Builds a new client and adds it to the pool.
+
+        :param key:
+        :param fingerprint:
+        :param fields:
+        :param loader:
+        :return:
+        """
+        client = self.lookup(key, fingerprint)
+        if client is not None:
+            return client
+
+        client = loader(**fields)
+
+        with self.lock:
+            self.stats['loads'] += 1
+            self.clients[key] = (fingerprint, client)
+            self.clients.move_to_end(key)
+
+            while self.size is not None and len(self.clients) > self.size:
+                self.clients.popitem(last=False)
+
+        return client
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Removes a client from the pool.
+
+        :param key:
+        :return:
+        """
+        with self.lock:
+            self.clients.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes all clients and resets the statistics.
+
+        :return:
+        """
+        with self.lock:
+            self.clients.clear()
+            self.stats.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Returns true if the pool contains a client for the key.
+
+        :param key:
+        :return:
+        """
+        return key in self.clients
+
+    def __len__(self) -> int:
+        """
+        Returns the number of pooled clients.
+
+        :return:
+        """
+        return len(self.clients)
+
+
+pool = ClientPool(getattr(settings, 'SOAP_CONNECTOR_CLIENT_POOL_SIZE', DEFAULT_POOL_SIZE))
+
 
 class Connector(object):
     """
     Inspects the WSDL document and provides an API's based
     on SOAP server interface.
     """
+    pool: ClientPool = pool
+
     def __init__(self, client_data: dict, **kwargs):
         """
-        Initialize and cache the current SOAP client.
+        Initialize the current SOAP client, reusing the pooled
+        one when available.
 
         :param kwargs:
         """
+        with tracing.span('connector.init', client=client_data['pk'], wsdl=client_data.get('wsdl')) as span:
+            fields = self.fields(client_data, kwargs['context'])
+
+            self.client_pk = client_data['pk']
+            self.options = client_data.get('operations') or {}
+            self.resilience = client_data.get('resilience') or {}
+            self.lane = client_data.get('lane')
+            self.context = kwargs['context']
+            self.fingerprint = self.pool.fingerprint(fields)
+            self.transport = fields['transport']
+
+            key = self.pool_key(self.context, self.client_pk)
+            span.set_attribute('pooled', key in self.pool)
+            self.client = self.pool.get(key, fields, functools.partial(self.load, user=key[0]))
+
+    @classmethod
+    def fields(cls, client_data: dict, context: Context) -> dict:
+        """
+        Returns the serialized client fields used to build the
+        SOAP client, along with the objects it references.
+
+        :param client_data:
+        :param context:
+        :return:
+        """
         from soap_connector.serializers import ClientSerializer
 
         fields = {
             key: value for key, value in client_data.items()
             if client_data and key in ClientSerializer.Meta.fields
         }
-        self.client = Client(**fields)
-        self.client_pk = client_data['pk']
-        self.context = kwargs['context']
+        fields['transport'] = cls.resolve(context, Transport, client_data.get('transport'))
+        fields['settings'] = cls.resolve(context, Settings, client_data.get('settings'))
+
+        return fields
+
+    @staticmethod
+    def resolve(context: Context, object_class: type, pk: Optional[int]) -> dict:
+        """
+        Returns the serialized object referenced by a client,
+        or an empty dict if none is referenced.
+
+        :param context:
+        :param object_class:
+        :param pk:
+        :return:
+        """
+        if pk is None:
+            return {}
+
+        view = context['view']
+        with view.with_context(object_class):
+            data = view.cache[pk]
+
+        if not data:
+            raise ConnectorError(pk, f"{object_class.__name__} with pk={pk} doesn't exist")
+        return {key: value for key, value in data.items() if key != 'pk'}
+
+    @classmethod
+    def load(cls, transport: dict, settings: dict, user: Optional[str] = None, **fields) -> Client:
+        """
+        Loads the WSDL document and builds a new SOAP client.
+
+        :param transport: Serialized transport
+        :param settings: Serialized settings
+        :param user: Key of the user loading the client
+        :param fields:
+        :return:
+        """
+        transport = CachingTransport.from_config(transport, documents=document_cache())
+        try:
+            with slowlog.record(slowlog.WSDL, user=user, wsdl=fields.get('wsdl')), timing.phase(timing.WSDL), \
+                    metrics.track(metrics.wsdl_loads, metrics.wsdl_load_duration):
+                return Client(transport=transport, settings=cls.build_settings(settings), **fields)
+        except Exception as e:
+            raise ConnectorError(fields.get('wsdl'), f"Unable to load WSDL document: {e}") from e
+
+    @staticmethod
+    def build_settings(data: dict) -> Settings:
+        """
+        Builds zeep settings from the serialized ones, whose
+        extra HTTP headers are "Name: value" strings.
+
+        :param data:
+        :return:
+        """
+        data = dict(data)
+        headers = data.pop('extra_http_headers', None)
+
+        if headers:
+            data['extra_http_headers'] = dict(
+                map(str.strip, header.split(':', 1)) for header in headers if ':' in header
+            )
+        return Settings(**data)
+
+    def async_client(self) -> AsyncClient:
+        """
+        Returns an async client sharing the parsed WSDL document
+        and the transport of the pooled client, on the async
+        transport of the running event loop. It gets its own copy
+        of the settings, since the overrides of zeep's settings
+        are thread-local and concurrent coroutines share the
+        thread. Nothing is built that could block the loop.
+
+        :return:
+        """
+        return clone_client(
+            self.client, AsyncClient,
+            transport=AsyncOperationTransport.from_config(self.transport, self.client.transport),
+            settings=Settings(**{
+                key: value for key, value in vars(self.client.settings).items() if key != '_tls'
+            })
+        )
+
+    @staticmethod
+    def pool_key(context: Context, pk: int) -> Tuple[str, int]:
+        """
+        Returns the key of the client in the pool.
+
+        :param context:
+        :param pk:
+        :return:
+        """
+        return make_key(context), pk
+
+    @classmethod
+    def invalidate(cls, context: Context, pk: int) -> None:
+        """
+        Discards the pooled client.
+
+        :param context:
+        :param pk:
+        :return:
+        """
+        cls.pool.invalidate(cls.pool_key(context, pk))
 
     @classmethod
     def from_view(cls, view: 'BaseAPIView') -> "Connector":
@@ -52,52 +358,42 @@ class Connector(object):
             return cls(client, context=context)
 
     @property
-    def prefixes(self) -> List[dict]:
+    def prefixes(self) -> Section:
         """
         Provides namespace prefixes elements.
 
         :return:
         """
-        object_list = []
-
-        for data in self.client.wsdl.types.prefix_map.items():
-            pk = slugify(data[0])
-            url = self.resolver('prefix', prefix_pk=pk)
-            object_list.append({
-                'pk': pk,
-                'prefix': data[0],
-                'namespace': data[1],
-                'url': url})
-
-        return object_list
+        return {
+            slugify(prefix): {'prefix': prefix, 'namespace': namespace}
+            for prefix, namespace in self.client.wsdl.types.prefix_map.items()
+        }
 
     @property
-    def global_elements(self) -> List[dict]:
+    def global_elements(self) -> Section:
         """
         Provides global elements for the given schema.
 
         :return:
         """
         elements = self.client.wsdl.types.elements
-        object_list = []
+        section = {}
 
         for obj in sorted(elements, key=lambda k: k.qname):
             element = obj.signature(schema=self.client.wsdl.types)
             if element:
-                pk = slugify(element)
-                url = self.resolver('global_element', element_pk=pk)
-                object_list.append({'pk': pk, 'global_element': element, 'url': url})
+                section[slugify(element)] = {'global_element': element}
 
-        return object_list
+        return section
 
     @property
-    def global_types(self) -> List[dict]:
+    def global_types(self) -> Section:
         """
         Provides global types for the given schema.
 
         :return:
         """
-        object_list = []
+        section = {}
         for type_obj in sorted(
                 self.client.wsdl.types.types,
                 key=lambda k: k.qname or ''):
@@ -106,100 +402,256 @@ class Connector(object):
             if signature:
                 prefixed_name = type_obj.get_prefixed_name(schema=self.client.wsdl.types)
                 pk = prefixed_name or signature
-                url = self.resolver('global_type', type_pk=slugify(pk))
-                object_list.append({
-                    'pk': slugify(pk),
-                    'prefix': self.resolver('prefix', prefix_pk=pk.rsplit(':', 1)[0]),
+                section[slugify(pk)] = {
+                    'prefix': pk.rsplit(':', 1)[0],
                     'name': type_obj.name,
-                    'signature': signature,
-                    'url': url
-                })
+                    'signature': signature
+                }
 
-        return object_list
+        return section
 
     @property
-    def bindings(self) -> List[dict]:
+    def bindings(self) -> Section:
         """
         Provides binding elements supported by zeep.
 
         :return:
         """
-        object_list = []
+        section = {}
         for binding_obj in sorted(
                 self.client.wsdl.bindings.values(),
                 key=lambda k: str(k)):
-            pk = slugify(binding_obj.name.localname)
-            url = self.resolver('binding', binding_pk=pk)
-            object_list.append({
-                'pk': pk,
+            section[slugify(binding_obj.name.localname)] = {
                 'name': binding_obj.name.localname,
                 'namespace': binding_obj.name.namespace,
-                'port_name': str(binding_obj.port_name),
-                'url': url
-            })
+                'port_name': str(binding_obj.port_name)
+            }
 
-        return object_list
+        return section
 
     @property
-    def services(self) -> List[dict]:
+    def services(self) -> Section:
         """
         Provides available soap services.
 
         :return:
         """
-        object_list = []
-        for service in self.client.wsdl.services.values():
-            pk = slugify(service.name)
-            url = self.resolver('service', service_pk=pk)
-            object_list.append({
-                'pk': pk,
+        return {
+            slugify(service.name): {
                 'name': service.name,
-                'ports': self.ports(service),
-                'url': url
-            })
-
-        return object_list
+                'ports': self.ports(service)
+            } for service in self.client.wsdl.services.values()
+        }
 
-    def ports(self, service: Service) -> List[dict]:
+    def ports(self, service: Service) -> Section:
         """
         Provides available soap ports.
 
         :return:
         """
-        object_list = []
-        for port in service.ports.values():
-            pk = slugify(port.name)
-            url = self.resolver('port', service_pk=slugify(service.name), port_pk=pk)
-            object_list.append({
-                'pk': pk,
+        return {
+            slugify(port.name): {
                 'name': port.name,
-                'operations': self.operations(service, port),
-                'url': url
-            })
-
-        return object_list
+                'operations': self.operations(port)
+            } for port in service.ports.values()
+        }
 
-    def operations(self, service: Service, port: Port) -> List[dict]:
+    @staticmethod
+    def operations(port: Port) -> Section:
         """
         Provides available soap operations.
 
         :return:
         """
-        object_list = []
         operations = sorted(
             port.binding._operations.values(),
             key=operator.attrgetter('name')
         )
-        for operation in operations:
-            pk = slugify(operation.name)
-            url = self.resolver(
-                'operation',
-                service_pk=slugify(service.name),
-                port_pk=slugify(port.name),
-                operation_pk=pk)
-            object_list.append({'pk': pk, 'name': operation.name, 'url': url})
-
-        return object_list
+        return {
+            slugify(operation.name): {'name': operation.name}
+            for operation in operations
+        }
+
+    def inspect(self) -> dict:
+        """
+        Computes the introspection data of the WSDL document.
+
+        :return:
+        """
+        data = {name: getattr(self, name) for name in Snapshot.sources}
+        data['fingerprint'] = self.fingerprint
+
+        return data
+
+
+class Snapshot(object):
+    """
+    Introspection data of a client, computed once from its WSDL
+    document and rendered on each request.
+    """
+    sources = ('prefixes', 'global_elements', 'global_types', 'bindings', 'services')
+    children = {'services': 'ports', 'ports': 'operations'}
+    urls = {
+        'prefixes': ('prefix', 'prefix_pk'),
+        'global_elements': ('global_element', 'element_pk'),
+        'global_types': ('global_type', 'type_pk'),
+        'bindings': ('binding', 'binding_pk'),
+        'services': ('service', 'service_pk'),
+        'ports': ('port', 'port_pk'),
+        'operations': ('operation', 'operation_pk'),
+    }
+
+    def __init__(self, data: dict, client_pk: int, context: Context):
+        """
+        Initialize the snapshot.
+
+        :param data:
+        :param client_pk:
+        :param context:
+        """
+        self.data = data
+        self.client_pk = client_pk
+        self.context = context
+
+    @classmethod
+    def from_view(cls, view: 'BaseAPIView', client_data: dict) -> "Snapshot":
+        """
+        Provides the snapshot of the given client, inspecting
+        its WSDL document only if it's missing or outdated.
+
+        :param view:
+        :param client_data:
+        :return:
+        """
+        context = view.get_serializer_context()
+        pk = client_data['pk']
+        fingerprint = pool.fingerprint(Connector.fields(client_data, context))
+
+        with view.with_context(cls):
+            data = view.cache[pk]
+
+            if not data or data['fingerprint'] != fingerprint:
+                with timing.phase(timing.WSDL):
+                    data = Connector(client_data, context=context).inspect()
+                view.cache[pk] = data
+
+        return cls(data, pk, context)
+
+    def path(self, source_name: str) -> List[str]:
+        """
+        Returns the sources that contain the given one,
+        starting from the top-level one.
+
+        :param source_name:
+        :return:
+        """
+        parents = {child: parent for parent, child in self.children.items()}
+        path = [source_name]
+
+        while path[0] in parents:
+            path.insert(0, parents[path[0]])
+
+        return path
+
+    def find(self, source_name: str, kwargs: dict) -> Optional[dict]:
+        """
+        Returns the raw item identified by the url keyword
+        arguments.
+
+        :param source_name:
+        :param kwargs:
+        :return:
+        """
+        item = self.data
+
+        for name in self.path(source_name):
+            item = item.get(name, {}).get(kwargs.get(self.urls[name][1]))
+            if item is None:
+                return None
+
+        return item
+
+    def get(self, source_name: str, kwargs: dict) -> Optional[dict]:
+        """
+        Returns the rendered item identified by the url keyword
+        arguments.
+
+        :param source_name:
+        :param kwargs:
+        :return:
+        """
+        item = self.find(source_name, kwargs)
+        if item is None:
+            return None
+
+        parents = {
+            self.urls[name][1]: kwargs[self.urls[name][1]]
+            for name in self.path(source_name)[:-1]
+        }
+        return self.render_item(source_name, kwargs[self.urls[source_name][1]], item, parents)
+
+    def render(self, source_name: str) -> List[dict]:
+        """
+        Returns the rendered items of a top-level source.
+
+        :param source_name:
+        :return:
+        """
+        return list(self.iterate(source_name))
+
+    def iterate(self, source_name: str, offset: int = 0, limit: Optional[int] = None) -> Iterator[dict]:
+        """
+        Renders lazily a slice of the items of a top-level
+        source, following their stable order.
+
+        :param source_name:
+        :param offset:
+        :param limit:
+        :return:
+        """
+        items = self.data.get(source_name, {}).items()
+        stop = offset + limit if limit is not None else None
+
+        for pk, item in itertools.islice(items, offset, stop):
+            yield self.render_item(source_name, pk, item)
+
+    def count(self, source_name: str) -> int:
+        """
+        Returns the number of items of a top-level source.
+
+        :param source_name:
+        :return:
+        """
+        return len(self.data.get(source_name, {}))
+
+    def render_item(self, source_name: str, pk: str, item: dict, parents: dict = None) -> dict:
+        """
+        Renders an item adding its primary key and hyperlinks.
+
+        :param source_name:
+        :param pk:
+        :param item:
+        :param parents: Url keyword arguments of the containers
+        :return:
+        """
+        url_name, kwarg = self.urls[source_name]
+        kwargs = {**(parents or {}), kwarg: pk}
+        child = self.children.get(source_name)
+        data = {'pk': pk}
+
+        for key, value in item.items():
+            if key == child:
+                value = [
+                    self.render_item(child, child_pk, child_item, kwargs)
+                    for child_pk, child_item in value.items()
+                ]
+            elif source_name == 'global_types' and key == 'prefix':
+                value = self.resolver('prefix', prefix_pk=value)
+            data[key] = value
+
+        data['url'] = self.resolver(url_name, **kwargs)
+
+        return data
 
     def resolver(self, name, **kwargs) -> str:
         """
@@ -0,0 +1,197 @@
+import threading
+import weakref
+from collections import Counter
+from typing import Any, Callable, List, Tuple
+
+from zeep.helpers import serialize_object
+from zeep.xsd import CompoundValue
+from zeep.xsd.types import AnySimpleType, ComplexType, builtins
+
+Converter = Callable[[Any], Any]
+
+# Simple types whose python values are already JSON-native. Values
+# of the other simple types are converted to their XML lexical form.
+NATIVE_TYPES: Tuple[type, ...] = (
+    builtins.Boolean, builtins.Integer, builtins.Float, builtins.Double,
+    builtins.String, builtins.AnyURI,
+)
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+def fallback(value: Any) -> Any:
+    """
+    Converts a value of an unknown type with zeep's generic
+    walk.
+
+    :param value:
+    :return:
+    """
+    return serialize_object(value, dict)
+
+
+class ConverterCache(object):
+    """
+    Converts zeep results to JSON-native structures with
+    converters precompiled once per XSD type.
+    """
+    def __init__(self):
+        """
+        Initialize the cache.
+        """
+        self.lock = threading.Lock()
+        self.converters: "weakref.WeakKeyDictionary[ComplexType, Converter]" = weakref.WeakKeyDictionary()
+        self.stats = Counter()
+
+    def convert(self, value: Any) -> Any:
+        """
+        Returns the JSON-native structure of a zeep result.
+
+        :param value:
+        :return:
+        """
+        if isinstance(value, CompoundValue):
+            return self.get(value._xsd_type)(value)
+        if isinstance(value, list):
+            return self.convert_list(value)
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return fallback(value)
+
+    def convert_list(self, values: list) -> list:
+        """
+        Converts a list, reusing the converter of the previous
+        item while they share the same type.
+
+        :param values:
+        :return:
+        """
+        result = []
+        xsd_type, converter = None, None
+
+        for value in values:
+            if isinstance(value, CompoundValue):
+                if value._xsd_type is not xsd_type:
+                    xsd_type, converter = value._xsd_type, self.get(value._xsd_type)
+                result.append(converter(value))
+            else:
+                result.append(self.convert(value))
+        return result
+
+    def get(self, xsd_type: ComplexType) -> Converter:
+        """
+        Returns the converter of a complex type, compiling it the
+        first time.
+
+        :param xsd_type:
+        :return:
+        """
+        converter = self.converters.get(xsd_type)
+        if converter is None:
+            converter = self.compile(xsd_type)
+            with self.lock:
+                self.stats['compilations'] += 1
+                converter = self.converters.setdefault(xsd_type, converter)
+        return converter
+
+    def compile(self, xsd_type: ComplexType) -> Converter:
+        """
+        Builds a converter that maps each element and attribute
+        of the type with the converter of its declared type.
+
+        :param xsd_type:
+        :return:
+        """
+        declared = dict(xsd_type.elements)
+        declared.update(xsd_type.attributes)
+
+        namespace = {}
+        items = []
+        for index, name in enumerate(self.names(xsd_type)):
+            item = declared.get(name)
+            converter = self.compile_item(item) if item is not None else fallback
+
+            if converter is identity:
+                items.append(f'{name!r}: values.get({name!r})')
+            else:
+                namespace[f'c{index}'] = converter
+                items.append(f'{name!r}: c{index}(values.get({name!r}))')
+
+        # The dict display avoids a call per native value.
+        source = (
+            'def convert(value):\n'
+            '    values = value.__values__\n'
+            f'    return {{{", ".join(items)}}}\n'
+        )
+        exec(source, namespace)
+        return namespace['convert']
+
+    @staticmethod
+    def names(xsd_type: ComplexType) -> List[str]:
+        """
+        Returns the names of the values of the type, in the
+        order zeep sets them.
+
+        :param xsd_type:
+        :return:
+        """
+        names = []
+        for container_name, container in xsd_type.elements_nested:
+            default = container.default_value
+            names.extend(default.keys() if isinstance(default, dict) else [container_name])
+        names.extend(name for name, _ in xsd_type.attributes)
+        return names
+
+    def compile_item(self, item) -> Converter:
+        """
+        Returns the converter of an element or attribute.
+
+        :param item:
+        :return:
+        """
+        converter = self.compile_type(getattr(item, 'type', None))
+
+        if getattr(item, 'accepts_multiple', False):
+            def convert_list(value):
+                return [converter(child) for child in value] if value is not None else None
+            return convert_list
+
+        return converter
+
+    def compile_type(self, xsd_type) -> Converter:
+        """
+        Returns the converter of a type. Complex values are
+        converted with the converter of their runtime type,
+        which is compiled once.
+
+        :param xsd_type:
+        :return:
+        """
+        if isinstance(xsd_type, ComplexType):
+            get = self.get
+
+            def convert_compound(value):
+                if isinstance(value, CompoundValue):
+                    return get(value._xsd_type)(value)
+                return fallback(value)
+            return convert_compound
+
+        if isinstance(xsd_type, NATIVE_TYPES):
+            return identity
+
+        if isinstance(xsd_type, builtins.Decimal):
+            def convert_decimal(value):
+                return '{:f}'.format(value) if value is not None else None
+            return convert_decimal
+
+        if isinstance(xsd_type, AnySimpleType) and type(xsd_type) is not AnySimpleType:
+            def convert_simple(value):
+                return xsd_type.xmlvalue(value) if value is not None else None
+            return convert_simple
+
+        return fallback
+
+
+converters = ConverterCache()
@@ -0,0 +1,251 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Iterator, Optional, Union, Tuple
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+
+from soap_connector.exceptions import DeadlineExceeded
+
+HEADER = 'X-Request-Timeout'
+QUERY_PARAM = 'timeout'
+
+DEFAULT_SAMPLES = 200
+DEFAULT_PERCENTILE = 99
+DEFAULT_MULTIPLIER = 3
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_MIN_TIMEOUT = 1
+
+Timeout = Union[None, float, Tuple[Optional[float], Optional[float]]]
+
+
+class Deadline(object):
+    """
+    Point in time by which a call must be answered. Every
+    network operation made while it's active is bounded by the
+    time left.
+    """
+    def __init__(self, timeout: float, caller: bool = True):
+        """
+        Initialize the deadline.
+
+        :param timeout: Seconds from now
+        :param caller: The deadline was set by the caller rather
+                       than derived from the latency of the
+                       backend
+        """
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.caller = caller
+
+    @classmethod
+    def from_request(cls, request: Request) -> Optional["Deadline"]:
+        """
+        Returns the deadline given in seconds by the request
+        header or query parameter, if any.
+
+        :param request:
+        :return:
+        """
+        value = request.headers.get(HEADER, request.query_params.get(QUERY_PARAM))
+        if value is None:
+            return None
+
+        try:
+            timeout = float(value)
+        except ValueError:
+            timeout = math.nan
+        if not timeout >= 0 or math.isinf(timeout):
+            raise ParseError(f"Invalid timeout: {value!r}")
+
+        return cls(timeout)
+
+    def remaining(self) -> float:
+        """
+
+        :return:
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+
+        :return:
+        """
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        """
+        Raises DeadlineExceeded if the deadline has passed.
+
+        :return:
+        """
+        if self.expired():
+            raise DeadlineExceeded(self.timeout)
+
+    def clamp(self, timeout: Timeout) -> Timeout:
+        """
+        Returns the timeout, either a number of seconds or a
+        (connect, read) pair as given to requests, bounded by
+        the time left.
+
+        :param timeout:
+        :return:
+        """
+        self.check()
+        remaining = self.remaining()
+
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar('deadline', default=None)
+
+
+def current() -> Optional[Deadline]:
+    """
+    Returns the deadline of the running call.
+
+    :return:
+    """
+    return _current.get()
+
+
+def clamp(timeout: Timeout) -> Timeout:
+    """
+    Bounds a timeout by the deadline of the running call.
+
+    :param timeout:
+    :return:
+    """
+    deadline = current()
+    return timeout if deadline is None else deadline.clamp(timeout)
+
+
+def check() -> None:
+    """
+
+    :return:
+    """
+    deadline = current()
+    if deadline is not None:
+        deadline.check()
+
+
+@contextmanager
+def activate(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Makes the deadline the one of the calls made in the block.
+    Errors raised once it has passed, such as the timeouts it
+    caused, are reported as DeadlineExceeded.
+
+    :param deadline:
+    :return:
+    """
+    if deadline is None:
+        yield None
+        return
+
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        if deadline.expired():
+            raise DeadlineExceeded(deadline.timeout) from e
+        raise
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def limit(timeout: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    Bounds the calls made in the block by the timeout of the
+    operation, unless the current deadline is closer.
+
+    :param timeout:
+    :return:
+    """
+    deadline = current()
+    if timeout is not None and (deadline is None or timeout < deadline.remaining()):
+        deadline = Deadline(timeout, caller=False)
+
+    with activate(deadline) as deadline:
+        yield deadline
+
+
+class LatencyTracker(object):
+    """
+    Latencies of the latest calls to an operation, from which
+    its adaptive timeout is derived.
+    """
+    def __init__(self, size: int = DEFAULT_SAMPLES):
+        """
+        Initialize the tracker.
+
+        :param size: Number of latencies kept
+        """
+        self.lock = threading.Lock()
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        """
+
+        :param seconds:
+        :return:
+        """
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Returns the p-th percentile of the latencies, using the
+        nearest rank method.
+
+        :param p:
+        :return:
+        """
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+
+        rank = max(1, math.ceil(p / 100 * len(samples)))
+        return samples[rank - 1]
+
+    def timeout(self) -> Optional[float]:
+        """
+        Returns a multiple of the latency percentile given by the
+        project settings, once enough calls have been observed.
+
+        :return:
+        """
+        if len(self.samples) < getattr(settings, 'SOAP_CONNECTOR_ADAPTIVE_MIN_SAMPLES', DEFAULT_MIN_SAMPLES):
+            return None
+
+        latency = self.percentile(getattr(settings, 'SOAP_CONNECTOR_ADAPTIVE_PERCENTILE', DEFAULT_PERCENTILE))
+        return max(
+            latency * getattr(settings, 'SOAP_CONNECTOR_ADAPTIVE_MULTIPLIER', DEFAULT_MULTIPLIER),
+            getattr(settings, 'SOAP_CONNECTOR_ADAPTIVE_MIN_TIMEOUT', DEFAULT_MIN_TIMEOUT)
+        )
+
+    def state(self) -> dict:
+        """
+
+        :return:
+        """
+        return {
+            'samples': len(self.samples),
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'timeout': self.timeout()
+        }
@@ -0,0 +1,195 @@
+import copy
+import threading
+import weakref
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from lxml import etree
+
+from zeep.client import Client
+from zeep.wsdl.bindings.soap import SoapBinding
+from zeep.wsdl.definitions import Operation
+from zeep.xsd import Nil
+from zeep.xsd.const import xsi_ns
+from zeep.xsd.elements import Element, Sequence
+from zeep.xsd.types import AnySimpleType, ComplexType
+
+Path = Tuple[int, ...]
+
+
+class EnvelopeTemplate(object):
+    """
+    Precompiled SOAP envelope of an operation. Each call only
+    fills in the text of the leaf elements of a copy of the
+    skeleton built by zeep.
+    """
+    def __init__(self, skeleton: etree._Element, leaves: Dict[str, Tuple[Path, AnySimpleType]], headers: dict):
+        """
+        Initialize the template.
+
+        :param skeleton: Envelope with empty leaf elements
+        :param leaves: Path and type of the leaf element of each parameter
+        :param headers: HTTP headers of the request
+        """
+        self.skeleton = skeleton
+        self.leaves = leaves
+        self.headers = headers
+
+    @classmethod
+    def compile(cls, client: Client, binding: SoapBinding, operation: Operation) -> Optional["EnvelopeTemplate"]:
+        """
+        Builds the template of an operation whose input is a flat
+        sequence of simple elements, or returns None if its
+        shape cannot be templated.
+
+        :param client:
+        :param binding:
+        :param operation:
+        :return:
+        """
+        body = getattr(operation.input, 'body', None)
+        if (
+                body is None or client.wsse or client.plugins or
+                operation.abstract.wsa_action or
+                getattr(operation.input, 'header', None) and operation.input.header.type.elements or
+                not isinstance(body.type, ComplexType) or body.type.attributes
+        ):
+            return None
+
+        elements = []
+        for name, item in body.type.elements_nested:
+            children = list(item) if isinstance(item, Sequence) and not item.accepts_multiple else [item]
+
+            for element in children:
+                if (
+                        not isinstance(element, Element) or element.accepts_multiple or
+                        not isinstance(element.type, AnySimpleType)
+                ):
+                    return None
+                elements.append((element.attr_name, element))
+
+        envelope, headers = binding._create(
+            operation.name, (), {name: Nil for name, _ in elements},
+            client=client, options={'address': None}
+        )
+
+        body_node = envelope.find(etree.QName(binding.nsmap['soap-env'], 'Body').text)
+        if body_node is None or len(body_node) != 1 or len(body_node[0]) != len(elements):
+            return None
+
+        leaves = {}
+        wrapper = body_node[0]
+        for index, ((name, element), node) in enumerate(zip(elements, wrapper)):
+            if node.tag != element.qname.text:
+                return None
+            del node.attrib[xsi_ns('nil')]
+            leaves[name] = (
+                (envelope.index(body_node), body_node.index(wrapper), index),
+                element.type
+            )
+
+        etree.cleanup_namespaces(envelope)
+        return cls(envelope, leaves, dict(headers))
+
+    def accepts(self, values: dict) -> bool:
+        """
+        Returns true if the template can render the values.
+
+        :param values:
+        :return:
+        """
+        return (
+            values.keys() == self.leaves.keys() and
+            all(value is not None for value in values.values())
+        )
+
+    def render(self, values: dict) -> etree._Element:
+        """
+        Returns a new envelope with the given values.
+
+        :param values:
+        :return:
+        """
+        envelope = copy.deepcopy(self.skeleton)
+
+        for name, (path, xsd_type) in self.leaves.items():
+            node = envelope
+            for index in path:
+                node = node[index]
+            node.text = xsd_type.xmlvalue(values[name])
+
+        return envelope
+
+    def send(self, client: Client, binding: SoapBinding, operation: Operation, address: str, values: dict):
+        """
+        Posts the rendered envelope and processes the reply as
+        zeep would.
+
+        :param client:
+        :param binding:
+        :param operation:
+        :param address:
+        :param values:
+        :return:
+        """
+        envelope = self.render(values)
+        response = client.transport.post_xml(address, envelope, dict(self.headers))
+
+        if client.settings.raw_response:
+            return response
+        return binding.process_reply(client, operation, response)
+
+    async def send_async(self, client: Client, binding: SoapBinding, operation: Operation, address: str, values: dict):
+        """
+        Posts the rendered envelope through an async transport.
+
+        :param client:
+        :param binding:
+        :param operation:
+        :param address:
+        :param values:
+        :return:
+        """
+        envelope = self.render(values)
+        response = await client.transport.post_xml(address, envelope, dict(self.headers))
+
+        if client.settings.raw_response:
+            return response
+        return binding.process_reply(client, operation, response)
+
+
+class TemplateCache(object):
+    """
+    Compiled envelope templates by operation.
+    """
+    def __init__(self):
+        """
+        Initialize the cache.
+        """
+        self.lock = threading.Lock()
+        self.templates: "weakref.WeakKeyDictionary[Operation, tuple]" = weakref.WeakKeyDictionary()
+        self.stats = Counter()
+
+    def get(self, client: Client, binding: SoapBinding, operation: Operation) -> Optional[EnvelopeTemplate]:
+        """
+        Returns the template of the operation, or None if it
+        cannot be templated.
+
+        :param client:
+        :param binding:
+        :param operation:
+        :return:
+        """
+        with self.lock:
+            entry = self.templates.get(operation)
+
+        if entry is None:
+            entry = (EnvelopeTemplate.compile(client, binding, operation),)
+            with self.lock:
+                self.stats['compilations'] += 1
+                entry = self.templates.setdefault(operation, entry)
+
+        return entry[0]
+
+
+templates = TemplateCache()
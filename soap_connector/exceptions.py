@@ -1,5 +1,9 @@
+import math
 from typing import Type, Any
 
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
 
 class ConnectorError(Exception):
     """
@@ -23,3 +27,49 @@ class CacheError(Exception):
         )
         self.cache = cache
         self.pk = pk
+
+
+class RegistryConflict(APIException):
+    """
+    Exception for registry updates that couldn't acquire the
+    lease of the registry in time.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_code = 'registry_conflict'
+
+    def __init__(self, key: str):
+        super().__init__(f"The registry {key} is being updated by other requests, try again later.")
+        self.key = key
+
+
+class CoalescingError(Exception):
+    """
+    Exception for a failed call shared with other workers.
+    """
+
+
+class BackendUnavailable(APIException):
+    """
+    Exception for calls rejected by the circuit breaker or the
+    bulkhead of a backend.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_code = 'backend_unavailable'
+
+    def __init__(self, address: str, retry_after: float = 0):
+        super().__init__(f"The SOAP server at {address} is unavailable, try again later.")
+        self.address = address
+        self.wait = math.ceil(retry_after) or None
+
+
+class DeadlineExceeded(APIException):
+    """
+    Exception for calls that couldn't be answered before the
+    deadline set by the caller or the timeout of the operation.
+    """
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_code = 'deadline_exceeded'
+
+    def __init__(self, timeout: float):
+        super().__init__(f"The call didn't finish within its deadline of {timeout:g} seconds.")
+        self.timeout = timeout
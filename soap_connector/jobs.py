@@ -0,0 +1,199 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from rest_framework import status
+
+from soap_connector.cache import Cache
+from soap_connector.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_WORKERS = 4
+DEFAULT_JOB_QUEUE_SIZE = 1000
+DEFAULT_JOB_RETENTION = 100
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job(object):
+    """
+    Operation call run in the background, whose status and
+    result are kept in cache to be polled.
+    """
+
+
+class JobQueue(object):
+    """
+    Process-wide pool of threads running the jobs, with a
+    bounded number of queued jobs.
+    """
+    def __init__(self):
+        """
+        Initialize the queue. The threads are started with the
+        first job.
+        """
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.queued = 0
+        self.running = 0
+        self.stats = Counter()
+
+    @property
+    def workers(self) -> int:
+        """
+
+        :return:
+        """
+        return getattr(settings, 'SOAP_CONNECTOR_JOB_WORKERS', DEFAULT_JOB_WORKERS)
+
+    @property
+    def size(self) -> int:
+        """
+
+        :return:
+        """
+        return getattr(settings, 'SOAP_CONNECTOR_JOB_QUEUE_SIZE', DEFAULT_JOB_QUEUE_SIZE)
+
+    def submit(self, fn: Callable[[], None]) -> bool:
+        """
+        Queues a job, unless the queue is full.
+
+        :param fn:
+        :return: False if the job was rejected
+        """
+        with self.lock:
+            if self.queued >= self.size:
+                self.stats['rejected'] += 1
+                return False
+
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='soap_connector_job')
+            self.queued += 1
+            self.stats['submitted'] += 1
+            self.executor.submit(self.run, fn)
+        return True
+
+    def run(self, fn: Callable[[], None]) -> None:
+        """
+
+        :param fn:
+        :return:
+        """
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            fn()
+        except Exception:
+            logger.exception("Job failed unexpectedly")
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.stats['completed'] += 1
+
+    def state(self) -> dict:
+        """
+        Returns the depth of the queue.
+
+        :return:
+        """
+        return {
+            'workers': self.workers,
+            'capacity': self.size,
+            'queued': self.queued,
+            'running': self.running,
+            **self.stats
+        }
+
+
+queue = JobQueue()
+
+
+def submit(
+        store: Cache,
+        serializer: "OperationSerializer",
+        call_deadline: Optional[Deadline] = None
+) -> Optional[dict]:
+    """
+    Stores a new job calling the operation of the validated
+    serializer and queues it. Returns None if the queue is full.
+
+    :param store: Cache of the jobs of the caller
+    :param serializer:
+    :param call_deadline:
+    :return:
+    """
+    job = {
+        'pk': store.registry.allocate(),
+        'state': QUEUED,
+        'client': serializer.connector.client_pk,
+        'service': serializer.service.name,
+        'port': serializer.port.name,
+        'operation': serializer.operation.name,
+        'created_at': timezone.now(),
+        'started_at': None,
+        'finished_at': None,
+        'result': None
+    }
+    store[job['pk']] = job
+
+    if not queue.submit(lambda: run(store, dict(job), serializer, call_deadline)):
+        del store[job['pk']]
+        return None
+
+    prune(store)
+    return job
+
+
+def run(store: Cache, job: dict, serializer: "OperationSerializer", call_deadline: Optional[Deadline]) -> None:
+    """
+    Calls the operation and stores the result of the job.
+
+    :param store:
+    :param job:
+    :param serializer:
+    :param call_deadline:
+    :return:
+    """
+    job.update(state=RUNNING, started_at=timezone.now())
+    store[job['pk']] = job
+
+    try:
+        result = serializer.run(call_deadline)
+    except Exception as e:
+        logger.exception("Job %s failed", job['pk'])
+        result = {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'errors': [str(e)]}
+
+    job.update(
+        state=DONE if result['status'] == status.HTTP_200_OK else FAILED,
+        finished_at=timezone.now(),
+        result=result
+    )
+    store[job['pk']] = job
+
+
+def prune(store: Cache) -> None:
+    """
+    Deletes the oldest finished jobs beyond the retention limit.
+
+    :param store:
+    :return:
+    """
+    retention = getattr(settings, 'SOAP_CONNECTOR_JOB_RETENTION', DEFAULT_JOB_RETENTION)
+    versions = store.registry.retrieve()
+
+    for pk in versions[:max(0, len(versions) - retention)]:
+        job = store[pk]
+        if job is None:
+            store.registry.remove(pk)
+        elif job['state'] in (DONE, FAILED):
+            del store[pk]
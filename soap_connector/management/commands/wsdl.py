@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand, CommandError
 
-from zeep.client import Transport
 from zeep.wsdl import Document
 
+from soap_connector.transport import CachingTransport, document_cache
+
 
 class Command(BaseCommand):
     help = 'Print a WSDL Document'
@@ -23,7 +24,7 @@ class Command(BaseCommand):
         :return:
         """
         wsdl = options.get('url', None)
-        transport = Transport()
+        transport = CachingTransport(documents=document_cache())
 
         try:
             document = Document(wsdl, transport)
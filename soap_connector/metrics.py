@@ -0,0 +1,316 @@
+import bisect
+import math
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Tuple[str, ...]
+
+
+class MetricRegistry(object):
+    """
+    Aggregates the metrics of the process in shards local to
+    each thread, so that recording a value never takes a lock.
+    The shards are only merged when the metrics are collected,
+    and the ones of finished threads are folded into a retired
+    shard, so that short-lived threads don't pile up.
+    """
+    def __init__(self):
+        """
+        Initialize the registry.
+        """
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.shards: List[Tuple["weakref.ReferenceType[threading.Thread]", dict]] = []
+        self.retired: dict = {}
+        self.metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        """
+
+        :param metric:
+        :return:
+        """
+        with self.lock:
+            self.metrics[metric.name] = metric
+
+    def shard(self) -> dict:
+        """
+        Returns the shard of the current thread, creating it the
+        first time.
+
+        :return:
+        """
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.prune()
+                self.shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def prune(self) -> None:
+        """
+        Folds the shards of the finished threads into the
+        retired shard. Must be called with the lock held.
+
+        :return:
+        """
+        shards = []
+        for ref, shard in self.shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                shards.append((ref, shard))
+                continue
+
+            for key, value in shard.items():
+                metric = self.metrics.get(key[0])
+                if metric is not None:
+                    self.retired[key] = metric.merge(self.retired.get(key), value)
+        self.shards = shards
+
+    def collect(self, metric: "Metric") -> Dict[Labels, object]:
+        """
+        Returns the values of a metric merged across the shards.
+
+        :param metric:
+        :return:
+        """
+        with self.lock:
+            self.prune()
+            shards = [self.retired.copy()] + [shard for _, shard in self.shards]
+
+        values = {}
+        for shard in shards:
+            for (name, labels), value in shard.copy().items():
+                if name == metric.name:
+                    values[labels] = metric.merge(values.get(labels), value)
+        return values
+
+    def render(self) -> str:
+        """
+        Returns all the metrics in the Prometheus text format.
+
+        :return:
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for labels, value in sorted(self.collect(metric).items()):
+                lines.extend(metric.render(labels, value))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        """
+        Resets every metric.
+
+        :return:
+        """
+        with self.lock:
+            for _, shard in self.shards:
+                shard.clear()
+            self.retired.clear()
+
+
+registry = MetricRegistry()
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """
+    Returns the label set of a sample.
+
+    :param names:
+    :param values:
+    :return:
+    """
+    if not names:
+        return ''
+
+    def escape(value) -> str:
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def format_value(value: float) -> str:
+    """
+
+    :param value:
+    :return:
+    """
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric(object):
+    """
+    Base class of the metrics.
+    """
+    type: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Initialize the metric and adds it to the registry.
+
+        :param name:
+        :param documentation:
+        :param labelnames:
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    @staticmethod
+    def merge(total, value):
+        """
+        Adds the value of a shard to the total.
+
+        :param total:
+        :param value:
+        :return:
+        """
+        raise NotImplementedError
+
+    def render(self, labels: Labels, value) -> List[str]:
+        """
+        Returns the samples of a label set.
+
+        :param labels:
+        :param value:
+        :return:
+        """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing count.
+    """
+    type = 'counter'
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        """
+
+        :param labels:
+        :param value:
+        :return:
+        """
+        shard = registry.shard()
+        key = (self.name, tuple(map(str, labels)))
+        shard[key] = shard.get(key, 0) + value
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, labels: Labels, value) -> List[str]:
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}']
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in buckets.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        :param name:
+        :param documentation:
+        :param labelnames:
+        :param buckets: Upper bounds of the buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+
+        :param value:
+        :param labels:
+        :return:
+        """
+        shard = registry.shard()
+        key = (self.name, tuple(map(str, labels)))
+        counts = shard.get(key)
+        if counts is None:
+            # Count of each bucket and of the overflow, then the sum.
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def render(self, labels: Labels, value) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), value[:-1]):
+            cumulative += count
+            bucket_labels = format_labels(self.labelnames + ('le',), labels + (format_value(bound),))
+            lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+
+        label_set = format_labels(self.labelnames, labels)
+        lines.append(f'{self.name}_sum{label_set} {format_value(value[-1])}')
+        lines.append(f'{self.name}_count{label_set} {cumulative}')
+        return lines
+
+
+@contextmanager
+def track(counter: Counter, histogram: Histogram, *labels: str) -> Iterator[None]:
+    """
+    Observes the duration of the block, and counts it by
+    outcome, given as the last label of the counter.
+
+    :param counter:
+    :param histogram:
+    :param labels:
+    :return:
+    """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        histogram.observe(time.perf_counter() - start, *labels)
+        counter.inc(*labels, outcome)
+
+
+operation_calls = Counter(
+    'soap_connector_operation_calls_total', "Operation calls by outcome.",
+    ['user', 'client', 'service', 'port', 'operation', 'outcome']
+)
+operation_duration = Histogram(
+    'soap_connector_operation_duration_seconds', "Duration of the operation calls.",
+    ['user', 'client', 'service', 'port', 'operation']
+)
+wsdl_loads = Counter(
+    'soap_connector_wsdl_loads_total', "Loads of WSDL documents by outcome.", ['outcome']
+)
+wsdl_load_duration = Histogram(
+    'soap_connector_wsdl_load_duration_seconds', "Duration of the loads and parsing of WSDL documents."
+)
+cache_requests = Counter(
+    'soap_connector_cache_requests_total', "Cache lookups by cache and result.", ['cache', 'result']
+)
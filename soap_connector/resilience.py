@@ -0,0 +1,489 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional, Set, Tuple
+
+import requests
+
+from django.conf import settings
+
+from lxml import etree
+
+from zeep.exceptions import Fault, TransportError, XMLSyntaxError
+
+from soap_connector import deadline
+from soap_connector.deadline import LatencyTracker
+from soap_connector.exceptions import BackendUnavailable, DeadlineExceeded
+from soap_connector.transport import httpx
+
+DEFAULT_MAX_CONCURRENCY = None
+DEFAULT_MAX_WAIT = 0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RECOVERY_TIMEOUT = 30
+
+# Errors that tell that the backend is unreachable or unhealthy.
+FAILURES: Tuple[type, ...] = (
+    requests.RequestException, TransportError, XMLSyntaxError, etree.XMLSyntaxError, OSError
+) + ((httpx.TransportError,) if httpx is not None else ())
+
+# Codes of the SOAP 1.1 and 1.2 faults caused by the caller.
+CLIENT_FAULT_CODES = ('Client', 'Sender')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_LANES = {'interactive': 4, 'bulk': 1}
+DEFAULT_LANE = 'interactive'
+LANE_HEADER = 'X-Priority'
+
+
+def failed(error: BaseException) -> bool:
+    """
+    Returns true if the error comes from an unreachable or
+    unhealthy backend, rather than from the caller.
+
+    :param error:
+    :return:
+    """
+    if isinstance(error, Fault):
+        return (error.code or '').rpartition(':')[2] not in CLIENT_FAULT_CODES
+    return isinstance(error, FAILURES)
+
+
+def lanes() -> Dict[str, float]:
+    """
+    Returns the weights of the priority lanes set in the project
+    settings.
+
+    :return:
+    """
+    return getattr(settings, 'SOAP_CONNECTOR_LANES', DEFAULT_LANES)
+
+
+def default_lane() -> str:
+    """
+    Returns the lane of the calls that don't pick one.
+
+    :return:
+    """
+    return getattr(settings, 'SOAP_CONNECTOR_DEFAULT_LANE', DEFAULT_LANE)
+
+
+class Bulkhead(object):
+    """
+    Limits the number of concurrent calls to a backend, so that
+    a slow one can't hold every worker. Its slots are shared by
+    the priority lanes in proportion to their weights: each lane
+    is guaranteed the whole slots of its share, whose idle ones
+    are only lent to heavier lanes, and a freed slot goes to the
+    waiting lane that uses the least of its share.
+    """
+    def __init__(self, limit: Optional[int] = DEFAULT_MAX_CONCURRENCY, max_wait: float = DEFAULT_MAX_WAIT):
+        """
+        Initialize the bulkhead.
+
+        :param limit: Maximum number of concurrent calls, or None
+                      for no limit
+        :param max_wait: Seconds a call waits for a free slot
+        """
+        self.limit = limit
+        self.max_wait = max_wait
+        self.active = 0
+        self.running = Counter()
+        self.waiting = Counter()
+        self.condition = threading.Condition()
+        self.stats = Counter()
+
+    def acquire(self, wait: bool = True, lane: str = DEFAULT_LANE) -> bool:
+        """
+        Takes a slot for a call of the lane, waiting up to the
+        maximum wait if allowed, and never beyond the deadline
+        of the call.
+
+        :param wait:
+        :param lane:
+        :return: False if no slot was available
+        """
+        with self.condition:
+            if self.limit is not None:
+                expires_at = time.monotonic() + (deadline.clamp(self.max_wait) if wait else 0)
+                self.waiting[lane] += 1
+                try:
+                    while self.next_lane() != lane:
+                        remaining = expires_at - time.monotonic()
+                        if remaining <= 0:
+                            self.stats['rejected'] += 1
+                            return False
+                        self.condition.wait(remaining)
+                finally:
+                    self.waiting[lane] -= 1
+                    if not self.waiting[lane]:
+                        del self.waiting[lane]
+                    self.condition.notify_all()
+
+            self.active += 1
+            self.running[lane] += 1
+            self.stats['accepted'] += 1
+            return True
+
+    def release(self, lane: str = DEFAULT_LANE) -> None:
+        """
+        Frees a slot.
+
+        :param lane:
+        :return:
+        """
+        with self.condition:
+            self.active -= 1
+            self.running[lane] -= 1
+            self.condition.notify_all()
+
+    def reserved(self, lane: str) -> int:
+        """
+        Returns the free slots kept for the other lanes at least
+        as heavy as the given one, that is the unused whole slots
+        of their shares.
+
+        :param lane:
+        :return:
+        """
+        weights = lanes()
+        total = sum(weights.values())
+        weight = weights.get(lane, 1)
+        return sum(
+            max(0, int(self.limit * other_weight / total) - self.running[other])
+            for other, other_weight in weights.items()
+            if other != lane and other_weight >= weight
+        )
+
+    def next_lane(self) -> Optional[str]:
+        """
+        Returns the waiting lane that can take a free slot and
+        uses the least of its share of the slots, the heaviest
+        one on a tie.
+
+        :return:
+        """
+        weights = lanes()
+        return min(
+            (lane for lane in self.waiting if self.active + self.reserved(lane) < self.limit),
+            key=lambda lane: (self.running[lane] / weights.get(lane, 1), -weights.get(lane, 1), lane),
+            default=None
+        )
+
+    def state(self) -> dict:
+        """
+
+        :return:
+        """
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'lanes': {
+                lane: {'active': self.running[lane], 'waiting': self.waiting[lane]}
+                for lane in {**lanes(), **self.running, **self.waiting}
+            },
+            **self.stats
+        }
+
+
+class CircuitBreaker(object):
+    """
+    Stops calling a backend after consecutive failures, and lets
+    a single probe call through once the recovery timeout has
+    elapsed.
+    """
+    def __init__(
+            self,
+            failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+            recovery_timeout: float = DEFAULT_RECOVERY_TIMEOUT
+    ):
+        """
+        Initialize the breaker.
+
+        :param failure_threshold: Consecutive failures that open
+                                  the circuit
+        :param recovery_timeout: Seconds the circuit stays open
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.status = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def allow(self) -> bool:
+        """
+        Returns true if a call can be made.
+
+        :return:
+        """
+        with self.lock:
+            if self.status == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.status = HALF_OPEN
+
+            if self.status == HALF_OPEN:
+                if self.probing:
+                    self.stats['rejected'] += 1
+                    return False
+                self.probing = True
+                return True
+
+            if self.status == OPEN:
+                self.stats['rejected'] += 1
+                return False
+            return True
+
+    def record_success(self) -> None:
+        """
+
+        :return:
+        """
+        with self.lock:
+            self.status = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self) -> None:
+        """
+
+        :return:
+        """
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            self.stats['failures'] += 1
+
+            if self.status == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.status != OPEN:
+                    self.stats['opened'] += 1
+                self.status = OPEN
+                self.opened_at = time.monotonic()
+
+    def record_cancel(self) -> None:
+        """
+        Records a call given up by its caller, which tells
+        nothing about the health of the backend.
+
+        :return:
+        """
+        with self.lock:
+            self.probing = False
+
+    def retry_after(self) -> float:
+        """
+        Returns the seconds until the circuit lets a probe call
+        through.
+
+        :return:
+        """
+        if self.status != OPEN:
+            return 0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def state(self) -> dict:
+        """
+
+        :return:
+        """
+        return {
+            'status': self.status,
+            'failures': self.failures,
+            'retry_after': round(self.retry_after(), 3),
+            **self.stats
+        }
+
+
+class Backend(object):
+    """
+    Bulkhead and circuit breaker of the calls to the address of
+    a port with the same resilience options.
+    """
+    def __init__(self, address: str, config: dict):
+        """
+        Initialize the backend.
+
+        :param address:
+        :param config: Normalized resilience options
+        """
+        self.address = address
+        self.config = config
+        self.bulkhead = Bulkhead(config['max_concurrency'], config['max_wait'])
+        self.breaker = CircuitBreaker(config['failure_threshold'], config['recovery_timeout'])
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self.users: Set[str] = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(config: dict) -> dict:
+        """
+        Returns the resilience options of a client with the
+        defaults of the missing ones.
+
+        :param config: Serialized resilience options of a client
+        :return:
+        """
+        return {
+            'max_concurrency': config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY),
+            'max_wait': config.get('max_wait', DEFAULT_MAX_WAIT),
+            'failure_threshold': config.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD),
+            'recovery_timeout': config.get('recovery_timeout', DEFAULT_RECOVERY_TIMEOUT),
+        }
+
+    def latency(self, operation: str) -> LatencyTracker:
+        """
+        Returns the latency tracker of an operation.
+
+        :param operation:
+        :return:
+        """
+        with self.lock:
+            tracker = self.latencies.get(operation)
+            if tracker is None:
+                tracker = self.latencies[operation] = LatencyTracker()
+        return tracker
+
+    def acquire(self, wait: bool = True, lane: Optional[str] = None) -> str:
+        """
+        Takes a slot for a call, failing fast if the circuit is
+        open or the bulkhead is full.
+
+        :param wait: Wait for a free slot of the bulkhead
+        :param lane: Priority lane of the call
+        :return: Lane of the slot, to be given back to `release`
+        """
+        lane = lane or default_lane()
+        if not self.bulkhead.acquire(wait, lane):
+            raise BackendUnavailable(self.address)
+
+        if not self.breaker.allow():
+            self.bulkhead.release(lane)
+            raise BackendUnavailable(self.address, self.breaker.retry_after())
+        return lane
+
+    def release(self, lane: str, error: Optional[BaseException] = None) -> None:
+        """
+        Frees the slot of a call and records its outcome in the
+        circuit breaker. Errors of the caller, such as invalid
+        arguments or client faults, and cancelled calls don't
+        count as successes nor failures.
+
+        :param lane:
+        :param error: Error that ended the call, if any
+        :return:
+        """
+        try:
+            if error is None:
+                self.breaker.record_success()
+            elif isinstance(error, DeadlineExceeded) or not failed(error):
+                self.breaker.record_cancel()
+            else:
+                current = deadline.current()
+                if current is not None and current.caller and current.expired():
+                    self.breaker.record_cancel()
+                else:
+                    self.breaker.record_failure()
+        finally:
+            self.bulkhead.release(lane)
+
+    @contextmanager
+    def guard(self, wait: bool = True, lane: Optional[str] = None):
+        """
+        Runs a call within the limits of the backend, failing
+        fast if the circuit is open or the bulkhead is full.
+        Cancelled calls, such as the ones of cancelled tasks,
+        and errors of the caller don't count as successes nor
+        failures.
+
+        :param wait: Wait for a free slot of the bulkhead
+        :param lane: Priority lane of the call
+        :return:
+        """
+        lane = self.acquire(wait, lane)
+        error = None
+        try:
+            yield self
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.release(lane, error)
+
+    def state(self) -> dict:
+        """
+
+        :return:
+        """
+        return {
+            'address': self.address,
+            'config': self.config,
+            'breaker': self.breaker.state(),
+            'bulkhead': self.bulkhead.state(),
+            'latency': {name: tracker.state() for name, tracker in list(self.latencies.items())}
+        }
+
+
+class BackendRegistry(object):
+    """
+    Process-wide backends by address and resilience options, so
+    that the clients of an address with the same options share
+    their limits without overriding the ones of the others.
+    """
+    def __init__(self):
+        """
+        Initialize the registry.
+        """
+        self.lock = threading.Lock()
+        self.backends: Dict[Tuple[str, Tuple], Backend] = {}
+
+    def get(self, address: str, config: dict, user: Optional[str] = None) -> Backend:
+        """
+        Returns the backend of the address with the options of
+        the calling client.
+
+        :param address:
+        :param config: Serialized resilience options of a client
+        :param user: Key of the user of the client
+        :return:
+        """
+        config = Backend.normalize(config)
+        key = (address, tuple(sorted(config.items())))
+
+        backend = self.backends.get(key)
+        if backend is None or (user is not None and user not in backend.users):
+            with self.lock:
+                backend = self.backends.get(key)
+                if backend is None:
+                    backend = self.backends[key] = Backend(address, config)
+                if user is not None:
+                    backend.users.add(user)
+        return backend
+
+    def state(self, user: Optional[str] = None) -> list:
+        """
+        Returns the state of every backend.
+
+        :param user: Key of the user whose backends are returned,
+                     or None for the backends of every user
+        :return:
+        """
+        with self.lock:
+            backends = [
+                backend for backend in self.backends.values() if user is None or user in backend.users
+            ]
+        return [backend.state() for backend in backends]
+
+    def clear(self) -> None:
+        """
+
+        :return:
+        """
+        with self.lock:
+            self.backends.clear()
+
+
+backends = BackendRegistry()
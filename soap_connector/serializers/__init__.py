@@ -1,5 +1,8 @@
 from .base import BaseSerializer
 from .settings import SettingsSerializer
-from .client import ClientSerializer
+from .transport import TransportSerializer
+from .client import ClientSerializer, OperationOptionsSerializer, ResilienceSerializer
 from .operation import OperationSerializer
+from .batch import BatchSerializer
+from .job import JobSerializer
 from .wsse import SignatureSerializer, UsernameTokenSerializer
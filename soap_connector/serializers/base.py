@@ -9,13 +9,13 @@ class BaseSerializer(serializers.Serializer):
 
     def validate(self, data: dict) -> dict:
         """
+        Allocates the primary key of the new object.
 
         :param data:
         :return:
         """
         view = self.context['view']
-        items = view.cache.registry.retrieve()
-        data['pk'] = items[-1] + 1 if items else 1
+        data['pk'] = view.cache.registry.allocate()
 
         return data
 
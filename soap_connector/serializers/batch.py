@@ -0,0 +1,135 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import NotFound
+
+from soap_connector.deadline import Deadline
+from soap_connector.serializers.operation import OperationSerializer
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_WORKERS = 16
+DEFAULT_BATCH_TIMEOUT = 30
+
+Result = dict
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def batch_executor() -> ThreadPoolExecutor:
+    """
+    Returns the process-wide pool of threads that run the calls
+    of all batches, bounded by the project settings.
+
+    :return:
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                getattr(settings, 'SOAP_CONNECTOR_BATCH_WORKERS', DEFAULT_BATCH_WORKERS),
+                thread_name_prefix='soap_connector_batch'
+            )
+    return _executor
+
+
+class BatchCallSerializer(serializers.Serializer):
+    """
+
+    """
+    service = serializers.SlugField()
+    port = serializers.SlugField()
+    operation = serializers.SlugField()
+    args = serializers.DictField(default=dict)
+
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Validates a list of calls to operations of a client, each one
+    with the serializer of its operation, and runs them
+    concurrently.
+    """
+    calls = serializers.ListField(child=BatchCallSerializer(), min_length=1)
+    timeout = serializers.FloatField(
+        min_value=0, required=False,
+        help_text="Seconds after which the calls still running are reported "
+                  "as timed out. It's the deadline of every call.")
+
+    def validate_calls(self, calls: List[dict]) -> List[dict]:
+        """
+
+        :param calls:
+        :return:
+        """
+        max_size = getattr(settings, 'SOAP_CONNECTOR_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        if len(calls) > max_size:
+            raise serializers.ValidationError(f"Ensure this field has no more than {max_size} elements.")
+        return calls
+
+    def create(self, validated_data: dict) -> dict:
+        """
+        Runs the valid calls on the batch thread pool and returns
+        the result of every call in order. The timeout of the
+        batch is the deadline of its calls.
+
+        :param validated_data:
+        :return:
+        """
+        max_timeout = getattr(settings, 'SOAP_CONNECTOR_BATCH_TIMEOUT', DEFAULT_BATCH_TIMEOUT)
+        timeout = min(validated_data.get('timeout', max_timeout), max_timeout)
+        batch_deadline = Deadline(timeout)
+
+        prepared = [self.prepare(call) for call in validated_data['calls']]
+        futures: List[Optional[Future]] = [
+            batch_executor().submit(serializer.run, batch_deadline) if serializer else None
+            for serializer, _ in prepared
+        ]
+        wait([future for future in futures if future], timeout=batch_deadline.remaining())
+
+        results = []
+        for (_, result), future in zip(prepared, futures):
+            if future is None:
+                results.append(result)
+            elif future.done():
+                results.append(future.result())
+            else:
+                future.cancel()
+                results.append({
+                    'status': status.HTTP_504_GATEWAY_TIMEOUT,
+                    'errors': ["The call didn't finish before the batch deadline."]
+                })
+
+        return {'results': results}
+
+    def prepare(self, call: dict) -> Tuple[Optional[OperationSerializer], Optional[Result]]:
+        """
+        Returns the serializer of the call once its arguments
+        have been validated, or the result of the failed
+        validation.
+
+        :param call:
+        :return:
+        """
+        view = self.context['view']
+        context = dict(self.context, deferred=True, lookup={
+            'client_pk': view.kwargs['client_pk'],
+            'service_pk': call['service'],
+            'port_pk': call['port'],
+            'operation_pk': call['operation']
+        })
+
+        try:
+            serializer_class = OperationSerializer.compile(context)
+        except NotFound as e:
+            return None, {'status': status.HTTP_404_NOT_FOUND, 'errors': [e.detail]}
+
+        serializer = serializer_class(data=call['args'], context=context)
+        if not serializer.is_valid():
+            return None, {'status': status.HTTP_409_CONFLICT, 'errors': serializer.errors}
+
+        return serializer, None
@@ -1,7 +1,73 @@
+import logging
+
 from rest_framework import serializers
 
 from .base import BaseSerializer
+from soap_connector.connector import Snapshot
+from soap_connector.exceptions import ConnectorError
 from soap_connector.fields import HyperlinkedField
+from soap_connector.resilience import lanes
+
+logger = logging.getLogger(__name__)
+
+
+class OperationOptionsSerializer(serializers.Serializer):
+    """
+    Options that tune how an operation of the client is
+    invoked.
+    """
+    template = serializers.BooleanField(
+        default=False,
+        help_text="Boolean to build the request envelope from a precompiled "
+                  "template, falling back to zeep for shapes that cannot be "
+                  "templated.")
+
+    cache_timeout = serializers.IntegerField(
+        min_value=1, required=False,
+        help_text="Number of seconds the responses of this read-only operation "
+                  "are cached, keyed by its arguments.")
+
+    read_only = serializers.BooleanField(
+        default=False,
+        help_text="Boolean to share one backend call between identical "
+                  "concurrent calls of this operation, which must have no "
+                  "side effects. Cached operations are always shared.")
+
+    timeout = serializers.FloatField(
+        min_value=0, required=False,
+        help_text="Maximum number of seconds of a call, unless the caller "
+                  "sets a closer deadline.")
+
+    adaptive_timeout = serializers.BooleanField(
+        default=False,
+        help_text="Boolean to cut the calls taking much longer than the "
+                  "observed latency percentile of the operation.")
+
+
+class ResilienceSerializer(serializers.Serializer):
+    """
+    Limits of the calls to the addresses of the ports of the
+    client, shared with the other clients of the same addresses and
+    options.
+    """
+    max_concurrency = serializers.IntegerField(
+        min_value=1, required=False,
+        help_text="Maximum number of concurrent calls to an address. "
+                  "Unlimited by default.")
+
+    max_wait = serializers.FloatField(
+        default=0, min_value=0,
+        help_text="Seconds a call waits for a free slot before it's rejected.")
+
+    failure_threshold = serializers.IntegerField(
+        default=5, min_value=1,
+        help_text="Number of consecutive connection failures or timeouts "
+                  "that open the circuit.")
+
+    recovery_timeout = serializers.FloatField(
+        default=30, min_value=0,
+        help_text="Seconds the circuit stays open before a probe call is let "
+                  "through.")
 
 
 class ClientSerializer(BaseSerializer):
@@ -10,11 +76,19 @@ class ClientSerializer(BaseSerializer):
     """
     wsdl = serializers.URLField()
     # wsse = serializers.ForeignKey()
-    transport = None
+    transport = serializers.IntegerField(min_value=1, required=False)
     service_name = serializers.CharField(required=False)
     port_name = serializers.CharField(required=False)
     # settings = SettingsSerializer(required=False)
     settings = serializers.IntegerField(min_value=1, required=False)
+    resilience = ResilienceSerializer(required=False)
+    lane = serializers.ChoiceField(
+        choices=list(lanes()), required=False,
+        help_text="Priority lane of the calls of the client, unless the "
+                  "request picks one with the X-Priority header.")
+    operations = serializers.DictField(
+        child=OperationOptionsSerializer(), required=False,
+        help_text="Options by operation name.")
     url = HyperlinkedField(view_name='soap_connector:client_detail')
     types = HyperlinkedField(view_name='soap_connector:client_global_type_list')
     elements = HyperlinkedField(view_name='soap_connector:client_global_element_list')
@@ -24,3 +98,20 @@ class ClientSerializer(BaseSerializer):
 
     class Meta:
         fields = ['wsdl', 'service_name', 'port_name', 'settings']
+
+    def save(self, validated_data: dict) -> dict:
+        """
+        Saves the client and builds its introspection snapshot,
+        so that the WSDL document is not parsed when listing.
+
+        :param validated_data:
+        :return:
+        """
+        data = super().save(validated_data)
+
+        try:
+            Snapshot.from_view(self.context['view'], data)
+        except ConnectorError as e:
+            logger.warning(e)
+
+        return data
@@ -0,0 +1,171 @@
+import threading
+import weakref
+from collections import Counter
+from typing import Dict, List, Tuple, Type, Optional
+
+from rest_framework import serializers
+
+from zeep.wsdl.definitions import Operation
+from zeep.xsd.elements.indicators import OrderIndicator, Group
+from zeep.xsd.types import ComplexType, AnySimpleType, builtins
+
+MAX_DEPTH = 8
+
+# Ordered from the most to the least specific type.
+FIELD_TYPES: List[Tuple[type, Type[serializers.Field], dict]] = [
+    (builtins.Boolean, serializers.BooleanField, {}),
+    (builtins.PositiveInteger, serializers.IntegerField, {'min_value': 1}),
+    (builtins.NonNegativeInteger, serializers.IntegerField, {'min_value': 0}),
+    (builtins.NegativeInteger, serializers.IntegerField, {'max_value': -1}),
+    (builtins.NonPositiveInteger, serializers.IntegerField, {'max_value': 0}),
+    (builtins.Byte, serializers.IntegerField, {'min_value': -2 ** 7, 'max_value': 2 ** 7 - 1}),
+    (builtins.Short, serializers.IntegerField, {'min_value': -2 ** 15, 'max_value': 2 ** 15 - 1}),
+    (builtins.Int, serializers.IntegerField, {'min_value': -2 ** 31, 'max_value': 2 ** 31 - 1}),
+    (builtins.Long, serializers.IntegerField, {'min_value': -2 ** 63, 'max_value': 2 ** 63 - 1}),
+    (builtins.Integer, serializers.IntegerField, {}),
+    (builtins.Decimal, serializers.DecimalField, {'max_digits': None, 'decimal_places': None}),
+    (builtins.Float, serializers.FloatField, {}),
+    (builtins.Double, serializers.FloatField, {}),
+    (builtins.DateTime, serializers.DateTimeField, {}),
+    (builtins.Date, serializers.DateField, {}),
+    (builtins.Time, serializers.TimeField, {}),
+    (builtins.Duration, serializers.DurationField, {}),
+    (builtins.AnyURI, serializers.CharField, {}),
+    (AnySimpleType, serializers.CharField, {}),
+]
+
+
+class SerializerCompiler(object):
+    """
+    Compiles the input type of SOAP operations into typed
+    serializer classes, once per operation of each client.
+    """
+    def __init__(self):
+        """
+        Initialize the compiler.
+        """
+        self.lock = threading.Lock()
+        self.classes: "weakref.WeakKeyDictionary[Operation, type]" = weakref.WeakKeyDictionary()
+        self.stats = Counter()
+
+    def get(self, operation: Operation, base: Type[serializers.Serializer]) -> Type[serializers.Serializer]:
+        """
+        Returns the serializer class of the operation, compiling
+        it the first time.
+
+        :param operation:
+        :param base:
+        :return:
+        """
+        with self.lock:
+            cls = self.classes.get(operation)
+            if cls is not None:
+                self.stats['hits'] += 1
+                return cls
+
+        cls = self.compile(operation, base)
+
+        with self.lock:
+            self.stats['compilations'] += 1
+            return self.classes.setdefault(operation, cls)
+
+    def compile(self, operation: Operation, base: Type[serializers.Serializer]) -> Type[serializers.Serializer]:
+        """
+        Builds a serializer class with a write only field for
+        each parameter of the operation.
+
+        :param operation:
+        :param base:
+        :return:
+        """
+        body = getattr(operation.input, 'body', None)
+        fields = self.compile_fields(body.type, write_only=True) if body is not None else {}
+
+        return type(f'{operation.name}Serializer', (base,), fields)
+
+    def compile_fields(self, xsd_type: ComplexType, depth: int = 0, **kwargs) -> Dict[str, serializers.Field]:
+        """
+        Returns the fields for the elements and attributes of a
+        complex type.
+
+        :param xsd_type:
+        :param depth:
+        :param kwargs:
+        :return:
+        """
+        fields = {}
+
+        for name, element in xsd_type.elements_nested:
+            if isinstance(element, (OrderIndicator, Group)):
+                for child_name, child in element.elements:
+                    fields[child_name] = self.compile_element(
+                        child, depth, optional=element.is_optional, **kwargs
+                    )
+            else:
+                fields[element.attr_name] = self.compile_element(element, depth, **kwargs)
+
+        for name, attribute in xsd_type.attributes:
+            fields[name] = self.compile_type(
+                getattr(attribute, 'type', None), depth,
+                required=bool(getattr(attribute, 'required', False)), **kwargs
+            )
+
+        return fields
+
+    def compile_element(self, element, depth: int, optional: bool = False, **kwargs) -> serializers.Field:
+        """
+        Returns the field of an element.
+
+        :param element:
+        :param depth:
+        :param optional: The element belongs to an optional group
+        :param kwargs:
+        :return:
+        """
+        xsd_type = getattr(element, 'type', None)
+        many = element.accepts_multiple
+        required = not (optional or element.is_optional or many)
+
+        kwargs.update(required=required)
+        if getattr(element, 'nillable', False):
+            kwargs.update(allow_null=True)
+        if xsd_type is not None and xsd_type.qname is not None:
+            kwargs.update(help_text=xsd_type.qname.localname)
+
+        if not many:
+            return self.compile_type(xsd_type, depth, **kwargs)
+
+        if isinstance(xsd_type, ComplexType) and depth < MAX_DEPTH:
+            return self.compile_type(xsd_type, depth, many=True, **kwargs)
+
+        child = self.compile_type(xsd_type, depth)
+        return serializers.ListField(child=child, **kwargs)
+
+    def compile_type(self, xsd_type: Optional[object], depth: int, **kwargs) -> serializers.Field:
+        """
+        Returns the field of a type, nesting a new serializer
+        class for complex types.
+
+        :param xsd_type:
+        :param depth:
+        :param kwargs:
+        :return:
+        """
+        if isinstance(xsd_type, ComplexType):
+            if depth >= MAX_DEPTH or not (xsd_type.elements or xsd_type.attributes):
+                kwargs.pop('many', None)
+                return serializers.JSONField(**kwargs)
+
+            name = xsd_type.name or 'Anonymous'
+            fields = self.compile_fields(xsd_type, depth + 1)
+            cls = type(f'{name}Serializer', (serializers.Serializer,), fields)
+            return cls(**kwargs)
+
+        for builtin, field_class, options in FIELD_TYPES:
+            if isinstance(xsd_type, builtin):
+                return field_class(**options, **kwargs)
+
+        return serializers.JSONField(**kwargs)
+
+
+compiler = SerializerCompiler()
@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+from soap_connector.jobs import QUEUED, RUNNING, DONE, FAILED
+
+
+class JobSerializer(serializers.Serializer):
+    """
+    Operation call run in the background. Jobs are created by
+    posting a call to an operation with the `async` query
+    parameter.
+    """
+    pk = serializers.IntegerField(read_only=True)
+    state = serializers.ChoiceField(choices=[QUEUED, RUNNING, DONE, FAILED], read_only=True)
+    client = serializers.IntegerField(read_only=True)
+    service = serializers.CharField(read_only=True)
+    port = serializers.CharField(read_only=True)
+    operation = serializers.CharField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    started_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    finished_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    result = serializers.JSONField(
+        read_only=True, allow_null=True,
+        help_text="Status and response or errors of the call once it's finished.")
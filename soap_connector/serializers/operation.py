@@ -1,43 +1,65 @@
-from typing import List, Optional
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional, Type
 
-from rest_framework import serializers
+from asgiref.sync import sync_to_async
 
-from zeep.client import Client
-from zeep.wsdl.definitions import Service, Port, Operation
-from zeep.wsdl.messages import soap
+from django.conf import settings
+from django.utils.functional import cached_property
 
-from soap_connector.connector import Connector
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, NotFound, ParseError
 
+from soap_connector import deadline, metrics, slowlog, timing, tracing
+from soap_connector.cache import Context, ResponseCache, SharedFlight, make_key
+from soap_connector.converter import converters
+from soap_connector.envelope import EnvelopeTemplate, templates
+from soap_connector.deadline import Deadline, LatencyTracker
+from soap_connector.resilience import LANE_HEADER, Backend, backends, default_lane, failed, lanes
+from soap_connector.serializers.compiler import compiler
+from soap_connector.transport import StreamedResponse
+from soap_connector.utils import AsyncSingleFlight, SingleFlight
 
-def parser(parts: Optional[List[str]] = ()):
+
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+
+
+def coalesce(key: str, fn: Callable[[], Any]) -> Any:
     """
-    Returns a parser signature.
+    Executes the call once for all the identical concurrent
+    calls of the process, and of all the workers when shared
+    coalescing is enabled.
 
-    :param parts:
+    :param key:
+    :param fn:
     :return:
     """
-    for part in parts:
-        params = part.split(', ')
-        for param in params:
-            qname, _type = param.split(': ')
-            yield qname, _type
+    if not getattr(settings, 'SOAP_CONNECTOR_COALESCE', True):
+        return fn()
+
+    if getattr(settings, 'SOAP_CONNECTOR_COALESCE_SHARED', False):
+        shared = SharedFlight(getattr(settings, 'SOAP_CONNECTOR_COALESCE_TIMEOUT', 30))
+        return flights.do(key, shared.do, key, fn)
+
+    return flights.do(key, fn)
 
 
-def signature(soap_message: soap.SoapMessage):
+async def coalesce_async(key: str, fn: Callable[[], Awaitable]) -> Any:
     """
+    Awaits the call once for all the identical concurrent calls
+    of the event loop. Async calls are never coalesced across
+    workers, since waiting for the lock would block the loop.
 
-    :param soap_message:
+    :param key:
+    :param fn:
     :return:
     """
-    if not soap_message.envelope:
-        return None
+    if not getattr(settings, 'SOAP_CONNECTOR_COALESCE', True):
+        return await fn()
 
-    if soap_message.body:
-        parts = [soap_message.body.type.signature(schema=soap_message.wsdl.types, standalone=False)]
-    else:
-        parts = []
-
-    return parts
+    return await async_flights.do(key, fn)
 
 
 class ConnectorMixin(object):
@@ -46,97 +68,466 @@ class ConnectorMixin(object):
     """
     context = None
 
-    @property
+    @cached_property
     def connector(self):
         """
+        Connector of the current request.
 
         :return:
         """
-        view = self.context['view']
-
-        with view.with_context(Client):
-            return Connector.from_view(view)
+        return self.context['view'].get_connector()
 
-    def get_name(self, cls, pk_name):
+    def get_name(self, source_name):
         """
+        Returns the name of the item identified by the url
+        keyword arguments, or the lookup of the context, in the
+        client snapshot.
 
-        :param cls:
-        :param pk_name:
+        :param source_name:
         :return:
         """
         view = self.context['view']
+        lookup = self.context.get('lookup', view.kwargs)
+        snapshot = view.get_snapshot()
+        item = snapshot.find(source_name, lookup) if snapshot else None
 
-        with view.with_context(cls):
-            pk = view.kwargs[pk_name]
-            return view.get_object(pk)['name']
+        if item is None:
+            raise NotFound()
+        return item['name']
 
-    @property
+    @cached_property
     def service(self):
         """
 
         :return:
         """
-        service_name = self.get_name(Service, 'service_pk')
+        service_name = self.get_name('services')
         client = self.connector.client
 
         return client.wsdl.services[service_name]
 
-    @property
+    @cached_property
     def port(self):
         """
 
         :return:
         """
-        port_name = self.get_name(Port, 'port_pk')
+        port_name = self.get_name('ports')
         return self.service.ports[port_name]
 
-    @property
+    @cached_property
     def operation(self):
         """
 
         :return:
         """
-        operation_name = self.get_name(Operation, 'operation_pk')
+        operation_name = self.get_name('operations')
         ops = getattr(self.port.binding, '_operations')
 
         return ops[operation_name]
 
+    @cached_property
+    def options(self) -> dict:
+        """
+        Options of the operation set in the client.
+
+        :return:
+        """
+        return self.connector.options.get(self.operation.name, {})
+
+    @cached_property
+    def backend(self) -> Backend:
+        """
+        Bulkhead and circuit breaker of the address of the port.
+
+        :return:
+        """
+        return backends.get(
+            self.port.binding_options['address'], self.connector.resilience, make_key(self.context)
+        )
+
+    @cached_property
+    def lane(self) -> str:
+        """
+        Priority lane of the call, given by the request header,
+        or else by the client.
+
+        :return:
+        """
+        request = self.context['request']
+        lane = request.headers.get(LANE_HEADER) or self.connector.lane or default_lane()
+
+        if lane not in lanes():
+            raise ParseError(f"Unknown priority lane: {lane!r}")
+        return lane
+
+    @cached_property
+    def latency(self) -> LatencyTracker:
+        """
+        Observed latency of the operation on its backend.
+
+        :return:
+        """
+        return self.backend.latency(self.operation.name)
+
+    def track(self):
+        """
+        Counts the call and observes its duration, by user since
+        the pks of the clients are only unique to each user.
+
+        :return:
+        """
+        return metrics.track(
+            metrics.operation_calls, metrics.operation_duration, make_key(self.context),
+            self.connector.client_pk, self.service.name, self.port.name, self.operation.name
+        )
+
+    def trace(self):
+        """
+        Runs the call in a span of its trace.
+
+        :return:
+        """
+        return tracing.span(
+            'soap.call', client=self.connector.client_pk, service=self.service.name,
+            port=self.port.name, operation=self.operation.name, lane=self.lane
+        )
+
+    @contextmanager
+    def sample(self, call_deadline: Optional[Deadline]):
+        """
+        Records the latency of the call. Calls cut by the timeout
+        of the operation count as lasting the timeout, and failed
+        calls as lasting until they failed, so that the adaptive
+        timeout grows back when the backend slows down. Calls
+        given up by their caller and errors of the caller tell
+        nothing of the latency of the backend.
+
+        :param call_deadline:
+        :return:
+        """
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            if call_deadline is not None and call_deadline.expired():
+                if not call_deadline.caller:
+                    self.latency.record(call_deadline.timeout)
+            elif failed(e):
+                self.latency.record(time.monotonic() - start)
+            raise
+        else:
+            self.latency.record(time.monotonic() - start)
+
+    def record(self):
+        """
+        Adds the call to the slow-call log if it's slow.
+
+        :return:
+        """
+        return slowlog.record(
+            slowlog.OPERATION, user=make_key(self.context), client=self.connector.client_pk,
+            service=self.service.name, port=self.port.name, operation=self.operation.name
+        )
+
+    def get_timeout(self) -> Optional[float]:
+        """
+        Returns the timeout of a call to the operation, the
+        closer of the one set in its options and its adaptive
+        timeout.
+
+        :return:
+        """
+        timeouts = [self.options.get('timeout')]
+        if self.options.get('adaptive_timeout'):
+            timeouts.append(self.latency.timeout())
+
+        timeouts = [timeout for timeout in timeouts if timeout is not None]
+        return min(timeouts) if timeouts else None
+
 
 class OperationSerializer(serializers.Serializer, ConnectorMixin):
     """
-
+    Base class of the serializers compiled for each operation,
+    whose fields are the typed parameters of the operation.
     """
-    def __init__(self, *args, **kwargs):
+    response = serializers.JSONField(read_only=True)
+    cache_status: Optional[str] = None
+
+    @classmethod
+    def compile(cls, context: Context) -> Type["OperationSerializer"]:
+        """
+        Returns the serializer class of the operation given by
+        the context, compiled once per client and operation.
+
+        :param context:
+        :return:
         """
+        resolver = ConnectorMixin()
+        resolver.context = context
+
+        return compiler.get(resolver.operation, cls)
 
-        :param args:
-        :param kwargs:
+    @cached_property
+    def responses(self) -> ResponseCache:
         """
-        super(OperationSerializer, self).__init__(*args, **kwargs)
-        parts = signature(self.operation.input)
 
-        for qname, _type in parser(parts):
-            # TODO: Set field type by _type
-            self.fields[qname] = serializers.CharField(help_text=_type, write_only=True)
-        self.fields['response'] = serializers.CharField(read_only=True)
+        :return:
+        """
+        return ResponseCache(self.context)
 
     def validate(self, attrs):
         """
+        Calls the operation, unless the view defers the call
+        to `call` or `validate_async`.
 
         :param attrs:
         :return:
         """
-        client = self.connector.client.bind(
-            self.service.name,
-            self.port.name
-        )
+        if self.context.get('deferred'):
+            return attrs
+
+        return self.call(attrs)
+
+    def call(self, attrs: dict) -> dict:
+        """
+        Calls the operation, or takes its response from cache
+        when the operation is cached. Identical concurrent calls
+        of read-only operations share a single call to the
+        backend. Responses that come after the deadline of the
+        call are discarded.
+
+        :param attrs:
+        :return:
+        """
+        deadline.check()
+        response = self.get_cached(attrs)
+
+        if response is None:
+            def fn():
+                return self.set_cached(attrs, self.convert(self.invoke(attrs)))
+
+            try:
+                response = coalesce(self.get_cache_key(attrs), fn) if self.is_read_only() else fn()
+            except APIException:
+                raise
+            except Exception as e:
+                deadline.check()
+                raise serializers.ValidationError(e)
+
+        deadline.check()
+        attrs.update(response=response)
+
+        return attrs
+
+    def run(self, call_deadline: Optional[Deadline] = None) -> dict:
+        """
+        Calls the operation of the validated serializer outside
+        of its request, and returns the response or the errors
+        along with the status the request would have had.
+
+        :param call_deadline:
+        :return:
+        """
         try:
-            result = getattr(client, self.operation.name)(**attrs)
-        except Exception as e:
-            print(e, type(e))
-            raise serializers.ValidationError(e)
+            with deadline.activate(call_deadline):
+                attrs = self.call(self.validated_data)
+        except serializers.ValidationError as e:
+            return {'status': status.HTTP_409_CONFLICT, 'errors': serializers.as_serializer_error(e)}
+        except APIException as e:
+            return {'status': e.status_code, 'errors': [e.detail]}
 
-        # TODO: Cache response
-        attrs.update(response=str(result))
+        return {'status': status.HTTP_200_OK, 'response': attrs['response']}
+
+    async def validate_async(self, attrs: dict) -> dict:
+        """
+        Calls the operation without blocking the event loop,
+        or takes its response from cache, which is read and
+        written in a thread. Identical concurrent calls of
+        read-only operations share a single call to the backend.
+
+        :param attrs:
+        :return:
+        """
+        deadline.check()
+        response = await sync_to_async(self.get_cached)(attrs)
+
+        if response is None:
+            async def fn():
+                return await sync_to_async(self.set_cached)(attrs, self.convert(await self.invoke_async(attrs)))
+
+            try:
+                if self.is_read_only():
+                    response = await coalesce_async(self.get_cache_key(attrs), fn)
+                else:
+                    response = await fn()
+            except APIException:
+                raise
+            except Exception as e:
+                deadline.check()
+                raise serializers.ValidationError(e)
+
+        deadline.check()
+        attrs.update(response=response)
 
         return attrs
+
+    @staticmethod
+    def convert(result: Any) -> Any:
+        """
+        Converts the result of the call to serializable data.
+
+        :param result:
+        :return:
+        """
+        with timing.phase(timing.PARSE):
+            return converters.convert(result)
+
+    def is_read_only(self) -> bool:
+        """
+        Returns true if identical concurrent calls can share a
+        single backend call, which is only safe for operations
+        flagged as read-only or cached.
+
+        :return:
+        """
+        return bool(self.options.get('read_only') or self.options.get('cache_timeout'))
+
+    def get_cache_key(self, attrs: dict) -> str:
+        """
+        Returns the key of the response to the given arguments.
+
+        :param attrs:
+        :return:
+        """
+        return self.responses.make_key(
+            self.connector.client_pk, self.connector.fingerprint,
+            self.service.name, self.port.name, self.operation.name,
+            arguments=attrs
+        )
+
+    def get_cached(self, attrs: dict) -> Any:
+        """
+        Returns the cached response if the operation is cached.
+
+        :param attrs:
+        :return:
+        """
+        if not self.options.get('cache_timeout'):
+            return None
+
+        response = self.responses.get(self.get_cache_key(attrs))
+        self.cache_status = 'MISS' if response is None else 'HIT'
+        metrics.cache_requests.inc('response', self.cache_status.lower())
+
+        return response
+
+    def set_cached(self, attrs: dict, response: Any) -> Any:
+        """
+        Caches the response if the operation is cached.
+
+        :param attrs:
+        :param response:
+        :return:
+        """
+        timeout = self.options.get('cache_timeout')
+        if timeout:
+            self.responses.set(self.get_cache_key(attrs), response, timeout)
+
+        return response
+
+    def invoke(self, attrs: dict):
+        """
+        Calls the operation within its timeout, building the
+        envelope from its precompiled template when enabled and
+        possible.
+
+        :param attrs:
+        :return:
+        """
+        client = self.connector.client
+        template = self.get_template(client, attrs)
+
+        with self.trace(), deadline.limit(self.get_timeout()) as call_deadline, self.backend.guard(lane=self.lane), \
+                client.settings(raw_response=False), self.track(), self.record(), timing.call(), \
+                self.sample(call_deadline):
+            if template is not None:
+                address = self.port.binding_options['address']
+                return template.send(client, self.port.binding, self.operation, address, attrs)
+
+            proxy = client.bind(self.service.name, self.port.name)
+            return getattr(proxy, self.operation.name)(**attrs)
+
+    async def invoke_async(self, attrs: dict):
+        """
+        Calls the operation through zeep's AsyncClient. Calls
+        don't wait for a free slot of the bulkhead, so as not to
+        block the event loop.
+
+        :param attrs:
+        :return:
+        """
+        client = self.connector.async_client()
+        client.settings.raw_response = False
+        template = self.get_template(client, attrs)
+
+        with self.trace(), deadline.limit(self.get_timeout()) as call_deadline, \
+                self.backend.guard(wait=False, lane=self.lane), self.track(), self.record(), timing.call(), \
+                self.sample(call_deadline):
+            if template is not None:
+                address = self.port.binding_options['address']
+                return await template.send_async(client, self.port.binding, self.operation, address, attrs)
+
+            proxy = client.bind(self.service.name, self.port.name)
+            return await getattr(proxy, self.operation.name)(**attrs)
+
+    def stream(self, attrs: dict) -> StreamedResponse:
+        """
+        Posts the call and returns the body of the response of
+        the server unread, skipping the parsing of the reply.
+        The call holds its slot of the bulkhead until the body
+        is read or closed, and server errors count as failures
+        of the backend. Streamed responses are neither cached
+        nor shared.
+
+        :param attrs:
+        :return:
+        """
+        client = self.connector.client
+        binding = self.port.binding
+        template = self.get_template(client, attrs)
+
+        with timing.phase(timing.ENVELOPE):
+            if template is not None:
+                envelope, headers = template.render(attrs), dict(template.headers)
+            else:
+                envelope, headers = binding._create(
+                    self.operation.name, (), attrs, client=client, options=self.port.binding_options
+                )
+
+        with self.trace(), deadline.limit(self.get_timeout()) as call_deadline:
+            lane = self.backend.acquire(lane=self.lane)
+            try:
+                with self.track(), self.record():
+                    response = client.transport.post_stream(self.port.binding_options['address'], envelope, headers)
+            except BaseException as e:
+                self.backend.release(lane, e)
+                raise
+
+        return StreamedResponse(response, functools.partial(self.backend.release, lane), call_deadline)
+
+    def get_template(self, client, attrs: dict) -> Optional[EnvelopeTemplate]:
+        """
+        Returns the precompiled template of the operation if
+        it's enabled and it can render the arguments.
+
+        :param client:
+        :param attrs:
+        :return:
+        """
+        if not self.options.get('template'):
+            return None
+
+        template = templates.get(client, self.port.binding, self.operation)
+        if template is not None and template.accepts(attrs):
+            return template
@@ -0,0 +1,50 @@
+from rest_framework import serializers
+
+from .base import BaseSerializer
+
+
+class TransportSerializer(BaseSerializer):
+    """
+
+    """
+    pool_connections = serializers.IntegerField(
+        default=10, min_value=1,
+        help_text="Number of per host connection pools to keep.")
+
+    pool_maxsize = serializers.IntegerField(
+        default=10, min_value=1,
+        help_text="Maximum number of connections kept alive to each host.")
+
+    pool_block = serializers.BooleanField(
+        default=False,
+        help_text="Boolean to wait for a free connection instead of opening a "
+                  "new one when the pool of the host is full.")
+
+    keep_alive = serializers.BooleanField(
+        default=True,
+        help_text="Boolean to reuse the connections across calls. If false, "
+                  "the connections are closed after each request.")
+
+    connect_timeout = serializers.FloatField(
+        min_value=0, required=False,
+        help_text="Seconds to wait for a connection to be established.")
+
+    read_timeout = serializers.FloatField(
+        min_value=0, required=False,
+        help_text="Seconds to wait for the server to send the response of an "
+                  "operation.")
+
+    load_timeout = serializers.FloatField(
+        default=300, min_value=0,
+        help_text="Seconds to wait for the server to send a WSDL or XSD "
+                  "document.")
+
+    retries = serializers.IntegerField(
+        default=0, min_value=0,
+        help_text="Number of retries of failed connections. Reads are only "
+                  "retried for idempotent requests, never for operation calls.")
+
+    backoff_factor = serializers.FloatField(
+        default=0, min_value=0,
+        help_text="Factor applied between retries: {backoff factor} * "
+                  "(2 ** ({number of previous retries}))")
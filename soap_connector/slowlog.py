@@ -0,0 +1,266 @@
+import itertools
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from lxml import etree
+
+from zeep import ns
+
+DEFAULT_SLOW_CALL_THRESHOLD = 1
+DEFAULT_SLOW_CALL_BUFFER = 100
+DEFAULT_SLOW_CALL_SAMPLE_RATE = 0
+DEFAULT_SLOW_CALL_MAX_ENVELOPE = 64 * 1024
+
+OPERATION = 'operation'
+WSDL = 'wsdl'
+
+REDACTED = '***'
+
+# Elements of the WS-Security header holding the fields of the
+# UsernameToken and Signature objects.
+SECRETS = {
+    etree.QName(ns.WSSE, 'Username').text,
+    etree.QName(ns.WSSE, 'Password').text,
+    etree.QName(ns.WSSE, 'Nonce').text,
+    etree.QName(ns.WSSE, 'BinarySecurityToken').text,
+    etree.QName(ns.DS, 'SignatureValue').text,
+    etree.QName(ns.DS, 'X509Certificate').text,
+}
+
+# Fallback for the messages that aren't well-formed documents,
+# such as multipart ones.
+SECRETS_PATTERN = re.compile(
+    r'(<(?:[\w.-]+:)?(?:{})\b[^>]*>).*?(</)'.format('|'.join(etree.QName(tag).localname for tag in SECRETS)),
+    re.DOTALL
+)
+
+parser = etree.XMLParser(resolve_entities=False, no_network=True)
+
+
+class SlowCallLog(object):
+    """
+    Ring buffer of the last calls slower than the threshold set
+    in the project settings.
+    """
+    def __init__(self):
+        """
+        Initialize the log.
+        """
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.records = deque(maxlen=self.size)
+
+    @property
+    def size(self) -> int:
+        """
+
+        :return:
+        """
+        return getattr(settings, 'SOAP_CONNECTOR_SLOW_CALL_BUFFER', DEFAULT_SLOW_CALL_BUFFER)
+
+    @property
+    def threshold(self) -> float:
+        """
+
+        :return:
+        """
+        return getattr(settings, 'SOAP_CONNECTOR_SLOW_CALL_THRESHOLD', DEFAULT_SLOW_CALL_THRESHOLD)
+
+    def add(self, record: dict) -> None:
+        """
+
+        :param record:
+        :return:
+        """
+        with self.lock:
+            if self.records.maxlen != self.size:
+                self.records = deque(self.records, maxlen=self.size)
+            record['id'] = next(self.ids)
+            self.records.append(record)
+
+    def list(self, kind: Optional[str] = None, user: Optional[str] = None) -> List[dict]:
+        """
+        Returns the records, the most recent first.
+
+        :param kind:
+        :param user: Key of the user whose calls are returned, or
+                     None for the calls of every user
+        :return:
+        """
+        with self.lock:
+            records = list(self.records)
+        return [
+            record for record in reversed(records)
+            if (kind is None or record['kind'] == kind) and (user is None or record.get('user') == user)
+        ]
+
+    def clear(self) -> None:
+        """
+
+        :return:
+        """
+        with self.lock:
+            self.records.clear()
+
+
+slow_calls = SlowCallLog()
+
+
+class Exchange(object):
+    """
+    Messages exchanged by a recorded call, filled in by the
+    transport.
+    """
+    __slots__ = ('address', 'status', 'request', 'response', 'documents', 'size')
+
+    def __init__(self):
+        self.address: Optional[str] = None
+        self.status: Optional[int] = None
+        self.request: Optional[bytes] = None
+        self.response: Optional[bytes] = None
+        self.documents = 0
+        self.size = 0
+
+
+_current: ContextVar[Optional[Exchange]] = ContextVar('soap_connector_exchange', default=None)
+
+
+def capture(address: str, message: bytes, status: Optional[int] = None, content: Optional[bytes] = None) -> None:
+    """
+    Keeps the messages of the recorded call, if any.
+
+    :param address:
+    :param message:
+    :param status:
+    :param content: Body of the response, unless it's streamed
+    :return:
+    """
+    exchange = _current.get()
+    if exchange is not None:
+        exchange.address = address
+        exchange.request = message
+        exchange.status = status
+        exchange.response = content
+
+
+def capture_document(content: bytes) -> None:
+    """
+    Counts a document loaded by the recorded WSDL load, if any.
+
+    :param content:
+    :return:
+    """
+    exchange = _current.get()
+    if exchange is not None:
+        exchange.documents += 1
+        exchange.size += len(content)
+
+
+def redact(message: Optional[bytes]) -> Optional[str]:
+    """
+    Returns the envelope with the WS-Security secrets masked,
+    truncated to the maximum size set in the project settings.
+
+    :param message:
+    :return:
+    """
+    if message is None:
+        return None
+
+    try:
+        root = etree.fromstring(message, parser)
+    except (etree.XMLSyntaxError, ValueError):
+        text = message.decode('utf-8', 'replace') if isinstance(message, bytes) else str(message)
+        text = SECRETS_PATTERN.sub(rf'\g<1>{REDACTED}\g<2>', text)
+    else:
+        for element in root.iter():
+            if element.tag in SECRETS:
+                element.text = REDACTED
+                for child in list(element):
+                    element.remove(child)
+        text = etree.tostring(root, encoding='unicode')
+
+    limit = getattr(settings, 'SOAP_CONNECTOR_SLOW_CALL_MAX_ENVELOPE', DEFAULT_SLOW_CALL_MAX_ENVELOPE)
+    return text[:limit]
+
+
+def sampled() -> bool:
+    """
+    Returns true if the envelopes of a slow call are kept.
+
+    :return:
+    """
+    rate = getattr(settings, 'SOAP_CONNECTOR_SLOW_CALL_SAMPLE_RATE', DEFAULT_SLOW_CALL_SAMPLE_RATE)
+    return random.random() < rate
+
+
+@contextmanager
+def record(kind: str, **attributes) -> Iterator[Exchange]:
+    """
+    Adds the block to the slow-call log if it lasts longer than
+    the threshold, along with the sizes of the messages and,
+    for a sample of the calls, the envelopes.
+
+    :param kind:
+    :param attributes:
+    :return:
+    """
+    exchange = Exchange()
+    token = _current.set(exchange)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield exchange
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current.reset(token)
+        duration = time.perf_counter() - start
+        if duration >= slow_calls.threshold:
+            slow_calls.add(build(kind, exchange, attributes, duration, error))
+
+
+def build(kind: str, exchange: Exchange, attributes: dict, duration: float, error: Optional[str]) -> dict:
+    """
+    Returns the record of a slow call.
+
+    :param kind:
+    :param exchange:
+    :param attributes:
+    :param duration:
+    :param error:
+    :return:
+    """
+    data = {
+        'kind': kind,
+        **attributes,
+        'started_at': timezone.now() - timedelta(seconds=duration),
+        'duration': duration,
+        'error': error,
+    }
+
+    if kind == WSDL:
+        data.update(documents=exchange.documents, size=exchange.size)
+        return data
+
+    keep = sampled()
+    data.update(
+        address=exchange.address,
+        status=exchange.status,
+        request_size=len(exchange.request) if exchange.request is not None else None,
+        response_size=len(exchange.response) if exchange.response is not None else None,
+        request=redact(exchange.request) if keep else None,
+        response=redact(exchange.response) if keep else None,
+    )
+    return data
@@ -1,11 +1,14 @@
 from unittest import skip
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 
 from django.test import TestCase
 from django.contrib.auth.models import AnonymousUser
 from rest_framework.reverse import reverse
 from rest_framework import serializers
-from rest_framework.test import APIRequestFactory
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+
+from soap_connector.cache import Cache
 
 from soap_connector.tests.api.utils import DummyView, BaseSerializer, set_name, _counter
 
@@ -163,3 +166,31 @@ class BaseAPIViewTestCase(TestCase):
 
         :return:
         """
+
+
+class BaseSerializerTestCase(APITestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+
+    def test_concurrent_create(self):
+        """
+        Objects created concurrently get distinct primary keys.
+
+        :return:
+        """
+        url = reverse("soap_connector:settings_list")
+        data = {'xsd_ignore_sequence_order': False}
+
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(lambda _: APIClient().post(url, data, format='json'), range(32)))
+
+        pks = sorted(response.data['pk'] for response in responses)
+        self.assertEqual(list(range(1, 33)), pks)
+        self.assertEqual(pks, sorted(item['pk'] for item in self.client.get(url).data))
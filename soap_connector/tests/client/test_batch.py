@@ -0,0 +1,133 @@
+import time
+
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.tests.stub import StubServer
+
+
+class BatchViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+
+        response = self.client.post(
+            reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url}
+        )
+        self.url = reverse("soap_connector:client_batch", kwargs={'client_pk': response.data['pk']})
+
+    @staticmethod
+    def call(operation, **args):
+        """
+
+        :param operation:
+        :param args:
+        :return:
+        """
+        return {'service': 'calculatorservice', 'port': 'calculatorport', 'operation': operation, 'args': args}
+
+    def post(self, calls, **kwargs):
+        """
+
+        :param calls:
+        :param kwargs:
+        :return:
+        """
+        return self.client.post(self.url, dict(calls=calls, **kwargs), format='json')
+
+    def test_simple(self):
+        """
+        Results come back in the order of the calls.
+
+        :return:
+        """
+        response = self.post([self.call('add', a=a, b=1) for a in range(5)])
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [{'status': 200, 'response': a + 1} for a in range(5)],
+            response.data['results']
+        )
+
+    def test_errors(self):
+        """
+        Invalid calls don't prevent the others from running.
+
+        :return:
+        """
+        response = self.post([
+            self.call('add', a='one', b=1),
+            self.call('missing'),
+            self.call('echo', text='hello'),
+        ])
+        statuses = [result['status'] for result in response.data['results']]
+
+        self.assertEqual([409, 404, 200], statuses)
+        self.assertIn('a', response.data['results'][0]['errors'])
+
+    def test_concurrency(self):
+        """
+
+        :return:
+        """
+        start = time.monotonic()
+        response = self.post([self.call('echo', text=str(i), delay='0.3') for i in range(5)])
+
+        self.assertEqual([str(i) for i in range(5)], [result['response'] for result in response.data['results']])
+        self.assertLess(time.monotonic() - start, 1.2)
+
+    def test_deadline(self):
+        """
+        Calls still running at the deadline are reported as
+        timed out.
+
+        :return:
+        """
+        start = time.monotonic()
+        response = self.post(
+            [self.call('echo', text='fast'), self.call('echo', text='slow', delay='1')], timeout=0.5
+        )
+
+        self.assertEqual([200, 504], [result['status'] for result in response.data['results']])
+        self.assertLess(time.monotonic() - start, 0.9)
+
+    @override_settings(SOAP_CONNECTOR_BATCH_SIZE=2)
+    def test_size(self):
+        """
+
+        :return:
+        """
+        response = self.post([self.call('add', a=1, b=1)] * 3)
+
+        self.assertEqual(409, response.status_code)
+        self.assertIn('calls', response.data)
+
+    def test_non_existent_client(self):
+        """
+
+        :return:
+        """
+        self.url = reverse("soap_connector:client_batch", kwargs={'client_pk': 99})
+        response = self.post([self.call('add', a=1, b=1)])
+
+        self.assertEqual(404, response.status_code)
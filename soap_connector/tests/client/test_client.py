@@ -9,7 +9,7 @@ from rest_framework.reverse import reverse
 from rest_framework.test import APIRequestFactory
 from rest_framework.test import APITestCase
 
-from soap_connector.cache import Registry
+from soap_connector.cache import Cache
 
 
 def request_factory(url):
@@ -44,7 +44,7 @@ class ClientViewTestCase(APITestCase):
         if self.failed:
             self.skipTest("Test skipped because service is not available!")
 
-        Registry.sessions = set()
+        Cache.clear()
 
         self.url = reverse("soap_connector:client_list")
         self.data = {
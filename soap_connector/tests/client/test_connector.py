@@ -0,0 +1,382 @@
+import json
+import threading
+import time
+
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from django.test import SimpleTestCase
+
+import zeep
+from zeep.client import AsyncClient, Client
+
+from soap_connector.cache import Cache
+from soap_connector.connector import CLIENT_ATTRIBUTES, ClientPool, Connector, clone_client
+from soap_connector.tests.stub import StubServer
+
+
+class ClientPoolTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.pool = ClientPool(size=2)
+        self.loads = []
+
+    def loader(self, **fields):
+        """
+        Fake client loader that records its calls.
+
+        :param fields:
+        :return:
+        """
+        time.sleep(0.05)
+        self.loads.append(fields)
+        return object()
+
+    def test_reuse(self):
+        """
+        The same key and fields return the same client.
+
+        :return:
+        """
+        client = self.pool.get(1, {'wsdl': 'a'}, self.loader)
+
+        self.assertIs(client, self.pool.get(1, {'wsdl': 'a'}, self.loader))
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(1, self.pool.stats['hits'])
+
+    def test_fingerprint(self):
+        """
+        A client built from different fields is reloaded.
+
+        :return:
+        """
+        client = self.pool.get(1, {'wsdl': 'a'}, self.loader)
+
+        self.assertIsNot(client, self.pool.get(1, {'wsdl': 'b'}, self.loader))
+        self.assertEqual(2, self.pool.stats['loads'])
+        self.assertEqual(1, len(self.pool))
+
+    def test_single_flight(self):
+        """
+        Concurrent first requests trigger only one load.
+
+        :return:
+        """
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.pool.get(1, {'wsdl': 'a'}, self.loader))
+            ) for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(1, len(set(map(id, results))))
+
+    def test_invalidate(self):
+        """
+
+        :return:
+        """
+        self.pool.get(1, {'wsdl': 'a'}, self.loader)
+        self.pool.invalidate(1)
+
+        self.assertNotIn(1, self.pool)
+        self.pool.get(1, {'wsdl': 'a'}, self.loader)
+        self.assertEqual(2, len(self.loads))
+
+    def test_eviction(self):
+        """
+        The least recently used client is evicted.
+
+        :return:
+        """
+        self.pool.get(1, {'wsdl': 'a'}, self.loader)
+        self.pool.get(2, {'wsdl': 'a'}, self.loader)
+        self.pool.get(1, {'wsdl': 'a'}, self.loader)
+        self.pool.get(3, {'wsdl': 'a'}, self.loader)
+
+        self.assertIn(1, self.pool)
+        self.assertNotIn(2, self.pool)
+
+
+class ConnectorTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        self.server.requests.clear()
+
+        response = self.client.post(
+            reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url}
+        )
+        self.pk = response.data['pk']
+        self.url = reverse(
+            "soap_connector:client_service_list",
+            kwargs={'client_pk': self.pk}
+        )
+
+    def test_clone_client(self):
+        """
+        Clones copy every attribute of zeep's clients, which must
+        be checked again when zeep is upgraded.
+
+        :return:
+        """
+        client = Client(self.server.wsdl_url)
+        clone = clone_client(client, AsyncClient, wsse=None, plugins=['plugin'])
+
+        self.assertEqual(['4', '1'], zeep.__version__.split('.')[:2])
+        self.assertEqual(set(CLIENT_ATTRIBUTES), set(vars(client)))
+        self.assertIsInstance(clone, AsyncClient)
+        self.assertIs(client.wsdl, clone.wsdl)
+        self.assertEqual(['plugin'], clone.plugins)
+        self.assertEqual([], client.plugins)
+
+    def test_reuse(self):
+        """
+        The WSDL document is only loaded once across requests.
+
+        :return:
+        """
+        for _ in range(3):
+            response = self.client.get(self.url)
+            self.assertEqual(200, response.status_code)
+
+        self.assertEqual(1, Connector.pool.stats['loads'])
+        self.assertEqual(1, self.server.requests.count(('GET', '/calculator?wsdl')))
+
+    def test_delete(self):
+        """
+        Deleting the client discards the pooled client.
+
+        :return:
+        """
+        self.client.get(self.url)
+        self.assertEqual(1, len(Connector.pool))
+
+        self.client.delete(
+            reverse("soap_connector:client_detail", kwargs={'client_pk': self.pk})
+        )
+        self.assertEqual(0, len(Connector.pool))
+
+    def test_transport(self):
+        """
+        Clients share the pooled session of their transport.
+
+        :return:
+        """
+        data = {'pool_maxsize': 4, 'read_timeout': 10}
+        response = self.client.post(reverse("soap_connector:transport_list"), data)
+        transport_pk = response.data['pk']
+
+        pks = [
+            self.client.post(
+                reverse("soap_connector:client_list"),
+                {'wsdl': self.server.wsdl_url, 'transport': transport_pk}
+            ).data['pk']
+            for _ in range(2)
+        ]
+        clients = [
+            Connector.pool.clients[('0', pk)][1] for pk in pks
+        ]
+
+        self.assertIs(clients[0].transport.session, clients[1].transport.session)
+        self.assertEqual((None, 10), clients[0].transport.operation_timeout)
+
+    def test_missing_transport(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(
+            reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url, 'transport': 99}
+        )
+        url = reverse("soap_connector:client_service_list", kwargs={'client_pk': response.data['pk']})
+
+        self.assertEqual(409, self.client.get(url).status_code)
+
+
+class SnapshotTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+
+        response = self.client.post(
+            reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url}
+        )
+        self.pk = response.data['pk']
+        Connector.pool.stats.clear()
+
+    def test_list(self):
+        """
+        Listings are rendered from the snapshot built when the
+        client was created.
+
+        :return:
+        """
+        for name in ['service', 'binding', 'prefix', 'global_element', 'global_type']:
+            url = reverse(f"soap_connector:client_{name}_list", kwargs={'client_pk': self.pk})
+            response = self.client.get(url)
+
+            self.assertEqual(200, response.status_code)
+            self.assertTrue(response.data)
+
+        self.assertEqual(0, Connector.pool.stats['lookups'])
+
+    def test_nested(self):
+        """
+
+        :return:
+        """
+        url = reverse("soap_connector:client_service_list", kwargs={'client_pk': self.pk})
+        service = self.client.get(url).data[0]
+        port = service['ports'][0]
+
+        self.assertEqual('CalculatorService', service['name'])
+        self.assertEqual('CalculatorPort', port['name'])
+        self.assertEqual(
+            ['Add', 'Echo', 'ListItems'],
+            [operation['name'] for operation in port['operations']]
+        )
+        self.assertEqual(port, self.client.get(port['url']).data)
+
+    def test_detail(self):
+        """
+
+        :return:
+        """
+        url = reverse("soap_connector:client_global_type_list", kwargs={'client_pk': self.pk})
+        item = self.client.get(url).data[0]
+        response = self.client.get(item['url'])
+
+        self.assertEqual(item, response.data)
+        self.assertEqual(200, self.client.get(item['prefix']).status_code)
+
+    def test_detail_non_existent(self):
+        """
+
+        :return:
+        """
+        url = reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': 'missing'
+            }
+        )
+        self.assertEqual(404, self.client.get(url).status_code)
+
+    def test_pagination(self):
+        """
+        Walking the cursors returns every item once, in order.
+
+        :return:
+        """
+        url = reverse("soap_connector:client_global_type_list", kwargs={'client_pk': self.pk})
+        items = self.client.get(url).data
+        pages = []
+
+        response = self.client.get(url, {'limit': 10})
+        while True:
+            self.assertLessEqual(len(response.data['results']), 10)
+            pages.extend(response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(items, pages)
+        self.assertEqual(len(items), response.data['count'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_invalid_cursor(self):
+        """
+
+        :return:
+        """
+        url = reverse("soap_connector:client_global_element_list", kwargs={'client_pk': self.pk})
+        response = self.client.get(url, {'cursor': 'invalid'})
+
+        self.assertEqual(400, response.status_code)
+
+    def test_stream(self):
+        """
+
+        :return:
+        """
+        url = reverse("soap_connector:client_global_element_list", kwargs={'client_pk': self.pk})
+        items = self.client.get(url).json()
+        response = self.client.get(url, {'stream': 1})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(items, json.loads(b''.join(response.streaming_content)))
+
+    def test_stream_disabled(self):
+        """
+        A false stream parameter returns a page.
+
+        :return:
+        """
+        url = reverse("soap_connector:client_global_element_list", kwargs={'client_pk': self.pk})
+
+        for value in ['0', 'false']:
+            response = self.client.get(url, {'stream': value})
+            self.assertFalse(response.streaming)
+            self.assertIn('results', response.data)
+
+    def test_invalid_limit(self):
+        """
+        Invalid limits are rejected before anything is sent.
+
+        :return:
+        """
+        url = reverse("soap_connector:client_global_element_list", kwargs={'client_pk': self.pk})
+
+        for params in [{'stream': 1, 'limit': -5}, {'stream': 1, 'limit': 0}, {'limit': -5}]:
+            response = self.client.get(url, params)
+            self.assertFalse(response.streaming)
+            self.assertEqual(400, response.status_code)
@@ -0,0 +1,136 @@
+import time
+
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.jobs import DONE, FAILED, QUEUED, RUNNING
+from soap_connector.tests.stub import StubServer
+
+
+class JobViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+
+        response = self.client.post(
+            reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url}
+        )
+        self.pk = response.data['pk']
+
+    def url(self, operation):
+        """
+
+        :param operation:
+        :return:
+        """
+        return reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': operation
+            }
+        ) + '?async=1'
+
+    def wait(self, location, timeout=5):
+        """
+        Polls the job until it's finished.
+
+        :param location:
+        :param timeout:
+        :return:
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.client.get(location).data
+            if job['state'] in (DONE, FAILED):
+                return job
+            time.sleep(0.05)
+        self.fail("The job didn't finish")
+
+    def test_simple(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(self.url('echo'), {'text': 'hello', 'delay': '0.2'}, format='json')
+
+        self.assertEqual(202, response.status_code)
+        self.assertIn(response.data['state'], [QUEUED, RUNNING])
+        self.assertIn('X-Queue-Depth', response)
+
+        job = self.wait(response['Location'])
+        self.assertEqual('Echo', job['operation'])
+        self.assertEqual({'status': 200, 'response': 'hello'}, job['result'])
+        self.assertIsNotNone(job['finished_at'])
+
+    def test_invalid(self):
+        """
+        Arguments are validated before the job is queued.
+
+        :return:
+        """
+        response = self.client.post(self.url('add'), {'a': 'one', 'b': 2}, format='json')
+
+        self.assertEqual(409, response.status_code)
+        self.assertEqual([], self.client.get(reverse("soap_connector:job_list")).data)
+
+    def test_failed(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(
+            self.url('echo'), {'text': 'hello', 'delay': '1'}, format='json', HTTP_X_REQUEST_TIMEOUT='0.2'
+        )
+
+        job = self.wait(response['Location'])
+        self.assertEqual(FAILED, job['state'])
+        self.assertEqual(504, job['result']['status'])
+
+    @override_settings(SOAP_CONNECTOR_JOB_QUEUE_SIZE=0)
+    def test_full(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(503, response.status_code)
+
+    @override_settings(SOAP_CONNECTOR_JOB_RETENTION=2)
+    def test_retention(self):
+        """
+        The oldest finished jobs are deleted.
+
+        :return:
+        """
+        for a in range(4):
+            response = self.client.post(self.url('add'), {'a': a, 'b': 2}, format='json')
+            self.wait(response['Location'])
+
+        response = self.client.get(reverse("soap_connector:job_list"))
+
+        self.assertEqual([3, 4], [job['pk'] for job in response.data])
+        self.assertEqual('0', response['X-Queue-Depth'])
+        self.assertEqual(404, self.client.get(reverse("soap_connector:job_detail", kwargs={'job_pk': 1})).status_code)
@@ -0,0 +1,516 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipIf
+
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.envelope import templates
+from soap_connector.serializers import OperationSerializer
+from soap_connector.serializers.compiler import compiler
+from soap_connector.tests.stub import StubServer
+from soap_connector.transport import httpx
+
+
+class OperationViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+
+        response = self.client.post(
+            reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url}
+        )
+        self.pk = response.data['pk']
+        self.client.get(
+            reverse("soap_connector:client_service_list", kwargs={'client_pk': self.pk})
+        )
+
+    def url(self, operation):
+        """
+        Returns the url of the operation.
+
+        :param operation:
+        :return:
+        """
+        return reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': operation
+            }
+        )
+
+    def test_post(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.data['response'])
+
+    def test_single_lookup(self):
+        """
+        One request resolves the connector only once.
+
+        :return:
+        """
+        Connector.pool.stats.clear()
+        self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+
+        self.assertEqual(1, Connector.pool.stats['lookups'])
+        self.assertEqual(0, Connector.pool.stats['loads'])
+
+    def test_typed_fields(self):
+        """
+        Parameters are validated against their XSD types.
+
+        :return:
+        """
+        response = self.client.post(self.url('add'), {'a': 'one', 'b': 2}, format='json')
+
+        self.assertEqual(409, response.status_code)
+        self.assertIn('a', response.data)
+
+    def test_optional_fields(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(self.url('echo'), {'text': 'hello'}, format='json')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('hello', response.data['response'])
+
+    def test_list_fields(self):
+        """
+
+        :return:
+        """
+        data = {'count': 2, 'tags': ['a', 'b']}
+        response = self.client.post(self.url('listitems'), data, format='json')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [
+                {'id': 0, 'name': 'item-0', 'price': '0.50', 'available': True},
+                {'id': 1, 'name': 'item-1', 'price': '1.50', 'available': False}
+            ],
+            response.data['response']
+        )
+
+    def test_compiled_once(self):
+        """
+        The serializer class is compiled once per operation.
+
+        :return:
+        """
+        compiler.stats.clear()
+        for _ in range(3):
+            self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+
+        self.assertEqual(1, compiler.stats['compilations'])
+        self.assertEqual(2, compiler.stats['hits'])
+
+    def test_template(self):
+        """
+        Operations can opt in to precompiled envelopes.
+
+        :return:
+        """
+        data = {'wsdl': self.server.wsdl_url, 'operations': {'Add': {'template': True}}}
+        response = self.client.post(reverse("soap_connector:client_list"), data, format='json')
+        self.pk = response.data['pk']
+
+        templates.stats.clear()
+        for a in range(3):
+            response = self.client.post(self.url('add'), {'a': a, 'b': 2}, format='json')
+            self.assertEqual(a + 2, response.data['response'])
+
+        self.assertEqual(1, templates.stats['compilations'])
+
+    def test_response_cache(self):
+        """
+        Responses of cached operations are reused while they
+        don't expire.
+
+        :return:
+        """
+        data = {'wsdl': self.server.wsdl_url, 'operations': {'Add': {'cache_timeout': 60}}}
+        response = self.client.post(reverse("soap_connector:client_list"), data, format='json')
+        self.pk = response.data['pk']
+        self.server.requests.clear()
+
+        statuses = [
+            self.client.post(self.url('add'), arguments, format='json')['X-Cache']
+            for arguments in [{'a': 1, 'b': 2}, {'b': 2, 'a': 1}, {'a': 2, 'b': 2}]
+        ]
+
+        self.assertEqual(['MISS', 'HIT', 'MISS'], statuses)
+        self.assertEqual(2, self.server.requests.count(('POST', '/calculator')))
+
+    def test_uncached_operation(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def post_concurrently(self, operation, data, n=4):
+        """
+        Posts the same call from several clients at once.
+
+        :param operation:
+        :param data:
+        :param n:
+        :return:
+        """
+        with ThreadPoolExecutor(n) as executor:
+            return list(executor.map(
+                lambda _: APIClient().post(self.url(operation), data, format='json'), range(n)
+            ))
+
+    def read_only(self):
+        """
+        Registers a client whose echo operation is read-only.
+
+        :return:
+        """
+        data = {'wsdl': self.server.wsdl_url, 'operations': {'Echo': {'read_only': True}}}
+        response = self.client.post(reverse("soap_connector:client_list"), data, format='json')
+        self.pk = response.data['pk']
+        self.server.requests.clear()
+
+    def test_coalescing(self):
+        """
+        Identical concurrent calls of read-only operations share
+        one backend call.
+
+        :return:
+        """
+        self.read_only()
+        responses = self.post_concurrently('echo', {'text': 'hello', 'delay': '0.3'})
+
+        self.assertEqual(['hello'] * 4, [response.data['response'] for response in responses])
+        self.assertEqual(1, self.server.requests.count(('POST', '/calculator')))
+
+    def test_not_coalesced(self):
+        """
+        Calls of operations that may have side effects are never
+        shared.
+
+        :return:
+        """
+        self.server.requests.clear()
+        responses = self.post_concurrently('echo', {'text': 'hello', 'delay': '0.1'}, n=2)
+
+        self.assertEqual(['hello'] * 2, [response.data['response'] for response in responses])
+        self.assertEqual(2, self.server.requests.count(('POST', '/calculator')))
+
+    @override_settings(SOAP_CONNECTOR_COALESCE_SHARED=True)
+    def test_shared_coalescing(self):
+        """
+
+        :return:
+        """
+        self.read_only()
+        responses = self.post_concurrently('echo', {'text': 'hello', 'delay': '0.3'})
+
+        self.assertEqual(['hello'] * 4, [response.data['response'] for response in responses])
+        self.assertEqual(1, self.server.requests.count(('POST', '/calculator')))
+
+    @override_settings(SOAP_CONNECTOR_COALESCE=False)
+    def test_coalescing_disabled(self):
+        """
+
+        :return:
+        """
+        self.read_only()
+        self.post_concurrently('echo', {'text': 'hello', 'delay': '0.1'}, n=2)
+
+        self.assertEqual(2, self.server.requests.count(('POST', '/calculator')))
+
+    def test_raw(self):
+        """
+        The response of the server is streamed as is.
+
+        :return:
+        """
+        response = self.client.post(self.url('add') + '?raw=1', {'a': 1, 'b': 2}, format='json')
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/xml'))
+        self.assertIn(b'<result>3</result>', content)
+
+    def test_raw_settings(self):
+        """
+        Clients whose settings enable raw responses stream them,
+        unless the caller asks for the parsed response.
+
+        :return:
+        """
+        data = {'raw_response': True, 'xsd_ignore_sequence_order': False}
+        settings_pk = self.client.post(reverse("soap_connector:settings_list"), data).data['pk']
+        data = {'wsdl': self.server.wsdl_url, 'settings': settings_pk}
+        self.pk = self.client.post(reverse("soap_connector:client_list"), data).data['pk']
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertTrue(response.streaming)
+
+        response = self.client.post(self.url('add') + '?raw=0', {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(3, response.data['response'])
+
+class AsyncDispatchTestCase(APITestCase):
+    """
+    Dispatch of the async operation view, with the call to the
+    backend replaced so that it runs without httpx.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+
+        data = {'wsdl': self.server.wsdl_url, 'operations': {'Add': {'cache_timeout': 60}}}
+        self.pk = self.client.post(reverse("soap_connector:client_list"), data, format='json').data['pk']
+        self.threads = {}
+
+    def url(self, operation):
+        """
+
+        :param operation:
+        :return:
+        """
+        return reverse(
+            "soap_connector:client_operation_async",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': operation
+            }
+        )
+
+    async def post(self, data):
+        """
+        Posts a call of the add operation, recording the threads
+        running the call and the cache lookup.
+
+        :param data:
+        :return:
+        """
+        get_cached = OperationSerializer.get_cached
+        threads = self.threads
+
+        async def invoke_async(serializer, attrs):
+            threads['call'] = threading.current_thread()
+            return attrs['a'] + attrs['b']
+
+        def get_cached_in_thread(serializer, attrs):
+            threads['cache'] = threading.current_thread()
+            return get_cached(serializer, attrs)
+
+        with mock.patch.object(OperationSerializer, 'invoke_async', invoke_async), \
+                mock.patch.object(OperationSerializer, 'get_cached', get_cached_in_thread):
+            return await self.async_client.post(self.url('add'), data, content_type='application/json')
+
+    async def test_post(self):
+        """
+        The cache is only accessed outside of the event loop.
+
+        :return:
+        """
+        response = await self.post({'a': 1, 'b': 2})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json()['response'])
+        self.assertEqual('MISS', response['X-Cache'])
+        self.assertIsNot(self.threads['call'], self.threads['cache'])
+
+        response = await self.post({'a': 1, 'b': 2})
+        self.assertEqual('HIT', response['X-Cache'])
+
+    async def test_invalid(self):
+        """
+
+        :return:
+        """
+        response = await self.post({'a': 'one', 'b': 2})
+
+        self.assertEqual(409, response.status_code)
+        self.assertNotIn('call', self.threads)
+
+
+@skipIf(httpx is None, "httpx is not installed")
+class AsyncOperationViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+
+        data = {'wsdl': self.server.wsdl_url, 'operations': {'Add': {'template': True}, 'Echo': {'read_only': True}}}
+        response = self.client.post(reverse("soap_connector:client_list"), data, format='json')
+        self.pk = response.data['pk']
+
+    def url(self, operation):
+        """
+
+        :param operation:
+        :return:
+        """
+        return reverse(
+            "soap_connector:client_operation_async",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': operation
+            }
+        )
+
+    async def post(self, operation, data):
+        """
+
+        :param operation:
+        :param data:
+        :return:
+        """
+        return await self.async_client.post(
+            self.url(operation), data, content_type='application/json'
+        )
+
+    async def test_post(self):
+        """
+
+        :return:
+        """
+        response = await self.post('echo', {'text': 'hello'})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('hello', response.json()['response'])
+
+    async def test_template(self):
+        """
+
+        :return:
+        """
+        response = await self.post('add', {'a': 1, 'b': 2})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json()['response'])
+
+    async def test_invalid(self):
+        """
+
+        :return:
+        """
+        response = await self.post('add', {'a': 'one', 'b': 2})
+
+        self.assertEqual(409, response.status_code)
+        self.assertIn('a', response.json())
+
+    async def test_concurrency(self):
+        """
+        Concurrent calls wait for the server at the same time.
+
+        :return:
+        """
+        start = time.monotonic()
+        responses = await asyncio.gather(*[
+            self.post('echo', {'text': str(i), 'delay': '0.5'}) for i in range(10)
+        ])
+
+        self.assertEqual([str(i) for i in range(10)], [response.json()['response'] for response in responses])
+        self.assertLess(time.monotonic() - start, 2.5)
+
+    async def test_coalescing(self):
+        """
+        Identical concurrent calls of read-only operations share
+        one backend call.
+
+        :return:
+        """
+        self.server.requests.clear()
+        responses = await asyncio.gather(*[self.post('echo', {'text': 'hello', 'delay': '0.3'}) for _ in range(4)])
+
+        self.assertEqual(['hello'] * 4, [response.json()['response'] for response in responses])
+        self.assertEqual(1, self.server.requests.count(('POST', '/calculator')))
+
+    async def test_deadline(self):
+        """
+
+        :return:
+        """
+        response = await self.async_client.post(
+            self.url('echo'), {'text': 'hello', 'delay': '1'},
+            content_type='application/json', headers={'X-Request-Timeout': '0.3'}
+        )
+
+        self.assertEqual(504, response.status_code)
+
+    @override_settings(SOAP_CONNECTOR_SERVER_TIMING=True)
+    async def test_server_timing(self):
+        """
+
+        :return:
+        """
+        response = await self.post('echo', {'text': 'hello', 'delay': '0.1'})
+
+        self.assertEqual(200, response.status_code)
+        for phase in ['envelope', 'network', 'parse', 'render']:
+            self.assertIn(f'{phase};dur=', response['Server-Timing'])
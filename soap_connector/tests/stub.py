@@ -0,0 +1,295 @@
+import hashlib
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lxml import etree
+
+NAMESPACE = 'http://example.com/calculator'
+
+WSDL = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
+             xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+             xmlns:tns="{namespace}"
+             targetNamespace="{namespace}"
+             name="Calculator">
+  <types>
+    <xsd:schema targetNamespace="{namespace}" elementFormDefault="qualified">
+      <xsd:complexType name="Item">
+        <xsd:sequence>
+          <xsd:element name="id" type="xsd:int"/>
+          <xsd:element name="name" type="xsd:string"/>
+          <xsd:element name="price" type="xsd:decimal"/>
+          <xsd:element name="available" type="xsd:boolean"/>
+        </xsd:sequence>
+      </xsd:complexType>
+      <xsd:element name="Add">
+        <xsd:complexType>
+          <xsd:sequence>
+            <xsd:element name="a" type="xsd:int"/>
+            <xsd:element name="b" type="xsd:int"/>
+          </xsd:sequence>
+        </xsd:complexType>
+      </xsd:element>
+      <xsd:element name="AddResponse">
+        <xsd:complexType>
+          <xsd:sequence>
+            <xsd:element name="result" type="xsd:int"/>
+          </xsd:sequence>
+        </xsd:complexType>
+      </xsd:element>
+      <xsd:element name="Echo">
+        <xsd:complexType>
+          <xsd:sequence>
+            <xsd:element name="text" type="xsd:string"/>
+            <xsd:element name="delay" type="xsd:decimal" minOccurs="0"/>
+          </xsd:sequence>
+        </xsd:complexType>
+      </xsd:element>
+      <xsd:element name="EchoResponse">
+        <xsd:complexType>
+          <xsd:sequence>
+            <xsd:element name="text" type="xsd:string"/>
+          </xsd:sequence>
+        </xsd:complexType>
+      </xsd:element>
+      <xsd:element name="ListItems">
+        <xsd:complexType>
+          <xsd:sequence>
+            <xsd:element name="count" type="xsd:int"/>
+            <xsd:element name="tags" type="xsd:string" minOccurs="0" maxOccurs="unbounded"/>
+          </xsd:sequence>
+        </xsd:complexType>
+      </xsd:element>
+      <xsd:element name="ListItemsResponse">
+        <xsd:complexType>
+          <xsd:sequence>
+            <xsd:element name="item" type="tns:Item" minOccurs="0" maxOccurs="unbounded"/>
+          </xsd:sequence>
+        </xsd:complexType>
+      </xsd:element>
+    </xsd:schema>
+  </types>
+  <message name="AddInput"><part name="parameters" element="tns:Add"/></message>
+  <message name="AddOutput"><part name="parameters" element="tns:AddResponse"/></message>
+  <message name="EchoInput"><part name="parameters" element="tns:Echo"/></message>
+  <message name="EchoOutput"><part name="parameters" element="tns:EchoResponse"/></message>
+  <message name="ListItemsInput"><part name="parameters" element="tns:ListItems"/></message>
+  <message name="ListItemsOutput"><part name="parameters" element="tns:ListItemsResponse"/></message>
+  <portType name="CalculatorPortType">
+    <operation name="Add">
+      <input message="tns:AddInput"/>
+      <output message="tns:AddOutput"/>
+    </operation>
+    <operation name="Echo">
+      <input message="tns:EchoInput"/>
+      <output message="tns:EchoOutput"/>
+    </operation>
+    <operation name="ListItems">
+      <input message="tns:ListItemsInput"/>
+      <output message="tns:ListItemsOutput"/>
+    </operation>
+  </portType>
+  <binding name="CalculatorBinding" type="tns:CalculatorPortType">
+    <soap:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>
+    <operation name="Add">
+      <soap:operation soapAction="{namespace}/Add"/>
+      <input><soap:body use="literal"/></input>
+      <output><soap:body use="literal"/></output>
+    </operation>
+    <operation name="Echo">
+      <soap:operation soapAction="{namespace}/Echo"/>
+      <input><soap:body use="literal"/></input>
+      <output><soap:body use="literal"/></output>
+    </operation>
+    <operation name="ListItems">
+      <soap:operation soapAction="{namespace}/ListItems"/>
+      <input><soap:body use="literal"/></input>
+      <output><soap:body use="literal"/></output>
+    </operation>
+  </binding>
+  <service name="CalculatorService">
+    <port name="CalculatorPort" binding="tns:CalculatorBinding">
+      <soap:address location="{address}"/>
+    </port>
+  </service>
+</definitions>
+"""
+
+ENVELOPE = """<?xml version="1.0" encoding="UTF-8"?>
+<soap-env:Envelope xmlns:soap-env="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap-env:Body>{body}</soap-env:Body>
+</soap-env:Envelope>
+"""
+
+
+def respond(request: etree._Element) -> str:
+    """
+    Computes the body of the response for the operation found
+    in the request envelope.
+
+    :param request:
+    :return:
+    """
+    ns = {'tns': NAMESPACE}
+    operation = etree.QName(request).localname
+
+    if operation == 'Add':
+        result = sum(int(x) for x in request.xpath('tns:a/text()|tns:b/text()', namespaces=ns))
+        return f'<AddResponse xmlns="{NAMESPACE}"><result>{result}</result></AddResponse>'
+
+    if operation == 'Echo':
+        delay = request.xpath('tns:delay/text()', namespaces=ns)
+        if delay:
+            time.sleep(float(delay[0]))
+        text = request.xpath('tns:text/text()', namespaces=ns)
+        return f'<EchoResponse xmlns="{NAMESPACE}"><text>{text[0] if text else ""}</text></EchoResponse>'
+
+    if operation == 'ListItems':
+        count = int(request.xpath('tns:count/text()', namespaces=ns)[0])
+        items = ''.join(
+            f'<item><id>{i}</id><name>item-{i}</name>'
+            f'<price>{i}.50</price><available>{str(i % 2 == 0).lower()}</available></item>'
+            for i in range(count)
+        )
+        return f'<ListItemsResponse xmlns="{NAMESPACE}">{items}</ListItemsResponse>'
+
+    raise ValueError(operation)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves the calculator WSDL document and answers its
+    operations.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        """
+        Returns the WSDL document honouring conditional requests.
+
+        :return:
+        """
+        server: StubServer = self.server
+        server.requests.append(('GET', self.path))
+
+        body = server.wsdl.encode()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """
+        Answers the SOAP operation contained in the request.
+
+        :return:
+        """
+        server: StubServer = self.server
+        server.requests.append(('POST', self.path))
+
+        length = int(self.headers.get('Content-Length', 0))
+        envelope = etree.fromstring(self.rfile.read(length))
+        body = envelope.find('{http://schemas.xmlsoap.org/soap/envelope/}Body')
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        content = ENVELOPE.format(body=respond(body[0])).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local SOAP server used as a stand-in for remote services.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, delay: float = 0):
+        """
+        Binds the server to a free local port.
+
+        :param delay:
+        """
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.requests = []
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Base url of the server.
+
+        :return:
+        """
+        host, port = self.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def wsdl_url(self) -> str:
+        """
+        Url of the WSDL document.
+
+        :return:
+        """
+        return self.url + '/calculator?wsdl'
+
+    @property
+    def wsdl(self) -> str:
+        """
+        WSDL document pointing to this server.
+
+        :return:
+        """
+        return WSDL.format(namespace=NAMESPACE, address=self.url + '/calculator')
+
+    def handle_error(self, request, client_address) -> None:
+        """
+        Ignores the connections closed by clients that gave up
+        waiting.
+
+        :param request:
+        :param client_address:
+        :return:
+        """
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self) -> "StubServer":
+        """
+        Serves requests in a background thread.
+
+        :return:
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops serving and releases the socket.
+
+        :return:
+        """
+        self.shutdown()
+        self.server_close()
@@ -1,12 +1,15 @@
 from unittest import skip
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import AnonymousUser
 from rest_framework.reverse import reverse
 from rest_framework.test import APIRequestFactory
 
 from soap_connector.cache import *
+from soap_connector.exceptions import RegistryConflict
 from soap_connector.tests.api.utils import DummyView
 
 
@@ -30,80 +33,6 @@ class BaseTestCase(TestCase):
         }
 
 
-class CacheIteratorTestCase(BaseTestCase):
-    """
-
-    """
-    def setUp(self):
-        """
-
-        :return:
-        """
-        super().setUp()
-        key = CacheIterator.pk_name
-
-        self.data_list = [
-            {key: 1, 'field': 'test_1'},
-            {key: 2, 'field': 'test_2'},
-            {key: 3, 'field': 'test_3'}
-        ]
-
-    def test_iterable(self):
-        """
-
-        :return:
-        """
-        it = CacheIterator(self.data_list, DummyView, self.context['view'])
-        self.assertTrue(hasattr(it, '__iter__'))
-
-    def test_simple(self):
-        """
-
-        :return:
-        """
-        it = CacheIterator(self.data_list, DummyView, self.context['view'])
-        data_list = [i for i in it]
-
-        self.assertListEqual(data_list, self.data_list)
-
-    def test_iterate_empty_list(self):
-        """
-
-        :return:
-        """
-        it = CacheIterator([], DummyView, self.context['view'])
-        data_list = [i for i in it]
-
-        self.assertFalse(data_list)
-
-    def test_invalid_data(self):
-        """
-
-        :return:
-        """
-        data_list = [{'id': 1, 'field': 'test_1'}]
-        it = CacheIterator(data_list, DummyView, self.context['view'])
-
-        self.assertRaises(
-            KeyError, lambda: [i for i in it]
-        )
-
-    def test_cache_list(self):
-        """
-
-        :return:
-        """
-        view = self.context['view']
-        it = CacheIterator(self.data_list, DummyView, view)
-        pk_name = CacheIterator.pk_name
-
-        _ = [i for i in it]
-
-        with view.with_context(DummyView):
-            for data in self.data_list:
-                self.assertDictEqual(data, view.cache[data[pk_name]])
-
-
 class RegistryTestCase(BaseTestCase):
     """
 
@@ -115,7 +44,7 @@ class RegistryTestCase(BaseTestCase):
         """
         super().setUp()
 
-        Registry.sessions = set()
+        Cache.clear()
         self.registry = Registry(context=self.context)
 
     def test_simple(self):
@@ -208,6 +137,43 @@ class RegistryTestCase(BaseTestCase):
         self.assertEqual([11, 13], self.registry.retrieve())
         self.assertEqual([12, 14], registry.retrieve())
 
+    def test_shared(self):
+        """
+        New registries, as created by other workers, see the
+        versions of the existing ones.
+
+        :return:
+        """
+        self.registry.insert(16)
+        registry = Registry(context=self.context)
+
+        self.assertEqual([16], registry.retrieve())
+
+    def test_dump(self):
+        """
+
+        :return:
+        """
+        self.registry.insert(17)
+        self.registry.insert(18)
+
+        data = Registry.dump()
+        self.assertEqual([17, 18], data[self.registry.key][self.registry.cls.__name__])
+
+    def test_index(self):
+        """
+        Users missing from the index of the users are added back,
+        even if their index already has the object class.
+
+        :return:
+        """
+        self.registry.insert(1)
+        cache.delete(Registry.index_key)
+        self.registry.insert(2)
+
+        self.assertIn(self.registry.key, cache.get(Registry.index_key))
+        self.assertEqual([1, 2], Registry.dump()[self.registry.key][self.registry.cls.__name__])
+
     def test_expiration(self):
         """
         Cache values can be set to expire.
@@ -220,6 +186,158 @@ class RegistryTestCase(BaseTestCase):
         self.assertEqual([], self.registry.retrieve())
 
 
+class RegistryConcurrencyTestCase(BaseTestCase):
+    """
+    Stress tests of the read-modify-write cycles of the
+    registry from many threads, as concurrent requests of a
+    user would do.
+    """
+    workers = 16
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        super().setUp()
+        cache.clear()
+
+    def test_insert(self):
+        """
+        No version is lost by concurrent inserts.
+
+        :return:
+        """
+        def insert(worker):
+            registry = Registry(context=self.context)
+            for i in range(50):
+                registry.insert(worker * 50 + i)
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            list(executor.map(insert, range(self.workers)))
+
+        versions = Registry(context=self.context).retrieve()
+        self.assertEqual(list(range(self.workers * 50)), sorted(versions))
+
+    def test_insert_remove(self):
+        """
+        Removed versions aren't resurrected by concurrent inserts.
+
+        :return:
+        """
+        def insert_remove(worker):
+            registry = Registry(context=self.context)
+            for i in range(20):
+                registry.insert(worker * 20 + i)
+            for i in range(0, 20, 2):
+                registry.remove(worker * 20 + i)
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            list(executor.map(insert_remove, range(self.workers)))
+
+        versions = Registry(context=self.context).retrieve()
+        self.assertEqual(list(range(1, self.workers * 20, 2)), sorted(versions))
+
+    def test_allocate(self):
+        """
+        Concurrent allocations never return the same version.
+
+        :return:
+        """
+        registry = Registry(context=self.context)
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            versions = list(executor.map(lambda _: registry.allocate(), range(self.workers * 50)))
+
+        self.assertEqual(list(range(1, self.workers * 50 + 1)), sorted(versions))
+
+    def test_allocate_after_existing(self):
+        """
+        The counter starts after the versions in the registry.
+
+        :return:
+        """
+        registry = Registry(context=self.context)
+        registry.update([5, 7])
+
+        self.assertEqual(8, registry.allocate())
+        self.assertEqual(9, registry.allocate())
+
+    @override_settings(SOAP_CONNECTOR_REGISTRY_LEASE_TIMEOUT=0.1)
+    def test_expired_update(self):
+        """
+        Updates whose lease expires before they're written are
+        retried.
+
+        :return:
+        """
+        registry = Registry(context=self.context)
+        calls = []
+
+        def insert(versions):
+            calls.append(versions)
+            if len(calls) == 2:
+                time.sleep(0.2)
+            return versions + [1]
+
+        registry.modify(insert)
+
+        self.assertEqual(3, len(calls))
+        self.assertEqual([1], registry.retrieve())
+
+    @override_settings(SOAP_CONNECTOR_REGISTRY_LEASE_WAIT=0.1)
+    def test_conflict(self):
+        """
+        Updates give up when the lease is held for too long.
+
+        :return:
+        """
+        registry = Registry(context=self.context)
+
+        with Lease(registry.versions_key):
+            with self.assertRaises(RegistryConflict):
+                registry.insert(1)
+
+        registry.insert(1)
+        self.assertEqual([1], registry.retrieve())
+
+    @override_settings(SOAP_CONNECTOR_REGISTRY_LEASE_WAIT=0.1)
+    def test_unchanged(self):
+        """
+        Updates that wouldn't change the versions don't wait for
+        the lease.
+
+        :return:
+        """
+        registry = Registry(context=self.context)
+        registry.insert(1)
+
+        with Lease(registry.versions_key):
+            registry.insert(1)
+            registry.remove(2)
+
+        self.assertEqual([1], registry.retrieve())
+
+    def test_expired_lease(self):
+        """
+        An expired lease can be acquired by another worker, and
+        isn't released by its former holder.
+
+        :return:
+        """
+        lease = Lease('key', timeout=0.1)
+        self.assertTrue(lease.acquire())
+        self.assertFalse(Lease('key', wait=0).acquire())
+
+        time.sleep(0.2)
+        other = Lease('key', wait=0)
+        self.assertFalse(lease.valid())
+        self.assertTrue(other.acquire())
+
+        lease.release()
+        self.assertEqual(other.token, cache.get('key:lease'))
+
+
 class CacheTestCase(BaseTestCase):
     """
 
@@ -230,7 +348,7 @@ class CacheTestCase(BaseTestCase):
         :return:
         """
         super().setUp()
-        Registry.sessions = set()
+        Cache.clear()
 
         self.cache = Cache(context=self.context)
         self.data = {
@@ -416,3 +534,63 @@ class CacheTestCase(BaseTestCase):
         }
         self.cache[20] = data
         self.assertEqual(self.cache[20], data)
+
+
+class SharedFlightTestCase(TestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def call(self, value):
+        """
+
+        :param value:
+        :return:
+        """
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        if value is None:
+            raise ValueError("Backend failure")
+        return value
+
+    def test_simple(self):
+        """
+        Workers share the call of the worker holding the lock.
+
+        :return:
+        """
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(
+                lambda _: SharedFlight(interval=0.01).do('key', self.call, 'result'), range(4)
+            ))
+
+        self.assertEqual(['result'] * 4, results)
+        self.assertEqual(1, self.calls)
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_error(self):
+        """
+        Followers receive the error of the leader.
+
+        :return:
+        """
+        def do(_):
+            try:
+                return SharedFlight(interval=0.01).do('key', self.call, None)
+            except (ValueError, CoalescingError) as e:
+                return str(e)
+
+        with ThreadPoolExecutor(3) as executor:
+            results = list(executor.map(do, range(3)))
+
+        self.assertEqual(["Backend failure"] * 3, results)
+        self.assertEqual(1, self.calls)
@@ -0,0 +1,76 @@
+from django.test import SimpleTestCase
+
+from zeep.client import Client
+from zeep.helpers import serialize_object
+
+from soap_connector.converter import ConverterCache
+from soap_connector.tests.stub import StubServer
+
+
+class ConverterCacheTestCase(SimpleTestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+        cls.soap_client = Client(cls.server.wsdl_url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.converters = ConverterCache()
+
+    def test_simple(self):
+        """
+
+        :return:
+        """
+        self.assertEqual(3, self.converters.convert(self.soap_client.service.Add(a=1, b=2)))
+        self.assertIsNone(self.converters.convert(None))
+
+    def test_complex(self):
+        """
+        Complex values are converted like serialize_object does,
+        with decimals in their lexical form.
+
+        :return:
+        """
+        result = self.soap_client.service.ListItems(count=3)
+        expected = serialize_object(result, dict)
+        for item in expected:
+            item['price'] = str(item['price'])
+
+        self.assertEqual(expected, self.converters.convert(result))
+
+    def test_compiled_once(self):
+        """
+
+        :return:
+        """
+        self.converters.convert(self.soap_client.service.ListItems(count=10))
+        self.converters.convert(self.soap_client.service.ListItems(count=10))
+
+        self.assertEqual(1, self.converters.stats['compilations'])
+
+    def test_nested(self):
+        """
+
+        :return:
+        """
+        item_type = self.soap_client.get_type('{http://example.com/calculator}Item')
+        response_type = self.soap_client.get_element('{http://example.com/calculator}ListItemsResponse').type
+        value = response_type(item=[item_type(id=1, name=None, price=None, available=False)])
+
+        self.assertEqual(
+            {'item': [{'id': 1, 'name': None, 'price': None, 'available': False}]},
+            self.converters.convert(value)
+        )
@@ -0,0 +1,405 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from soap_connector import deadline
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.deadline import Deadline, LatencyTracker
+from soap_connector.exceptions import DeadlineExceeded
+from soap_connector.resilience import backends
+from soap_connector.tests.stub import StubServer
+from soap_connector.utils import AsyncSingleFlight, SingleFlight
+
+
+class DeadlineTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_clamp(self):
+        """
+
+        :return:
+        """
+        with deadline.activate(Deadline(2)):
+            self.assertEqual(1, deadline.clamp(1))
+            self.assertAlmostEqual(2, deadline.clamp(None), places=1)
+            connect, read = deadline.clamp((1, 10))
+            self.assertEqual(1, connect)
+            self.assertAlmostEqual(2, read, places=1)
+
+        self.assertEqual((1, 10), deadline.clamp((1, 10)))
+
+    def test_expired(self):
+        """
+        Errors raised once the deadline has passed are reported
+        as such.
+
+        :return:
+        """
+        with self.assertRaises(DeadlineExceeded):
+            with deadline.activate(Deadline(0)):
+                raise OSError()
+
+        with self.assertRaises(DeadlineExceeded):
+            Deadline(0).clamp(1)
+
+    def test_limit(self):
+        """
+        The closer of the current deadline and the timeout wins.
+
+        :return:
+        """
+        with deadline.activate(Deadline(10)):
+            with deadline.limit(1) as current:
+                self.assertFalse(current.caller)
+                self.assertEqual(1, current.timeout)
+
+            with deadline.limit(60) as current:
+                self.assertTrue(current.caller)
+
+            with deadline.limit(None) as current:
+                self.assertEqual(10, current.timeout)
+
+
+class Cancelled(BaseException):
+    """
+    Stand-in for the errors that cancel a call.
+    """
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.calls = []
+
+    def call(self, delay: float, error: BaseException = None) -> str:
+        """
+        Fake call, failing with the error if any.
+
+        :param delay:
+        :param error:
+        :return:
+        """
+        self.calls.append(delay)
+        time.sleep(delay)
+        deadline.check()
+        if error is not None:
+            raise error
+        return 'done'
+
+    def test_looser_deadline(self):
+        """
+        Callers with a looser deadline than the leader's lead
+        their own call rather than failing with the leader.
+
+        :return:
+        """
+        flights = SingleFlight()
+
+        def lead():
+            with deadline.activate(Deadline(0.1)):
+                return flights.do('key', self.call, 0.3)
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(lead)
+            time.sleep(0.05)
+            self.assertEqual('done', flights.do('key', self.call, 0.3))
+
+            with self.assertRaises(DeadlineExceeded):
+                leader.result()
+        self.assertEqual(2, len(self.calls))
+
+    def test_tighter_deadline(self):
+        """
+        Callers with a tighter deadline join the call, and stop
+        waiting for it at their deadline.
+
+        :return:
+        """
+        flights = SingleFlight()
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(flights.do, 'key', self.call, 0.3)
+            time.sleep(0.05)
+            with deadline.activate(Deadline(0.1)):
+                with self.assertRaises(DeadlineExceeded):
+                    flights.do('key', self.call, 0.3)
+
+            self.assertEqual('done', leader.result())
+        self.assertEqual(1, len(self.calls))
+
+    def test_cancelled_leader(self):
+        """
+        Followers of a cancelled call retry it.
+
+        :return:
+        """
+        flights = SingleFlight()
+        started = threading.Event()
+
+        def lead():
+            started.set()
+            return flights.do('key', self.call, 0.2, Cancelled())
+
+        with ThreadPoolExecutor(1) as executor:
+            leader = executor.submit(lead)
+            started.wait()
+            time.sleep(0.05)
+            self.assertEqual('done', flights.do('key', self.call, 0))
+
+            with self.assertRaises(Cancelled):
+                leader.result()
+        self.assertEqual(2, len(self.calls))
+
+    async def test_async_cancelled_leader(self):
+        """
+
+        :return:
+        """
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(None)
+            await asyncio.sleep(0.2)
+            return 'done'
+
+        leader = asyncio.ensure_future(flights.do('key', call))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(flights.do('key', call))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+
+        self.assertEqual('done', await follower)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(2, len(calls))
+
+
+class LatencyTrackerTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_percentile(self):
+        """
+
+        :return:
+        """
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.percentile(99))
+
+        for i in range(1, 101):
+            tracker.record(i / 100)
+
+        self.assertEqual(0.5, tracker.percentile(50))
+        self.assertEqual(0.99, tracker.percentile(99))
+
+    @override_settings(SOAP_CONNECTOR_ADAPTIVE_MIN_SAMPLES=10, SOAP_CONNECTOR_ADAPTIVE_MIN_TIMEOUT=0.5)
+    def test_timeout(self):
+        """
+
+        :return:
+        """
+        tracker = LatencyTracker(size=10)
+        for _ in range(9):
+            tracker.record(0.1)
+        self.assertIsNone(tracker.timeout())
+
+        tracker.record(0.4)
+        self.assertAlmostEqual(1.2, tracker.timeout())
+
+        for _ in range(10):
+            tracker.record(0.01)
+        self.assertEqual(0.5, tracker.timeout())
+
+
+class DeadlineViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        backends.clear()
+        self.create()
+
+    def create(self, **data):
+        """
+
+        :param data:
+        :return:
+        """
+        data = dict(data, wsdl=self.server.wsdl_url)
+        self.pk = self.client.post(reverse("soap_connector:client_list"), data, format='json').data['pk']
+
+    def url(self, operation):
+        """
+
+        :param operation:
+        :return:
+        """
+        return reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': operation
+            }
+        )
+
+    def test_header(self):
+        """
+
+        :return:
+        """
+        start = time.monotonic()
+        response = self.client.post(
+            self.url('echo'), {'text': 'hello', 'delay': '2'}, format='json', HTTP_X_REQUEST_TIMEOUT='0.5'
+        )
+
+        self.assertEqual(504, response.status_code)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+        response = self.client.post(self.url('echo'), {'text': 'hello'}, format='json', HTTP_X_REQUEST_TIMEOUT='5')
+        self.assertEqual(200, response.status_code)
+
+    def test_query_param(self):
+        """
+
+        :return:
+        """
+        response = self.client.post(self.url('echo') + '?timeout=0.3', {'text': 'hello', 'delay': '1'}, format='json')
+        self.assertEqual(504, response.status_code)
+
+    def test_invalid(self):
+        """
+
+        :return:
+        """
+        for value in ['soon', '-1', 'nan']:
+            response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json', HTTP_X_REQUEST_TIMEOUT=value)
+            self.assertEqual(400, response.status_code)
+
+    def test_coalescing(self):
+        """
+        The deadline of a caller doesn't fail the identical calls
+        that have no deadline.
+
+        :return:
+        """
+        self.create(operations={'Echo': {'read_only': True}})
+
+        def post(timeout):
+            headers = {'HTTP_X_REQUEST_TIMEOUT': timeout} if timeout else {}
+            return APIClient().post(self.url('echo'), {'text': 'hello', 'delay': '0.5'}, format='json', **headers)
+
+        with ThreadPoolExecutor(2) as executor:
+            leader = executor.submit(post, '0.2')
+            time.sleep(0.1)
+            follower = executor.submit(post, None)
+
+            self.assertEqual(504, leader.result().status_code)
+            self.assertEqual(200, follower.result().status_code)
+
+    def test_loading(self):
+        """
+        The deadline bounds the loading of the WSDL document too.
+
+        :return:
+        """
+        Connector.pool.clear()
+        self.server.requests.clear()
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json', HTTP_X_REQUEST_TIMEOUT='0')
+
+        self.assertEqual(504, response.status_code)
+        self.assertNotIn(('GET', '/calculator?wsdl'), self.server.requests)
+
+    def test_breaker(self):
+        """
+        Calls given up by their callers don't open the circuit.
+
+        :return:
+        """
+        self.create(resilience={'failure_threshold': 1})
+        self.client.post(
+            self.url('echo'), {'text': 'hello', 'delay': '1'}, format='json', HTTP_X_REQUEST_TIMEOUT='0.3'
+        )
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(200, response.status_code)
+
+    def test_operation_timeout(self):
+        """
+
+        :return:
+        """
+        self.create(operations={'Echo': {'timeout': 0.3}})
+
+        response = self.client.post(self.url('echo'), {'text': 'hello', 'delay': '1'}, format='json')
+        self.assertEqual(504, response.status_code)
+
+    @override_settings(SOAP_CONNECTOR_ADAPTIVE_MIN_SAMPLES=5, SOAP_CONNECTOR_ADAPTIVE_MIN_TIMEOUT=0.2)
+    def test_adaptive_timeout(self):
+        """
+        Calls much slower than the usual latency of the operation
+        are cut.
+
+        :return:
+        """
+        self.create(operations={'Echo': {'adaptive_timeout': True}})
+
+        for i in range(5):
+            response = self.client.post(self.url('echo'), {'text': str(i)}, format='json')
+            self.assertEqual(200, response.status_code)
+
+        response = self.client.post(self.url('echo'), {'text': 'slow', 'delay': '1'}, format='json')
+        self.assertEqual(504, response.status_code)
+
+        state, = self.client.get(reverse("soap_connector:backend_list")).data
+        self.assertEqual(6, state['latency']['Echo']['samples'])
+        self.assertEqual(0.2, state['latency']['Echo']['p99'])
+
+    @override_settings(SOAP_CONNECTOR_ADAPTIVE_MIN_SAMPLES=5, SOAP_CONNECTOR_ADAPTIVE_MIN_TIMEOUT=0.2)
+    def test_adaptive_recovery(self):
+        """
+        The adaptive timeout grows back once the latency of the
+        backend shifts.
+
+        :return:
+        """
+        self.create(operations={'Echo': {'adaptive_timeout': True}})
+
+        for i in range(5):
+            self.client.post(self.url('echo'), {'text': str(i)}, format='json')
+
+        response = self.client.post(self.url('echo'), {'text': 'slow', 'delay': '0.4'}, format='json')
+        self.assertEqual(504, response.status_code)
+
+        response = self.client.post(self.url('echo'), {'text': 'slow', 'delay': '0.4'}, format='json')
+        self.assertEqual(200, response.status_code)
@@ -0,0 +1,86 @@
+from django.test import SimpleTestCase
+
+from lxml import etree
+
+from zeep.client import Client
+
+from soap_connector.envelope import EnvelopeTemplate
+from soap_connector.tests.stub import StubServer
+
+
+class EnvelopeTemplateTestCase(SimpleTestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+        cls.soap_client = Client(cls.server.wsdl_url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.port = self.soap_client.wsdl.services['CalculatorService'].ports['CalculatorPort']
+        self.binding = self.port.binding
+
+    def compile(self, name):
+        """
+        Compiles the template of an operation.
+
+        :param name:
+        :return:
+        """
+        operation = self.binding._operations[name]
+        return EnvelopeTemplate.compile(self.soap_client, self.binding, operation)
+
+    def test_render(self):
+        """
+        The rendered envelope is the one built by zeep.
+
+        :return:
+        """
+        for name, values in [('Add', {'a': 1, 'b': -2}), ('Echo', {'text': 'a<b', 'delay': 0})]:
+            envelope = self.compile(name).render(values)
+            expected = self.soap_client.create_message(self.soap_client.service, name, **values)
+
+            self.assertEqual(etree.tostring(expected), etree.tostring(envelope))
+
+    def test_unsupported_shape(self):
+        """
+        Repeated elements cannot be templated.
+
+        :return:
+        """
+        self.assertIsNone(self.compile('ListItems'))
+
+    def test_accepts(self):
+        """
+        Omitted parameters fall back to zeep.
+
+        :return:
+        """
+        template = self.compile('Echo')
+
+        self.assertTrue(template.accepts({'text': 'a', 'delay': 1}))
+        self.assertFalse(template.accepts({'text': 'a'}))
+        self.assertFalse(template.accepts({'text': 'a', 'delay': None}))
+
+    def test_send(self):
+        """
+
+        :return:
+        """
+        operation = self.binding._operations['Add']
+        result = self.compile('Add').send(
+            self.soap_client, self.binding, operation,
+            self.port.binding_options['address'], {'a': 1, 'b': 2}
+        )
+        self.assertEqual(3, result)
@@ -0,0 +1,170 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.metrics import Counter, Histogram, MetricRegistry, registry
+from soap_connector.tests.stub import StubServer
+
+
+class MetricsTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        registry.clear()
+        self.counter = Counter('test_calls_total', "Test calls.", ['outcome'])
+        self.histogram = Histogram('test_duration_seconds', "Test durations.", ['name'], buckets=[0.1, 1])
+
+    def tearDown(self):
+        for name in ('test_calls_total', 'test_duration_seconds'):
+            registry.metrics.pop(name)
+
+    def test_counter(self):
+        """
+        Values recorded by many threads are merged.
+
+        :return:
+        """
+        def work():
+            for _ in range(1000):
+                self.counter.inc('success')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.counter.inc('error', value=2)
+
+        self.assertEqual({('success',): 8000, ('error',): 2}, registry.collect(self.counter))
+
+    def test_finished_threads(self):
+        """
+        The shards of finished threads are folded, keeping their
+        values.
+
+        :return:
+        """
+        def work():
+            self.counter.inc('success')
+            self.histogram.observe(0.5, 'a')
+
+        for _ in range(200):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        self.assertEqual({('success',): 200}, registry.collect(self.counter))
+        self.assertEqual(200, registry.collect(self.histogram)[('a',)][1])
+        self.assertLessEqual(len(registry.shards), threading.active_count())
+
+    def test_histogram(self):
+        """
+
+        :return:
+        """
+        for value in (0.05, 0.1, 0.5, 5):
+            self.histogram.observe(value, 'a"b')
+
+        text = registry.render()
+
+        self.assertIn('# TYPE test_duration_seconds histogram', text)
+        self.assertIn('test_duration_seconds_bucket{name="a\\"b",le="0.1"} 2', text)
+        self.assertIn('test_duration_seconds_bucket{name="a\\"b",le="1"} 3', text)
+        self.assertIn('test_duration_seconds_bucket{name="a\\"b",le="+Inf"} 4', text)
+        self.assertIn('test_duration_seconds_sum{name="a\\"b"} 5.65', text)
+        self.assertIn('test_duration_seconds_count{name="a\\"b"} 4', text)
+
+    def test_clear(self):
+        """
+
+        :return:
+        """
+        self.counter.inc('success')
+        registry.clear()
+
+        self.assertEqual({}, registry.collect(self.counter))
+        self.assertIsInstance(MetricRegistry().render(), str)
+
+
+class MetricsViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        registry.clear()
+
+    def test_metrics(self):
+        """
+
+        :return:
+        """
+        data = {'wsdl': self.server.wsdl_url, 'operations': {'Add': {'cache_timeout': 60}}}
+        pk = self.client.post(reverse("soap_connector:client_list"), data, format='json').data['pk']
+        url = reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={'client_pk': pk, 'service_pk': 'calculatorservice', 'port_pk': 'calculatorport',
+                    'operation_pk': 'add'}
+        )
+        for _ in range(2):
+            self.client.post(url, {'a': 1, 'b': 2}, format='json')
+
+        response = self.client.get(reverse("soap_connector:metrics_list"))
+        text = response.content.decode()
+        labels = f'user="0",client="{pk}",service="CalculatorService",port="CalculatorPort",operation="Add"'
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(f'soap_connector_operation_calls_total{{{labels},outcome="success"}} 1', text)
+        self.assertIn(f'soap_connector_operation_duration_seconds_count{{{labels}}} 1', text)
+        self.assertIn('soap_connector_wsdl_loads_total{outcome="success"} 1', text)
+        self.assertIn('soap_connector_cache_requests_total{cache="response",result="hit"} 1', text)
+        self.assertIn('soap_connector_cache_requests_total{cache="response",result="miss"} 1', text)
+
+    def test_users(self):
+        """
+        The calls of clients with the same pk but different users
+        are counted apart.
+
+        :return:
+        """
+        def post():
+            pk = self.client.post(reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url}).data['pk']
+            url = reverse(
+                "soap_connector:client_operation_detail",
+                kwargs={'client_pk': pk, 'service_pk': 'calculatorservice', 'port_pk': 'calculatorport',
+                        'operation_pk': 'add'}
+            )
+            self.client.post(url, {'a': 1, 'b': 2}, format='json')
+            return pk
+
+        pk = post()
+        self.client.force_authenticate(get_user_model().objects.create_user('other'))
+        self.assertEqual(pk, post())
+
+        self.assertEqual(2, len(registry.collect(registry.metrics['soap_connector_operation_calls_total'])))
@@ -0,0 +1,395 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from zeep.exceptions import Fault, XMLSyntaxError
+
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.resilience import (
+    Backend, Bulkhead, CircuitBreaker, backends, CLOSED, OPEN, HALF_OPEN, DEFAULT_MAX_WAIT
+)
+from soap_connector.tests.stub import StubServer
+
+
+class BulkheadTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_limit(self):
+        """
+
+        :return:
+        """
+        bulkhead = Bulkhead(limit=1)
+
+        self.assertTrue(bulkhead.acquire())
+        self.assertFalse(bulkhead.acquire())
+        bulkhead.release()
+        self.assertTrue(bulkhead.acquire())
+        self.assertEqual(1, bulkhead.stats['rejected'])
+
+    def test_wait(self):
+        """
+        A call waits for a slot freed within the maximum wait.
+
+        :return:
+        """
+        bulkhead = Bulkhead(limit=1, max_wait=1)
+        bulkhead.acquire()
+
+        with ThreadPoolExecutor(1) as executor:
+            executor.submit(lambda: time.sleep(0.1) or bulkhead.release())
+            self.assertTrue(bulkhead.acquire())
+            self.assertFalse(bulkhead.acquire(wait=False))
+
+    def test_unlimited(self):
+        """
+
+        :return:
+        """
+        bulkhead = Bulkhead()
+        self.assertTrue(all(bulkhead.acquire() for _ in range(100)))
+
+    def test_fair_share(self):
+        """
+        Freed slots go to the lane using the least of its share.
+
+        :return:
+        """
+        bulkhead = Bulkhead(limit=5)
+        bulkhead.running.update(interactive=3, bulk=1)
+        bulkhead.waiting.update(interactive=1, bulk=1)
+        self.assertEqual('interactive', bulkhead.next_lane())
+
+        bulkhead.running['interactive'] = 5
+        self.assertEqual('bulk', bulkhead.next_lane())
+
+    def test_priority(self):
+        """
+        A waiting interactive call overtakes the bulk calls that
+        wait before it.
+
+        :return:
+        """
+        bulkhead = Bulkhead(limit=1, max_wait=5)
+        bulkhead.acquire(lane='bulk')
+        order = []
+
+        def call(lane):
+            bulkhead.acquire(lane=lane)
+            order.append(lane)
+            bulkhead.release(lane)
+
+        with ThreadPoolExecutor(2) as executor:
+            executor.submit(call, 'bulk')
+            time.sleep(0.1)
+            executor.submit(call, 'interactive')
+            time.sleep(0.1)
+            bulkhead.release('bulk')
+
+        self.assertEqual(['interactive', 'bulk'], order)
+
+    def test_borrow(self):
+        """
+        Idle shares are lent to heavier lanes.
+
+        :return:
+        """
+        bulkhead = Bulkhead(limit=5)
+
+        self.assertTrue(all(bulkhead.acquire(wait=False, lane='interactive') for _ in range(5)))
+        self.assertFalse(bulkhead.acquire(wait=False, lane='bulk'))
+
+    def test_guaranteed_share(self):
+        """
+        Bulk calls can't take the share of the interactive ones,
+        even when no call waits for a slot.
+
+        :return:
+        """
+        bulkhead = Bulkhead(limit=5)
+
+        self.assertEqual(1, sum(bulkhead.acquire(wait=False, lane='bulk') for _ in range(5)))
+        self.assertTrue(all(bulkhead.acquire(wait=False, lane='interactive') for _ in range(4)))
+        self.assertFalse(bulkhead.acquire(wait=False, lane='interactive'))
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_open(self):
+        """
+
+        :return:
+        """
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+        breaker.record_failure()
+        self.assertEqual(OPEN, breaker.status)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_after(), 59)
+
+    def test_success(self):
+        """
+        A success resets the count of consecutive failures.
+
+        :return:
+        """
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        self.assertEqual(CLOSED, breaker.status)
+
+    def test_probe(self):
+        """
+        A single call is let through once the recovery timeout
+        has elapsed.
+
+        :return:
+        """
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+
+        self.assertTrue(breaker.allow())
+        self.assertEqual(HALF_OPEN, breaker.status)
+        self.assertFalse(breaker.allow())
+
+        breaker.record_failure()
+        self.assertEqual(OPEN, breaker.status)
+
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(CLOSED, breaker.status)
+
+
+class BackendTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_cancelled_probe(self):
+        """
+        A cancelled probe call lets the next call probe the
+        backend.
+
+        :return:
+        """
+        backend = Backend('http://a', Backend.normalize({'failure_threshold': 1, 'recovery_timeout': 0}))
+        backend.breaker.record_failure()
+
+        with self.assertRaises(asyncio.CancelledError):
+            with backend.guard():
+                raise asyncio.CancelledError()
+
+        self.assertEqual(0, backend.bulkhead.active)
+        with backend.guard():
+            pass
+        self.assertEqual(CLOSED, backend.breaker.status)
+
+    def test_errors(self):
+        """
+        Server faults and malformed responses are failures,
+        while errors of the caller don't close the circuit.
+
+        :return:
+        """
+        backend = Backend('http://a', Backend.normalize({'failure_threshold': 2, 'recovery_timeout': 0}))
+
+        for error in [Fault('Internal error', 'soap:Server'), XMLSyntaxError('Invalid XML')]:
+            with self.assertRaises(type(error)):
+                with backend.guard():
+                    raise error
+        self.assertEqual(OPEN, backend.breaker.status)
+
+        for error in [Fault('Invalid account', 'soap:Client'), ValueError('Invalid argument')]:
+            with self.assertRaises(type(error)):
+                with backend.guard():
+                    raise error
+            self.assertEqual(2, backend.breaker.failures)
+            self.assertNotEqual(CLOSED, backend.breaker.status)
+
+
+class BackendRegistryTestCase(SimpleTestCase):
+    """
+
+    """
+    def tearDown(self):
+        backends.clear()
+
+    def test_options(self):
+        """
+        Clients of an address with different options don't
+        override the limits of each other.
+
+        :return:
+        """
+        limited = backends.get('http://a', {'max_concurrency': 2, 'failure_threshold': 1})
+        default = backends.get('http://a', {})
+
+        self.assertIsNot(limited, default)
+        self.assertIs(limited, backends.get('http://a', {'failure_threshold': 1, 'max_concurrency': 2}))
+        self.assertIs(default, backends.get('http://a', {'max_wait': DEFAULT_MAX_WAIT}))
+        self.assertEqual(2, limited.bulkhead.limit)
+        self.assertEqual(1, limited.breaker.failure_threshold)
+        self.assertIsNone(default.bulkhead.limit)
+
+
+class ResilienceViewTestCase(APITestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        backends.clear()
+        self.server = StubServer().start()
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.stop()
+
+    def create(self, **resilience):
+        """
+        Creates a client of the stub server and loads it.
+
+        :param resilience:
+        :return:
+        """
+        data = {'wsdl': self.server.wsdl_url, 'resilience': resilience}
+        self.pk = self.client.post(reverse("soap_connector:client_list"), data, format='json').data['pk']
+        self.client.get(reverse("soap_connector:client_service_list", kwargs={'client_pk': self.pk}))
+
+    def url(self, operation):
+        """
+
+        :param operation:
+        :return:
+        """
+        return reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': operation
+            }
+        )
+
+    def test_circuit(self):
+        """
+        Calls to an unreachable backend fail fast once the
+        circuit is open.
+
+        :return:
+        """
+        self.create(failure_threshold=1, recovery_timeout=60)
+        self.server.stop()
+        self.server = None
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(409, response.status_code)
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('60', response['Retry-After'])
+
+        response = self.client.post(self.url('add') + '?raw=1', {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(503, response.status_code)
+
+    def test_bulkhead(self):
+        """
+        Calls beyond the concurrency limit of a backend are
+        rejected.
+
+        :return:
+        """
+        self.create(max_concurrency=1)
+
+        with ThreadPoolExecutor(2) as executor:
+            responses = list(executor.map(
+                lambda text: APIClient().post(
+                    self.url('echo'), {'text': text, 'delay': '0.5'}, format='json'
+                ),
+                ['a', 'b']
+            ))
+
+        self.assertEqual([200, 503], sorted(response.status_code for response in responses))
+
+    def test_stream(self):
+        """
+        Streamed calls hold their slot until their body is read.
+
+        :return:
+        """
+        self.create(max_concurrency=1)
+        streamed = self.client.post(self.url('add') + '?raw=1', {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(200, streamed.status_code)
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(503, response.status_code)
+
+        b''.join(streamed.streaming_content)
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+        self.assertEqual(200, response.status_code)
+
+    def test_lane(self):
+        """
+
+        :return:
+        """
+        self.create(max_concurrency=2)
+        data = {'wsdl': self.server.wsdl_url, 'lane': 'bulk', 'resilience': {'max_concurrency': 2}}
+        response = self.client.post(reverse("soap_connector:client_list"), data, format='json')
+        self.assertEqual('bulk', response.data['lane'])
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json', HTTP_X_PRIORITY='urgent')
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json', HTTP_X_PRIORITY='bulk')
+        self.assertEqual(200, response.status_code)
+
+        state, = self.client.get(reverse("soap_connector:backend_list")).data
+        self.assertEqual({'active': 0, 'waiting': 0}, state['bulkhead']['lanes']['bulk'])
+
+    def test_state(self):
+        """
+
+        :return:
+        """
+        self.create(max_concurrency=4)
+        self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+
+        response = self.client.get(reverse("soap_connector:backend_list"))
+
+        self.assertEqual(200, response.status_code)
+        state, = response.data
+        self.assertEqual(self.server.url + '/calculator', state['address'])
+        self.assertEqual(CLOSED, state['breaker']['status'])
+        self.assertEqual(4, state['bulkhead']['limit'])
+        self.assertEqual(1, state['bulkhead']['accepted'])
+
+    def test_other_user(self):
+        """
+        Users only see the backends of their own clients.
+
+        :return:
+        """
+        self.create(max_concurrency=4)
+        self.client.post(self.url('add'), {'a': 1, 'b': 2}, format='json')
+
+        self.client.force_authenticate(get_user_model().objects.create_user('other'))
+        self.assertEqual([], self.client.get(reverse("soap_connector:backend_list")).data)
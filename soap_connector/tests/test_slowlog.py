@@ -0,0 +1,201 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from soap_connector import slowlog
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.resilience import backends
+from soap_connector.slowlog import slow_calls
+from soap_connector.tests.stub import StubServer
+
+ENVELOPE = b"""<soap-env:Envelope xmlns:soap-env="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap-env:Header>
+    <wsse:Security xmlns:wsse="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd">
+      <wsse:UsernameToken>
+        <wsse:Username>admin</wsse:Username>
+        <wsse:Password>secret</wsse:Password>
+      </wsse:UsernameToken>
+      <ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#">
+        <ds:SignatureValue>c2lnbmF0dXJl</ds:SignatureValue>
+        <ds:KeyInfo><ds:X509Data><ds:X509Certificate>Y2VydGlmaWNhdGU=</ds:X509Certificate></ds:X509Data></ds:KeyInfo>
+      </ds:Signature>
+    </wsse:Security>
+  </soap-env:Header>
+  <soap-env:Body><Add><a>1</a></Add></soap-env:Body>
+</soap-env:Envelope>"""
+
+
+class SlowCallLogTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        slow_calls.clear()
+
+    def test_redact(self):
+        """
+        The fields of the UsernameToken and Signature objects are
+        masked.
+
+        :return:
+        """
+        envelope = slowlog.redact(ENVELOPE)
+
+        for secret in ['admin', 'secret', 'c2lnbmF0dXJl', 'Y2VydGlmaWNhdGU=']:
+            self.assertNotIn(secret, envelope)
+        self.assertIn('<a>1</a>', envelope)
+        self.assertIn(slowlog.REDACTED, envelope)
+
+    def test_redact_malformed(self):
+        """
+        Secrets are masked in messages that can't be parsed too.
+
+        :return:
+        """
+        envelope = slowlog.redact(b'--boundary\r\n' + ENVELOPE)
+
+        for secret in ['admin', 'secret', 'c2lnbmF0dXJl', 'Y2VydGlmaWNhdGU=']:
+            self.assertNotIn(secret, envelope)
+
+    @override_settings(SOAP_CONNECTOR_SLOW_CALL_MAX_ENVELOPE=10)
+    def test_truncate(self):
+        """
+
+        :return:
+        """
+        self.assertEqual(10, len(slowlog.redact(b'not an envelope at all')))
+
+    @override_settings(SOAP_CONNECTOR_SLOW_CALL_THRESHOLD=0, SOAP_CONNECTOR_SLOW_CALL_BUFFER=2)
+    def test_ring_buffer(self):
+        """
+        Only the last records are kept.
+
+        :return:
+        """
+        for i in range(3):
+            with slowlog.record(slowlog.WSDL, wsdl=str(i)):
+                slowlog.capture_document(b'x' * 10)
+
+        records = slow_calls.list()
+        self.assertEqual(['2', '1'], [record['wsdl'] for record in records])
+        self.assertEqual(10, records[0]['size'])
+
+    @override_settings(SOAP_CONNECTOR_SLOW_CALL_THRESHOLD=60)
+    def test_fast(self):
+        """
+
+        :return:
+        """
+        with slowlog.record(slowlog.WSDL, wsdl='fast'):
+            pass
+
+        self.assertEqual([], slow_calls.list())
+
+
+@override_settings(SOAP_CONNECTOR_SLOW_CALL_THRESHOLD=0.2)
+class SlowCallViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        backends.clear()
+        slow_calls.clear()
+
+        response = self.client.post(reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url})
+        self.pk = response.data['pk']
+
+    def post(self, text, delay):
+        """
+
+        :param text:
+        :param delay:
+        :return:
+        """
+        url = reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': 'echo'
+            }
+        )
+        return self.client.post(url, {'text': text, 'delay': delay}, format='json')
+
+    @override_settings(SOAP_CONNECTOR_SLOW_CALL_SAMPLE_RATE=1)
+    def test_operation(self):
+        """
+        Only the calls slower than the threshold are recorded.
+
+        :return:
+        """
+        self.post('fast', '0')
+        self.post('slow', '0.3')
+
+        response = self.client.get(reverse("soap_connector:slow_call_list"), {'kind': slowlog.OPERATION})
+        record, = response.data
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('Echo', record['operation'])
+        self.assertEqual(200, record['status'])
+        self.assertGreaterEqual(record['duration'], 0.3)
+        self.assertIn('slow', record['request'])
+        self.assertIn('slow', record['response'])
+        self.assertGreater(record['response_size'], 0)
+
+    def test_sampling(self):
+        """
+        The envelopes of the calls out of the sample are dropped,
+        and no call is sampled by default.
+
+        :return:
+        """
+        self.post('slow', '0.3')
+
+        record, = self.client.get(reverse("soap_connector:slow_call_list")).data
+        self.assertIsNone(record['request'])
+        self.assertGreater(record['request_size'], 0)
+
+    @override_settings(SOAP_CONNECTOR_SLOW_CALL_THRESHOLD=0)
+    def test_wsdl(self):
+        """
+
+        :return:
+        """
+        Connector.pool.clear()
+        self.post('hello', '0')
+
+        record, = self.client.get(reverse("soap_connector:slow_call_list"), {'kind': slowlog.WSDL}).data
+        self.assertEqual(self.server.wsdl_url, record['wsdl'])
+        self.assertGreaterEqual(record['documents'], 1)
+        self.assertGreater(record['size'], 0)
+
+    def test_other_user(self):
+        """
+        Users only see their own calls.
+
+        :return:
+        """
+        self.post('slow', '0.3')
+        self.assertEqual(1, len(self.client.get(reverse("soap_connector:slow_call_list")).data))
+
+        self.client.force_authenticate(get_user_model().objects.create_user('other'))
+        self.assertEqual([], self.client.get(reverse("soap_connector:slow_call_list")).data)
@@ -0,0 +1,143 @@
+import re
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from soap_connector import timing
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.resilience import backends
+from soap_connector.tests.stub import StubServer
+
+
+def parse(header):
+    """
+    Returns the durations of the Server-Timing header by phase.
+
+    :param header:
+    :return:
+    """
+    return {
+        name: float(duration)
+        for name, duration in re.findall(r'(\w+);dur=([\d.]+)', header)
+    }
+
+
+class TimingTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_disabled(self):
+        """
+        Phases run outside of a timed request aren't recorded.
+
+        :return:
+        """
+        self.assertIs(timing.phase(timing.CACHE), timing.phase(timing.NETWORK))
+
+    def test_nested(self):
+        """
+        Phases nested in a phase of the same name are counted
+        once.
+
+        :return:
+        """
+        with timing.collect() as timings:
+            with timing.phase(timing.CACHE):
+                with timing.phase(timing.CACHE):
+                    pass
+                with timing.phase(timing.CACHE) as inner:
+                    self.assertIsNone(inner.start)
+
+        self.assertEqual({timing.CACHE, timing.TOTAL}, set(parse(timings.header())))
+
+    def test_call(self):
+        """
+        The time around the round trip is split between the
+        building of the envelope and the parsing of the response.
+
+        :return:
+        """
+        with timing.collect() as timings:
+            with timing.call():
+                with timing.phase(timing.NETWORK):
+                    pass
+
+        self.assertEqual(
+            {timing.ENVELOPE, timing.NETWORK, timing.PARSE}, set(timings.durations)
+        )
+
+
+class ServerTimingViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        backends.clear()
+
+        response = self.client.post(reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url})
+        self.pk = response.data['pk']
+
+    def test_disabled(self):
+        """
+
+        :return:
+        """
+        response = self.client.get(reverse("soap_connector:client_service_list", kwargs={'client_pk': self.pk}))
+        self.assertNotIn(timing.HEADER, response)
+
+    @override_settings(SOAP_CONNECTOR_SERVER_TIMING=True)
+    def test_service_list(self):
+        """
+        The services are rendered from the snapshot in cache.
+
+        :return:
+        """
+        response = self.client.get(reverse("soap_connector:client_service_list", kwargs={'client_pk': self.pk}))
+        phases = parse(response[timing.HEADER])
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({timing.CACHE, timing.RENDER, timing.TOTAL}, set(phases))
+        self.assertGreaterEqual(phases[timing.TOTAL], phases[timing.CACHE] + phases[timing.RENDER])
+
+    @override_settings(SOAP_CONNECTOR_SERVER_TIMING=True)
+    def test_operation(self):
+        """
+        The WSDL document is loaded again once the pool is
+        cleared.
+
+        :return:
+        """
+        Connector.pool.clear()
+        url = reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': 'echo'
+            }
+        )
+        response = self.client.post(url, {'text': 'hello', 'delay': '0.1'}, format='json')
+        phases = parse(response[timing.HEADER])
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue({timing.WSDL, timing.ENVELOPE, timing.NETWORK, timing.PARSE, timing.RENDER} <= set(phases))
+        self.assertGreaterEqual(phases[timing.NETWORK], 100)
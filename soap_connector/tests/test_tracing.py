@@ -0,0 +1,171 @@
+import json
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from soap_connector import tracing
+from soap_connector.cache import Cache
+from soap_connector.connector import Connector
+from soap_connector.resilience import backends
+from soap_connector.tests.stub import StubServer
+
+IN_MEMORY = 'soap_connector.tracing.InMemoryExporter'
+TRACEPARENT = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+
+
+class TracingTestCase(SimpleTestCase):
+    """
+
+    """
+    def test_disabled(self):
+        """
+
+        :return:
+        """
+        self.assertIsNone(tracing.exporter())
+        with tracing.span('test') as span:
+            span.set_attribute('name', 'value')
+            self.assertIsNone(tracing.current())
+
+    @override_settings(SOAP_CONNECTOR_TRACING_EXPORTER=IN_MEMORY)
+    def test_nested(self):
+        """
+
+        :return:
+        """
+        exporter = tracing.exporter()
+        exporter.clear()
+
+        with tracing.span('parent', traceparent=TRACEPARENT) as parent:
+            with self.assertRaises(ValueError):
+                with tracing.span('child', key='value'):
+                    raise ValueError('invalid')
+
+        child, = exporter.finished('child')
+        self.assertEqual('0af7651916cd43dd8448eb211c80319c', parent.trace_id)
+        self.assertEqual('b7ad6b7169203331', parent.parent_id)
+        self.assertEqual(parent.trace_id, child.trace_id)
+        self.assertEqual(parent.span_id, child.parent_id)
+        self.assertEqual(tracing.ERROR, child.status)
+        self.assertEqual('value', child.attributes['key'])
+        self.assertEqual(tracing.OK, parent.status)
+
+    def test_invalid_traceparent(self):
+        """
+
+        :return:
+        """
+        for value in [None, '', 'invalid', '00-0af7651916cd43dd-b7ad6b7169203331-01']:
+            self.assertIsNone(tracing.Span.remote(value))
+
+    def test_file(self):
+        """
+
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traces', 'spans.jsonl')
+            exporter = tracing.FileExporter(path)
+
+            span = tracing.Span('test', attributes={'client': 1})
+            span.finish()
+            exporter.export(span)
+            exporter.export(span)
+
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual(2, len(lines))
+        self.assertEqual({'client': 1}, lines[0]['attributes'])
+        self.assertEqual(span.span_id, lines[0]['span_id'])
+
+    def test_file_required(self):
+        """
+
+        :return:
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            tracing.FileExporter()
+
+
+@override_settings(SOAP_CONNECTOR_TRACING_EXPORTER=IN_MEMORY)
+class TracingViewTestCase(APITestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        Cache.clear()
+        Connector.pool.clear()
+        backends.clear()
+
+        response = self.client.post(reverse("soap_connector:client_list"), {'wsdl': self.server.wsdl_url})
+        self.pk = response.data['pk']
+        self.exporter = tracing.exporter()
+        self.exporter.clear()
+
+    def test_operation(self):
+        """
+
+        :return:
+        """
+        url = reverse(
+            "soap_connector:client_operation_detail",
+            kwargs={
+                'client_pk': self.pk,
+                'service_pk': 'calculatorservice',
+                'port_pk': 'calculatorport',
+                'operation_pk': 'add'
+            }
+        )
+        response = self.client.post(url, {'a': 1, 'b': 2}, format='json', HTTP_TRACEPARENT=TRACEPARENT)
+        self.assertEqual(200, response.status_code)
+
+        request, = self.exporter.finished('http.request')
+        call, = self.exporter.finished('soap.call')
+        post, = self.exporter.finished('http.post')
+        init, = self.exporter.finished('connector.init')
+
+        self.assertEqual('0af7651916cd43dd8448eb211c80319c', request.trace_id)
+        self.assertEqual(200, request.attributes['status'])
+        self.assertEqual(
+            {'client': self.pk, 'service': 'CalculatorService', 'port': 'CalculatorPort', 'operation': 'Add'},
+            {key: call.attributes[key] for key in ['client', 'service', 'port', 'operation']}
+        )
+        self.assertEqual(call.span_id, post.parent_id)
+        self.assertEqual(self.server.url + '/calculator', post.attributes['address'])
+        self.assertEqual(request.span_id, init.parent_id)
+        self.assertTrue(init.attributes['pooled'])
+        self.assertTrue(all(span.trace_id == request.trace_id for span in self.exporter.finished()))
+
+    def test_cache(self):
+        """
+        Each access to the cache is a span of the request.
+
+        :return:
+        """
+        self.client.get(reverse("soap_connector:client_service_list", kwargs={'client_pk': self.pk}))
+
+        request, = self.exporter.finished('http.request')
+        reads = self.exporter.finished('cache.get')
+
+        self.assertTrue(reads)
+        self.assertTrue(all(span.attributes['hit'] for span in reads))
+        self.assertTrue(all(span.trace_id == request.trace_id for span in reads))
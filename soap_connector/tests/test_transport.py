@@ -0,0 +1,309 @@
+import io
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from soap_connector.tests.stub import StubServer
+import requests
+
+from zeep.exceptions import TransportError
+
+from soap_connector.deadline import Deadline
+from soap_connector.exceptions import DeadlineExceeded
+from soap_connector.transport import (
+    AsyncOperationTransport, DocumentCache, CachingTransport, SessionPool, StreamedResponse, document_cache
+)
+
+
+class DocumentCacheTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'documents.db')
+        self.documents = DocumentCache(self.path, max_size=10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_simple(self):
+        """
+
+        :return:
+        """
+        self.documents.add('http://a', b'12345', etag='"a"')
+        document = self.documents.get('http://a')
+
+        self.assertEqual(b'12345', document.content)
+        self.assertEqual('"a"', document.etag)
+        self.assertIsNone(self.documents.get('http://b'))
+
+    def test_persistence(self):
+        """
+        Documents survive across instances.
+
+        :return:
+        """
+        self.documents.add('http://a', b'12345')
+        documents = DocumentCache(self.path)
+
+        self.assertIn('http://a', documents)
+
+    def test_eviction(self):
+        """
+        The least recently used documents are evicted when the
+        size limit is exceeded.
+
+        :return:
+        """
+        self.documents.add('http://a', b'1234')
+        time.sleep(0.01)
+        self.documents.add('http://b', b'1234')
+        time.sleep(0.01)
+        self.documents.get('http://a')
+        self.documents.add('http://c', b'1234')
+
+        self.assertIn('http://a', self.documents)
+        self.assertNotIn('http://b', self.documents)
+        self.assertIn('http://c', self.documents)
+        self.assertEqual(1, self.documents.stats['evictions'])
+
+    def test_opt_in(self):
+        """
+        Documents are only stored once a path is set.
+
+        :return:
+        """
+        self.assertIsNone(document_cache())
+
+        with override_settings(SOAP_CONNECTOR_DOCUMENT_CACHE_PATH=self.path):
+            self.assertEqual(self.path, document_cache().path)
+
+
+class CachingTransportTestCase(SimpleTestCase):
+    """
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'documents.db')
+        self.server.requests.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def transport(self, **kwargs):
+        """
+        Returns a new transport, as a new worker would do.
+
+        :param kwargs:
+        :return:
+        """
+        return CachingTransport(documents=DocumentCache(self.path, **kwargs))
+
+    def test_revalidate(self):
+        """
+        A stored document is revalidated with a conditional
+        request instead of being downloaded again.
+
+        :return:
+        """
+        transport = self.transport()
+        content = transport.load(self.server.wsdl_url)
+        self.assertEqual(1, transport.documents.stats['misses'])
+
+        transport = self.transport()
+        self.assertEqual(content, transport.load(self.server.wsdl_url))
+        self.assertEqual(1, transport.documents.stats['revalidations'])
+        self.assertEqual(0, transport.documents.stats['misses'])
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_fresh(self):
+        """
+        A fresh document is served without any request.
+
+        :return:
+        """
+        self.transport().load(self.server.wsdl_url)
+
+        transport = self.transport(max_age=60)
+        transport.load(self.server.wsdl_url)
+
+        self.assertEqual(1, transport.documents.stats['hits'])
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_file(self):
+        """
+        Local documents are stored too.
+
+        :return:
+        """
+        filename = os.path.join(self.tmp.name, 'calculator.wsdl')
+        with open(filename, 'w') as fh:
+            fh.write(self.server.wsdl)
+        url = 'file://' + filename
+
+        transport = self.transport(max_age=60)
+        transport.load(url)
+        os.remove(filename)
+
+        self.assertEqual(self.server.wsdl.encode(), transport.load(url))
+        self.assertEqual(1, transport.documents.stats['misses'])
+        self.assertEqual(1, transport.documents.stats['hits'])
+
+    def test_async_loader(self):
+        """
+        Async transports load documents through the synchronous
+        one.
+
+        :return:
+        """
+        transport = AsyncOperationTransport(None, self.transport())
+
+        self.assertEqual(self.server.wsdl.encode(), transport.load(self.server.wsdl_url))
+        self.assertEqual(1, transport.loader.documents.stats['misses'])
+        with self.assertRaises(TransportError):
+            AsyncOperationTransport(None).load(self.server.wsdl_url)
+
+
+class StreamedResponseTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.outcomes = []
+
+    def stream(self, status_code=200, call_deadline=None):
+        """
+        Returns the streamed body of a fake response.
+
+        :param status_code:
+        :param call_deadline:
+        :return:
+        """
+        response = requests.Response()
+        response.status_code = status_code
+        response.raw = io.BytesIO(b'x' * 10)
+        return StreamedResponse(response, self.outcomes.append, call_deadline, chunk_size=4)
+
+    def test_read(self):
+        """
+        The callback is called once the body is read.
+
+        :return:
+        """
+        body = self.stream()
+        self.assertEqual(b'x' * 10, b''.join(body))
+
+        body.close()
+        self.assertEqual([None], self.outcomes)
+
+    def test_server_error(self):
+        """
+
+        :return:
+        """
+        b''.join(self.stream(500))
+
+        error, = self.outcomes
+        self.assertIsInstance(error, requests.HTTPError)
+
+    def test_closed(self):
+        """
+        Bodies closed before they're read were given up.
+
+        :return:
+        """
+        body = self.stream()
+        next(iter(body))
+        body.close()
+        self.stream().close()
+
+        self.assertEqual([GeneratorExit, GeneratorExit], [type(error) for error in self.outcomes])
+
+    def test_deadline(self):
+        """
+
+        :return:
+        """
+        with self.assertRaises(DeadlineExceeded):
+            b''.join(self.stream(call_deadline=Deadline(0)))
+
+        error, = self.outcomes
+        self.assertIsInstance(error, DeadlineExceeded)
+
+
+class SessionPoolTestCase(SimpleTestCase):
+    """
+
+    """
+    def setUp(self):
+        """
+
+        :return:
+        """
+        self.sessions = SessionPool()
+
+    def tearDown(self):
+        self.sessions.clear()
+
+    def test_reuse(self):
+        """
+        Transports with the same configuration share a session.
+
+        :return:
+        """
+        config = {'pool_maxsize': 20, 'retries': 2}
+        session = self.sessions.get(config)
+
+        self.assertIs(session, self.sessions.get(dict(config, read_timeout=5)))
+        self.assertIsNot(session, self.sessions.get({'pool_maxsize': 5}))
+        self.assertEqual(2, len(self.sessions))
+
+    def test_build(self):
+        """
+
+        :return:
+        """
+        session = self.sessions.get({'pool_maxsize': 20, 'retries': 2, 'keep_alive': False})
+        adapter = session.get_adapter('https://example.com')
+
+        self.assertEqual(20, adapter._pool_maxsize)
+        self.assertEqual(2, adapter.max_retries.total)
+        self.assertEqual('close', session.headers['Connection'])
+
+    def test_timeouts(self):
+        """
+
+        :return:
+        """
+        transport = CachingTransport.from_config({'connect_timeout': 1, 'read_timeout': 10})
+
+        self.assertEqual((1, 10), transport.operation_timeout)
+        self.assertEqual((1, 300), transport.load_timeout)
+        self.assertIsNone(CachingTransport.from_config({}).operation_timeout)
@@ -0,0 +1,182 @@
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from django.conf import settings
+
+HEADER = 'Server-Timing'
+
+WSDL = 'wsdl'
+CACHE = 'cache'
+ENVELOPE = 'envelope'
+NETWORK = 'network'
+PARSE = 'parse'
+RENDER = 'render'
+TOTAL = 'total'
+
+DESCRIPTIONS = {
+    WSDL: "WSDL load",
+    CACHE: "Cache reads and writes",
+    ENVELOPE: "Envelope building",
+    NETWORK: "Network",
+    PARSE: "Response parsing",
+    RENDER: "Rendering",
+    TOTAL: "Total",
+}
+
+_current: ContextVar[Optional["Timings"]] = ContextVar('soap_connector_timings', default=None)
+_disabled = nullcontext()
+
+
+def enabled() -> bool:
+    """
+    Returns true if the phases of the requests are timed.
+
+    :return:
+    """
+    return getattr(settings, 'SOAP_CONNECTOR_SERVER_TIMING', False)
+
+
+class Timings(object):
+    """
+    Durations of the phases of a request.
+    """
+    def __init__(self):
+        """
+        Initialize the timings.
+        """
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.active: Set[str] = set()
+        self.network: Optional[Tuple[float, float]] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+
+        :param name:
+        :param seconds:
+        :return:
+        """
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def header(self) -> str:
+        """
+        Returns the value of the Server-Timing header, with the
+        durations in milliseconds.
+
+        :return:
+        """
+        durations = dict(self.durations)
+        durations[TOTAL] = time.perf_counter() - self.start
+
+        return ', '.join(
+            f'{name};dur={seconds * 1000:.2f};desc="{DESCRIPTIONS.get(name, name)}"'
+            for name, seconds in durations.items()
+        )
+
+
+class Phase(object):
+    """
+    Times a phase of the request. Phases nested in a phase of
+    the same name are counted once.
+    """
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings: Timings, name: str):
+        """
+
+        :param timings:
+        :param name:
+        """
+        self.timings = timings
+        self.name = name
+        self.start: Optional[float] = None
+
+    def __enter__(self) -> "Phase":
+        if self.name not in self.timings.active:
+            self.timings.active.add(self.name)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.start is None:
+            return
+
+        end = time.perf_counter()
+        self.timings.add(self.name, end - self.start)
+        self.timings.active.discard(self.name)
+        if self.name == NETWORK:
+            self.timings.network = (self.start, end)
+
+
+def phase(name: str):
+    """
+    Returns a context manager timing a phase of the current
+    request, which does nothing when the timings are disabled.
+
+    :param name:
+    :return:
+    """
+    timings = _current.get()
+    if timings is None:
+        return _disabled
+    return Phase(timings, name)
+
+
+@contextmanager
+def call() -> Iterator[None]:
+    """
+    Times a call to an operation, splitting the time spent
+    before and after its network round trip between the
+    building of the envelope and the parsing of the response.
+
+    :return:
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    timings.network = None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if timings.network is None:
+            timings.add(ENVELOPE, end - start)
+        else:
+            sent, received = timings.network
+            timings.add(ENVELOPE, sent - start)
+            timings.add(PARSE, end - received)
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    """
+    Collects the timings of the phases run within the block.
+
+    :return:
+    """
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def render(response) -> None:
+    """
+    Renders a template response within the rendering phase,
+    rather than once it's returned by the view.
+
+    :param response:
+    :return:
+    """
+    if getattr(response, 'is_rendered', True):
+        return
+
+    with phase(RENDER):
+        response.render()
@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACING_BUFFER = 10000
+
+TRACEPARENT_HEADER = 'traceparent'
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+OK = 'ok'
+ERROR = 'error'
+
+
+class Span(object):
+    """
+    Timed operation of a trace, child of the span that was
+    current when it started.
+    """
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[dict] = None):
+        """
+        Initialize the span.
+
+        :param name:
+        :param parent:
+        :param attributes:
+        """
+        self.name = name
+        self.trace_id: str = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id: str = secrets.token_hex(8)
+        self.parent_id: Optional[str] = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = OK
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self._start = time.perf_counter()
+
+    @classmethod
+    def remote(cls, traceparent: Optional[str]) -> Optional["Span"]:
+        """
+        Returns the span of the caller given by a W3C
+        traceparent header, if it's valid.
+
+        :param traceparent:
+        :return:
+        """
+        match = TRACEPARENT.match((traceparent or '').strip().lower())
+        if match is None:
+            return None
+
+        span = cls.__new__(cls)
+        span.trace_id, span.span_id = match.groups()
+        return span
+
+    @property
+    def traceparent(self) -> str:
+        """
+        Returns the W3C traceparent header of the span.
+
+        :return:
+        """
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def set_attribute(self, name: str, value: Any) -> None:
+        """
+
+        :param name:
+        :param value:
+        :return:
+        """
+        self.attributes[name] = value
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+
+        :param error:
+        :return:
+        """
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = ERROR
+            self.attributes['error'] = f'{type(error).__name__}: {error}'
+
+    def to_dict(self) -> dict:
+        """
+
+        :return:
+        """
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class NoopSpan(object):
+    """
+    Span given when tracing is disabled.
+    """
+    traceparent = None
+
+    def set_attribute(self, name: str, value: Any) -> None:
+        pass
+
+
+class Exporter(object):
+    """
+    Base class of the exporters, which receive the spans once
+    they're finished.
+    """
+    def export(self, span: Span) -> None:
+        """
+
+        :param span:
+        :return:
+        """
+        raise NotImplementedError
+
+
+class InMemoryExporter(Exporter):
+    """
+    Keeps the last finished spans in memory.
+    """
+    def __init__(self, size: Optional[int] = None):
+        """
+
+        :param size: Maximum number of spans kept
+        """
+        size = size or getattr(settings, 'SOAP_CONNECTOR_TRACING_BUFFER', DEFAULT_TRACING_BUFFER)
+        self.spans = deque(maxlen=size)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def finished(self, name: Optional[str] = None) -> List[Span]:
+        """
+        Returns the finished spans, of the given name if any.
+
+        :param name:
+        :return:
+        """
+        return [span for span in list(self.spans) if name is None or span.name == name]
+
+    def clear(self) -> None:
+        """
+
+        :return:
+        """
+        self.spans.clear()
+
+
+class FileExporter(Exporter):
+    """
+    Appends the finished spans to a file, one JSON object per
+    line.
+    """
+    def __init__(self, path: Optional[str] = None):
+        """
+
+        :param path: Defaults to the file set in the project
+        settings
+        """
+        self.path = path or getattr(settings, 'SOAP_CONNECTOR_TRACING_FILE', None)
+        if not self.path:
+            raise ImproperlyConfigured("The file exporter requires the SOAP_CONNECTOR_TRACING_FILE setting")
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), cls=DjangoJSONEncoder)
+        with self.lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('soap_connector_span', default=None)
+_disabled = nullcontext(NoopSpan())
+_exporter: Optional[Exporter] = None
+_exporter_path: Optional[str] = None
+_exporter_lock = threading.Lock()
+
+
+def exporter() -> Optional[Exporter]:
+    """
+    Returns the process-wide exporter configured in the project
+    settings, or None if tracing is disabled.
+
+    :return:
+    """
+    global _exporter, _exporter_path
+
+    path = getattr(settings, 'SOAP_CONNECTOR_TRACING_EXPORTER', None)
+    if not path:
+        return None
+
+    if path != _exporter_path:
+        with _exporter_lock:
+            if path != _exporter_path:
+                _exporter = import_string(path)()
+                _exporter_path = path
+    return _exporter
+
+
+def current() -> Optional[Span]:
+    """
+    Returns the span of the running code.
+
+    :return:
+    """
+    return _current.get()
+
+
+def span(name: str, traceparent: Optional[str] = None, **attributes):
+    """
+    Returns a context manager running its block in a new span,
+    which does nothing when tracing is disabled.
+
+    :param name:
+    :param traceparent: Header of the remote caller, continuing
+    its trace rather than the current one
+    :param attributes:
+    :return:
+    """
+    target = exporter()
+    if target is None:
+        return _disabled
+
+    parent = Span.remote(traceparent) or _current.get()
+    return _trace(target, Span(name, parent, attributes))
+
+
+@contextmanager
+def _trace(target: Exporter, current_span: Span) -> Iterator[Span]:
+    """
+
+    :param target:
+    :param current_span:
+    :return:
+    """
+    token = _current.set(current_span)
+    error = None
+    try:
+        yield current_span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.reset(token)
+        current_span.finish(error)
+        try:
+            target.export(current_span)
+        except Exception:
+            logger.exception("Unable to export the span %s", current_span.name)
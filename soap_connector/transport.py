@@ -0,0 +1,708 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, NamedTuple
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from zeep.exceptions import TransportError
+from zeep.transports import AsyncTransport, Transport
+from zeep.wsdl.utils import etree_to_string
+
+from soap_connector import deadline, metrics, slowlog, timing, tracing
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+DEFAULT_CACHE_MAX_AGE = 0
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Document(NamedTuple):
+    """
+    A cached WSDL/XSD document with its validators.
+    """
+    url: str
+    content: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    validated: float
+
+
+class DocumentCache(object):
+    """
+    Persistent store of WSDL and XSD documents backed by
+    SQLite, bounded in size with least recently used eviction.
+    """
+    def __init__(
+            self,
+            path: str,
+            max_size: int = DEFAULT_CACHE_SIZE,
+            max_age: float = DEFAULT_CACHE_MAX_AGE
+    ):
+        """
+        Initialize the store, creating the database if needed.
+
+        :param path: Location of the SQLite database
+        :param max_size: Maximum size in bytes of stored documents
+        :param max_age: Seconds during which a document is served
+                        without revalidation
+        """
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.stats = Counter()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    url TEXT PRIMARY KEY,
+                    content BLOB,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER,
+                    accessed REAL,
+                    validated REAL
+                )
+                """
+            )
+
+    @contextmanager
+    def connection(self) -> sqlite3.Connection:
+        """
+        Provides a connection to the database within a
+        transaction.
+
+        :return:
+        """
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def get(self, url: str) -> Optional[Document]:
+        """
+        Returns the stored document and marks it as recently
+        used.
+
+        :param url:
+        :return:
+        """
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT url, content, etag, last_modified, validated "
+                "FROM documents WHERE url = ?", (url,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE documents SET accessed = ? WHERE url = ?",
+                    (time.time(), url)
+                )
+                return Document(row[0], bytes(row[1]), *row[2:])
+
+    def add(self, url: str, content: bytes, etag: str = None, last_modified: str = None) -> None:
+        """
+        Stores a document and evicts the least recently used
+        ones if the size limit is exceeded.
+
+        :param url:
+        :param content:
+        :param etag:
+        :param last_modified:
+        :return:
+        """
+        now = time.time()
+
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(url, content, etag, last_modified, size, accessed, validated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, sqlite3.Binary(content), etag, last_modified, len(content), now, now)
+            )
+            self.evict(conn)
+
+    def validate(self, url: str) -> None:
+        """
+        Marks a document as fresh after a successful
+        revalidation.
+
+        :param url:
+        :return:
+        """
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE documents SET validated = ? WHERE url = ?",
+                (time.time(), url)
+            )
+
+    def evict(self, conn: sqlite3.Connection) -> None:
+        """
+        Deletes the least recently used documents until the
+        store fits in its size limit.
+
+        :param conn:
+        :return:
+        """
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+        rows = conn.execute("SELECT url, size FROM documents ORDER BY accessed ASC").fetchall()
+
+        for url, size in rows:
+            if total <= self.max_size:
+                break
+            conn.execute("DELETE FROM documents WHERE url = ?", (url,))
+            self.stats['evictions'] += 1
+            total -= size
+
+    def is_fresh(self, document: Document) -> bool:
+        """
+        Returns true if the document can be served without
+        revalidation.
+
+        :param document:
+        :return:
+        """
+        return time.time() - document.validated < self.max_age
+
+    def clear(self) -> None:
+        """
+        Deletes all the stored documents.
+
+        :return:
+        """
+        with self.connection() as conn:
+            conn.execute("DELETE FROM documents")
+
+    def __contains__(self, url: str) -> bool:
+        """
+        Returns true if the store contains the document.
+
+        :param url:
+        :return:
+        """
+        with self.connection() as conn:
+            row = conn.execute("SELECT 1 FROM documents WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+
+_documents: Optional[DocumentCache] = None
+_documents_lock = threading.Lock()
+
+
+def document_cache() -> Optional[DocumentCache]:
+    """
+    Returns the process-wide document store configured in
+    the project settings, or None if no path has been set.
+
+    :return:
+    """
+    global _documents
+
+    path = getattr(settings, 'SOAP_CONNECTOR_DOCUMENT_CACHE_PATH', None)
+    if not path:
+        return None
+
+    with _documents_lock:
+        if _documents is None or _documents.path != path:
+            _documents = DocumentCache(
+                path,
+                getattr(settings, 'SOAP_CONNECTOR_DOCUMENT_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+                getattr(settings, 'SOAP_CONNECTOR_DOCUMENT_CACHE_MAX_AGE', DEFAULT_CACHE_MAX_AGE)
+            )
+    return _documents
+
+
+class SessionPool(object):
+    """
+    Process-wide pool of HTTP sessions shared by the clients
+    with the same transport configuration, so that connections
+    are reused across calls.
+    """
+    def __init__(self):
+        """
+        Initialize the pool.
+        """
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, requests.Session] = {}
+        self.stats = Counter()
+
+    @staticmethod
+    def fingerprint(config: dict) -> str:
+        """
+        Returns a digest of the settings that shape a session.
+
+        :param config:
+        :return:
+        """
+        keys = ('pool_connections', 'pool_maxsize', 'pool_block', 'keep_alive', 'retries', 'backoff_factor')
+        data = json.dumps({key: config.get(key) for key in keys}, sort_keys=True)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def get(self, config: dict) -> requests.Session:
+        """
+        Returns the shared session of the configuration,
+        building it the first time.
+
+        :param config:
+        :return:
+        """
+        fingerprint = self.fingerprint(config)
+
+        with self.lock:
+            session = self.sessions.get(fingerprint)
+            if session is None:
+                session = self.sessions[fingerprint] = self.build(config)
+                self.stats['builds'] += 1
+            else:
+                self.stats['hits'] += 1
+
+        return session
+
+    @staticmethod
+    def build(config: dict) -> requests.Session:
+        """
+        Builds a session whose adapters keep a pool of
+        connections for each host.
+
+        :param config:
+        :return:
+        """
+        retries = config.get('retries', 0)
+        adapter = HTTPAdapter(
+            pool_connections=config.get('pool_connections', 10),
+            pool_maxsize=config.get('pool_maxsize', 10),
+            pool_block=config.get('pool_block', False),
+            max_retries=Retry(
+                total=retries, connect=retries, read=retries,
+                backoff_factor=config.get('backoff_factor', 0),
+                raise_on_status=False
+            )
+        )
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        if not config.get('keep_alive', True):
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def clear(self) -> None:
+        """
+        Closes and removes all the sessions.
+
+        :return:
+        """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+            self.stats.clear()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of pooled sessions.
+
+        :return:
+        """
+        return len(self.sessions)
+
+
+sessions = SessionPool()
+
+
+class CachingTransport(Transport):
+    """
+    Transport that keeps the loaded WSDL and XSD documents in a
+    persistent store and revalidates them with conditional
+    requests.
+    """
+    def __init__(self, documents: Optional[DocumentCache] = None, **kwargs):
+        """
+        Initialize the transport.
+
+        :param documents:
+        :param kwargs:
+        """
+        super().__init__(**kwargs)
+        self.documents = documents
+
+    @property
+    def load_timeout(self):
+        """
+        Timeout of the document loads, bounded by the deadline
+        of the running call.
+
+        :return:
+        """
+        return deadline.clamp(self._load_timeout)
+
+    @load_timeout.setter
+    def load_timeout(self, value) -> None:
+        self._load_timeout = value
+
+    @property
+    def operation_timeout(self):
+        """
+        Timeout of the operation calls, bounded by the deadline
+        of the running call.
+
+        :return:
+        """
+        return deadline.clamp(self._operation_timeout)
+
+    @operation_timeout.setter
+    def operation_timeout(self, value) -> None:
+        self._operation_timeout = value
+
+    @classmethod
+    def from_config(cls, config: dict, documents: Optional[DocumentCache] = None) -> "CachingTransport":
+        """
+        Builds a transport on the shared session of the given
+        configuration.
+
+        :param config: Serialized transport
+        :param documents:
+        :return:
+        """
+        connect_timeout = config.get('connect_timeout')
+        read_timeout = config.get('read_timeout')
+        operation_timeout = None
+        if connect_timeout is not None or read_timeout is not None:
+            operation_timeout = (connect_timeout, read_timeout)
+
+        return cls(
+            documents=documents,
+            session=sessions.get(config),
+            timeout=(connect_timeout, config.get('load_timeout', 300)),
+            operation_timeout=operation_timeout
+        )
+
+    def post(self, address: str, message: str, headers: dict) -> requests.Response:
+        """
+        Posts a message, timed as the network phase of the
+        request and traced as a span propagated to the server.
+
+        :param address:
+        :param message:
+        :param headers:
+        :return:
+        """
+        with tracing.span('http.post', address=address) as span, timing.phase(timing.NETWORK):
+            if span.traceparent:
+                headers = dict(headers, **{tracing.TRACEPARENT_HEADER: span.traceparent})
+            response = super().post(address, message, headers)
+            span.set_attribute('status', response.status_code)
+            slowlog.capture(address, message, response.status_code, response.content)
+            return response
+
+    def post_stream(self, address: str, envelope, headers: dict) -> requests.Response:
+        """
+        Posts an envelope and returns the response without
+        reading its body, so that it can be streamed.
+
+        :param address:
+        :param envelope:
+        :param headers:
+        :return:
+        """
+        message = etree_to_string(envelope)
+        with tracing.span('http.post', address=address) as span, timing.phase(timing.NETWORK):
+            if span.traceparent:
+                headers = dict(headers, **{tracing.TRACEPARENT_HEADER: span.traceparent})
+            response = self.session.post(
+                address, data=message, headers=headers, timeout=self.operation_timeout, stream=True
+            )
+            span.set_attribute('status', response.status_code)
+            slowlog.capture(address, message, response.status_code)
+            return response
+
+    def load(self, url: str) -> bytes:
+        """
+        Loads a document, counted in the size of the WSDL load
+        when it's recorded.
+
+        :param url:
+        :return:
+        """
+        content = super().load(url)
+        slowlog.capture_document(content)
+        return content
+
+    def _load_remote_data(self, url: str) -> bytes:
+        """
+        Loads a document from the store, revalidating it with
+        the remote server when it's stale.
+
+        :param url:
+        :return:
+        """
+        if self.documents is None:
+            return super()._load_remote_data(url)
+
+        document = self.documents.get(url)
+        headers = {}
+
+        if document:
+            if self.documents.is_fresh(document):
+                self.documents.stats['hits'] += 1
+                metrics.cache_requests.inc('document', 'hit')
+                return document.content
+
+            if document.etag:
+                headers['If-None-Match'] = document.etag
+            if document.last_modified:
+                headers['If-Modified-Since'] = document.last_modified
+
+        response = self.session.get(url, timeout=self.load_timeout, headers=headers)
+
+        if document and response.status_code == 304:
+            self.documents.stats['revalidations'] += 1
+            metrics.cache_requests.inc('document', 'revalidated')
+            self.documents.validate(url)
+            return document.content
+
+        response.raise_for_status()
+        self.documents.stats['misses'] += 1
+        metrics.cache_requests.inc('document', 'miss')
+        self.documents.add(
+            url,
+            response.content,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified')
+        )
+        return response.content
+
+
+class StreamedResponse(object):
+    """
+    Body of a server response read as it's streamed to the
+    caller, within the deadline of the call. The callback is
+    called once, with the error that ended the call if any,
+    when the body is fully read or the response is closed.
+    """
+    def __init__(
+            self,
+            response: requests.Response,
+            callback: Callable[[Optional[BaseException]], None],
+            call_deadline: Optional[deadline.Deadline] = None,
+            chunk_size: int = CHUNK_SIZE
+    ):
+        """
+        Initialize the body.
+
+        :param response:
+        :param callback:
+        :param call_deadline:
+        :param chunk_size:
+        """
+        self.response = response
+        self.callback = callback
+        self.deadline = call_deadline
+        self.chunk_size = chunk_size
+        self.error: Optional[BaseException] = None
+        if response.status_code >= 500:
+            self.error = requests.HTTPError(f"{response.status_code} Server Error", response=response)
+        self.finished = False
+        self.closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        """
+        Yields the chunks of the body as they're received.
+
+        :return:
+        """
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                if self.deadline is not None:
+                    self.deadline.check()
+                yield chunk
+            self.finished = True
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Closes the response. Bodies that weren't fully read were
+        given up by the caller.
+
+        :return:
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        self.response.close()
+        self.callback(self.error or (None if self.finished else GeneratorExit()))
+
+
+class AsyncSessionPool(object):
+    """
+    Pool of httpx async clients by event loop and transport
+    configuration, since their connections are bound to the
+    loop they were opened in.
+    """
+    def __init__(self):
+        """
+        Initialize the pool.
+        """
+        self.lock = threading.Lock()
+        self.clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.stats = Counter()
+
+    def get(self, config: dict) -> "httpx.AsyncClient":
+        """
+        Returns the shared async client of the configuration in
+        the running event loop, building it the first time.
+
+        :param config:
+        :return:
+        """
+        if httpx is None:
+            raise RuntimeError("Asynchronous calls require the httpx module")
+
+        loop = asyncio.get_running_loop()
+        fingerprint = SessionPool.fingerprint(config)
+
+        with self.lock:
+            clients = self.clients.setdefault(loop, {})
+            client = clients.get(fingerprint)
+            if client is None:
+                client = clients[fingerprint] = self.build(config)
+                self.stats['builds'] += 1
+            else:
+                self.stats['hits'] += 1
+
+        return client
+
+    @staticmethod
+    def build(config: dict) -> "httpx.AsyncClient":
+        """
+        Builds an async client with the limits and timeouts of
+        the configuration.
+
+        :param config:
+        :return:
+        """
+        max_connections = config.get('pool_connections', 10) * config.get('pool_maxsize', 10)
+        limits = httpx.Limits(
+            max_connections=max_connections if config.get('pool_block', False) else None,
+            max_keepalive_connections=config.get('pool_maxsize', 10) if config.get('keep_alive', True) else 0
+        )
+        timeout = httpx.Timeout(config.get('read_timeout'), connect=config.get('connect_timeout'))
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=config.get('retries', 0))
+
+        return httpx.AsyncClient(timeout=timeout, transport=transport)
+
+
+async_sessions = AsyncSessionPool()
+
+
+class AsyncOperationTransport(AsyncTransport):
+    """
+    Async transport for operation calls on the shared client of
+    the running event loop. The documents it has to load are
+    loaded by the pooled synchronous transport.
+    """
+    def __init__(self, client: "httpx.AsyncClient", loader: Optional[CachingTransport] = None):
+        """
+        Initialize the transport without building zeep's own
+        httpx clients.
+
+        :param client:
+        :param loader: Transport loading the documents
+        """
+        self.cache = None
+        self.client = client
+        self.loader = loader
+        self.wsdl_client = None
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config: dict, loader: Optional[CachingTransport] = None) -> "AsyncOperationTransport":
+        """
+        Builds a transport on the shared async client of the
+        given configuration.
+
+        :param config: Serialized transport
+        :param loader: Pooled transport loading the documents
+        :return:
+        """
+        return cls(async_sessions.get(config), loader)
+
+    async def post(self, address: str, message: str, headers: dict) -> "httpx.Response":
+        """
+        Posts a message within the deadline of the running call.
+
+        :param address:
+        :param message:
+        :param headers:
+        :return:
+        """
+        current = deadline.current()
+        with tracing.span('http.post', address=address) as span, timing.phase(timing.NETWORK):
+            if span.traceparent:
+                headers = dict(headers, **{tracing.TRACEPARENT_HEADER: span.traceparent})
+
+            if current is None:
+                response = await super().post(address, message, headers)
+            else:
+                timeout = self.client.timeout
+                response = await self.client.post(
+                    address, data=message, headers=headers,
+                    timeout=httpx.Timeout(current.clamp(timeout.read), connect=current.clamp(timeout.connect))
+                )
+            span.set_attribute('status', response.status_code)
+            slowlog.capture(address, message, response.status_code, response.content)
+            return response
+
+    def _load_remote_data(self, url: str) -> bytes:
+        """
+        Loads a document through the synchronous transport.
+
+        :param url:
+        :return:
+        """
+        if self.loader is None:
+            raise TransportError(f"Unable to load {url}: the transport has no document loader")
+        return self.loader._load_remote_data(url)
+
+    async def aclose(self) -> None:
+        """
+        Keeps the shared client open.
+
+        :return:
+        """
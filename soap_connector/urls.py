@@ -7,13 +7,23 @@ from soap_connector import api
 urlpatterns = [
     path('', api.root, name='root'),
     path('registry/', api.registry, name='registry_list'),
+    path('metrics/', api.metrics, name='metrics_list'),
+    path('backend/', api.backend, name='backend_list'),
+    path('slow_call/', api.slow_call, name='slow_call_list'),
+    path('job/<int:job_pk>/', api.job, name='job_detail'),
+    path('job/', api.job, name='job_list'),
     path('settings/<int:settings_pk>/', api.settings, name='settings_detail'),
     path('settings/', api.settings, name='settings_list'),
+    path('transport/<int:transport_pk>/', api.transport, name='transport_detail'),
+    path('transport/', api.transport, name='transport_list'),
+    path('client/<int:client_pk>/service/<slug:service_pk>/<slug:port_pk>/<slug:operation_pk>/async',
+         api.async_operation, name='client_operation_async'),
     path('client/<int:client_pk>/service/<slug:service_pk>/<slug:port_pk>/<slug:operation_pk>',
          api.operation, name='client_operation_detail'),
     path('client/<int:client_pk>/service/<slug:service_pk>/<slug:port_pk>/', api.port, name='client_port_detail'),
     path('client/<int:client_pk>/service/<slug:service_pk>/', api.service, name='client_service_detail'),
     path('client/<int:client_pk>/service/', api.service, name='client_service_list'),
+    path('client/<int:client_pk>/batch/', api.batch, name='client_batch'),
     path('client/<int:client_pk>/binding/<slug:binding_pk>/', api.binding, name='client_binding_detail'),
     path('client/<int:client_pk>/binding/', api.binding, name='client_binding_list'),
     path('client/<int:client_pk>/prefix/<slug:prefix_pk>/', api.prefix, name='client_prefix_detail'),
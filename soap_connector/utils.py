@@ -1,8 +1,13 @@
-from typing import Type
+from typing import Type, Dict, Hashable, Callable, Any, Awaitable, Optional
+import asyncio
 import math
+import threading
 
 from django.core.cache import cache
 
+from soap_connector import deadline
+from soap_connector.exceptions import DeadlineExceeded
+
 
 def dump_cache(depth, items):
     data = dict()
@@ -72,3 +77,204 @@ class SingletonDecorator:
             self.instance = self.cls(*args, **kwargs)
 
         return self.instance
+
+
+class Call(object):
+    """
+    An in-flight or completed call shared by several callers,
+    run under the deadline of its leader, the loosest of them.
+    """
+    def __init__(self, expires_at: float = math.inf):
+        """
+        Initialize the call.
+
+        :param expires_at: Deadline of the leader
+        """
+        self.event = threading.Event()
+        self.future: Optional[asyncio.Future] = None
+        self.expires_at = expires_at
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.shared = True
+
+    def fail(self, error: BaseException) -> None:
+        """
+        Records the error of the call. Errors caused by the
+        deadline or the cancellation of the leader aren't shared
+        with the followers, which retry instead.
+
+        :param error:
+        :return:
+        """
+        self.error = error
+        self.shared = shareable(error)
+
+
+def shareable(error: BaseException) -> bool:
+    """
+    Returns true if the error of a call can be given to the
+    callers sharing it, that is, unless it's caused by the
+    deadline or the cancellation of the running call.
+
+    :param error:
+    :return:
+    """
+    current = deadline.current()
+    return (
+        isinstance(error, Exception) and not isinstance(error, DeadlineExceeded) and
+        not (current is not None and current.expired())
+    )
+
+
+def expiry() -> float:
+    """
+    Returns the point in time of the deadline of the running
+    call, if any.
+
+    :return:
+    """
+    current = deadline.current()
+    return math.inf if current is None else current.expires_at
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls sharing the same key, so that
+    only the first caller executes the function and the rest
+    wait for its result. Callers only join a call whose
+    deadline is at least as far as their own, and otherwise
+    lead a new one.
+    """
+    def __init__(self):
+        """
+        Initialize the group of calls.
+        """
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Call] = {}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executes and returns the results of the given function,
+        making sure that only one execution is in-flight for a
+        given key at a time.
+
+        :param key:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        expires_at = expiry()
+
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None or call.expires_at < expires_at
+                if leader:
+                    call = self.calls[key] = Call(expires_at)
+
+            if leader:
+                return self.lead(key, call, fn, *args, **kwargs)
+
+            current = deadline.current()
+            if not call.event.wait(None if current is None else current.remaining()):
+                current.check()
+
+            if call.error is None:
+                return call.result
+            if call.shared:
+                raise call.error
+
+    def lead(self, key: Hashable, call: Call, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executes the function for the followers of the call.
+
+        :param key:
+        :param call:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.fail(e)
+            raise
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+            call.event.set()
+
+        return call.result
+
+
+class AsyncSingleFlight(object):
+    """
+    Coalesces concurrent coroutines sharing the same key in
+    the running event loop, so that only the first caller awaits
+    the function and the rest wait for its result. Callers only
+    join a call whose deadline is at least as far as their own.
+    """
+    def __init__(self):
+        """
+        Initialize the group of calls.
+        """
+        self.calls: Dict[Hashable, Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Awaits and returns the results of the given coroutine
+        function, making sure that only one execution is
+        in-flight for a given key and event loop at a time.
+
+        :param key:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        key = (loop, key)
+        expires_at = expiry()
+
+        while True:
+            call = self.calls.get(key)
+            if call is None or call.expires_at < expires_at:
+                call = self.calls[key] = Call(expires_at)
+                call.future = loop.create_future()
+                return await self.lead(key, call, fn, *args, **kwargs)
+
+            current = deadline.current()
+            done, _ = await asyncio.wait({call.future}, timeout=None if current is None else current.remaining())
+            if not done:
+                current.check()
+
+            if call.error is None:
+                return call.result
+            if call.shared:
+                raise call.error
+
+    async def lead(self, key: Hashable, call: Call, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Awaits the function for the followers of the call.
+
+        :param key:
+        :param call:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        try:
+            call.result = await fn(*args, **kwargs)
+        except BaseException as e:
+            call.fail(e)
+            raise
+        finally:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+            call.future.set_result(None)
+
+        return call.result